@@ -43,7 +43,8 @@ class AccountAdmin(admin.ModelAdmin):
     """
 
     ordering = ("special", "association__name", "user__first_name", "user__last_name")
-    list_display = ("__str__", "get_balance", "negative_since")
+    list_display = ("__str__", "balance", "negative_since")
+    list_select_related = ("user", "association")
     list_filter = (AccountTypeListFilter,)
     search_fields = (
         "user__first_name",
@@ -53,6 +54,13 @@ class AccountAdmin(admin.ModelAdmin):
         "special",
     )
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_negative_since()
+
+    @admin.display(ordering="negative_since_moment")
+    def negative_since(self, obj):
+        return obj.negative_since_moment
+
     def has_change_permission(self, request, obj=None):
         return False
 
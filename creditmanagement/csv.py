@@ -1,43 +1,42 @@
-"""Just some function to create a transactions CSV."""
+"""Just some functions to create a transactions CSV."""
 import csv
-from typing import Iterable
+from itertools import chain
+from typing import Iterable, Iterator, List
 
+from django.http import StreamingHttpResponse
 from django.utils.timezone import get_default_timezone
 
 from creditmanagement.models import Account, Transaction
+from utils.csv import Echo
 
+HEADER = [
+    "date",
+    "direction",
+    "account_type",
+    "name",
+    "email",
+    "amount",
+    "description",
+    "created_by",
+]
 
-def write_transactions_csv(
-    csv_file, transactions: Iterable[Transaction], account_self: Account
-):
-    """Writes a transactions CSV file to the given file object.
+
+def transaction_rows(
+    transactions: Iterable[Transaction], account_self: Account
+) -> Iterator[List]:
+    """Yields the CSV row for each transaction.
 
     Args:
-        csv_file: Can be any file-like object with a write() method.
         transactions: List or QuerySet of transactions.
         account_self: The account that is used to determine the direction. The
             opposite account is used for the (counterpart) name column.
     """
-    csv_writer = csv.writer(csv_file)
-    csv_writer.writerow(
-        [
-            "date",
-            "direction",
-            "account_type",
-            "name",
-            "email",
-            "amount",
-            "description",
-            "created_by",
-        ]
-    )
-
     for t in transactions:
         # Determine direction and counterparty
-        if t.source == account_self:
+        if t.source_id == account_self.pk:
             direction = "out"
             counterparty = t.target
-        elif t.target == account_self:
+        elif t.target_id == account_self.pk:
             direction = "in"
             counterparty = t.source
         else:
@@ -59,15 +58,38 @@ def write_transactions_csv(
         name = str(counterparty)
         email = counterparty.user.email if account_type == "user" else ""
 
-        csv_writer.writerow(
-            [
-                date,
-                direction,
-                account_type,
-                name,
-                email,
-                t.amount,
-                t.description,
-                str(t.created_by),
-            ]
-        )
+        yield [
+            date,
+            direction,
+            account_type,
+            name,
+            email,
+            t.amount,
+            t.description,
+            str(t.created_by),
+        ]
+
+
+def transactions_csv_response(account: Account, filename: str) -> StreamingHttpResponse:
+    """Returns a response which streams the transactions CSV file of an account.
+
+    The transactions are fetched in chunks together with their accounts, so
+    the memory use does not depend on the number of transactions.
+
+    Args:
+        account: The account to export the transactions of, newest first.
+        filename: Name of the downloaded file.
+    """
+    transactions = (
+        Transaction.objects.select_accounts()
+        .select_related("created_by")
+        .filter_account(account)
+        .order_by("-moment", "-pk")
+        .iterator(chunk_size=2000)
+    )
+    csv_writer = csv.writer(Echo())
+    rows = transaction_rows(transactions, account)
+    lines = (csv_writer.writerow(row) for row in chain([HEADER], rows))
+    response = StreamingHttpResponse(lines, content_type="text/csv")
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
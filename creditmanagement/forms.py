@@ -183,8 +183,8 @@ class SiteWideTransactionForm(forms.ModelForm):
         instance = super().save(commit=False)
         if commit:
             with transaction.atomic():
-                # We do this in a DB transaction so that when the e-mail failed,
-                # the transaction is not saved. (Not sure whether it's a good idea, but doesn't really matter)
+                # The mail is queued in the same DB transaction, so that it is
+                # only sent when the transaction is saved.
                 instance.save()
                 # Send mail if the source is a user
                 source = self.instance.source
@@ -211,26 +211,25 @@ class ClearOpenExpensesForm(forms.Form):
     def __init__(self, *args, association=None, user=None, **kwargs):
         # Calculate and create the transactions that need to be applied
 
-        # Get all verified members. Probably nicer to create a helper method for this.
-        members = User.objects.filter(
+        # Get the accounts of all verified members with a negative balance.
+        accounts = Account.objects.filter(
             # We could exclude inactive user accounts.
             # But they will show up in the association members list and can be rejected there manually.
-            # is_active=True,
-            usermembership__association=association,
-            usermembership__is_verified=True,
+            # user__is_active=True,
+            user__usermembership__association=association,
+            user__usermembership__is_verified=True,
+            balance__lt=0,
         )
-        self.transactions = []
-        for m in members:
-            balance = m.account.get_balance()
-            if balance < 0:
-                # Construct a transaction for each member with negative balance
-                tx = Transaction(
-                    source=association.account,
-                    target=m.account,
-                    amount=-balance,
-                    created_by=user,
-                )  # Description needs to be set later
-                self.transactions.append(tx)
+        # Construct a transaction for each member with negative balance
+        self.transactions = [
+            Transaction(
+                source=association.account,
+                target=account,
+                amount=-account.balance,
+                created_by=user,
+            )  # Description needs to be set later
+            for account in accounts
+        ]
         super().__init__(*args, **kwargs)
 
     def save(self):
@@ -238,10 +237,10 @@ class ClearOpenExpensesForm(forms.Form):
         if not self.is_valid():
             raise RuntimeError
         desc = self.cleaned_data.get("description")
-        with transaction.atomic():
-            for tx in self.transactions:
-                tx.description = desc
-                tx.save()
+        for tx in self.transactions:
+            tx.description = desc
+        # This also updates the account balances in the same database transaction
+        Transaction.objects.bulk_create(self.transactions)
 
 
 # Todo! This form is currently not used, it can be removed
@@ -0,0 +1,95 @@
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from functools import partial
+
+from django.core.management.base import BaseCommand
+from django.db import models, transaction
+from django.db.models import Q
+
+from creditmanagement.models import Account, Transaction
+from general.pagination import CursorPaginator
+from userdetails.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares the query plans and timings of the OR based and the index "
+        "based transaction filter on a synthetic ledger. "
+        "All generated data is rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=1_000_000)
+        parser.add_argument("--accounts", type=int, default=2000)
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.generate(options["rows"], options["accounts"])
+            busy = Account.objects.get(special="kitchen_cost")
+            quiet = Account.objects.filter(special=None).last()
+            for account in (busy, quiet):
+                self.stdout.write(self.style.MIGRATE_HEADING(f"Account {account}"))
+                self.compare(account, options["repeat"])
+            transaction.set_rollback(True)
+
+    def generate(self, rows: int, accounts: int):
+        self.stdout.write(f"Generating {rows} transactions over {accounts} accounts")
+        user = User.objects.create_user("benchmark")
+        accounts = Account.objects.bulk_create([Account() for _ in range(accounts)])
+        kitchen = Account.objects.get(special="kitchen_cost")
+        start = datetime(2015, 1, 1, tzinfo=timezone.utc)
+        batch = []
+        for i in range(rows):
+            source = random.choice(accounts)
+            target = kitchen if random.random() < 0.5 else random.choice(accounts)
+            batch.append(
+                Transaction(
+                    source=source,
+                    target=target,
+                    amount=Decimal("1.00"),
+                    moment=start + timedelta(minutes=5 * i),
+                    description="Benchmark",
+                    created_by=user,
+                )
+            )
+            if len(batch) == 10000 or i == rows - 1:
+                # The balances are not maintained, because everything is
+                # rolled back anyway.
+                models.QuerySet(Transaction).bulk_create(batch)
+                batch = []
+
+    def compare(self, account: Account, repeat: int):
+        or_qs = Transaction.objects.filter(Q(source=account) | Q(target=account))
+        strategies = {
+            "OR": (or_qs, or_qs.filter),
+            "filter_account": (
+                Transaction.objects.filter_account(account),
+                partial(Transaction.objects.filter_account, account),
+            ),
+        }
+        for name, (qs, filter_rows) in strategies.items():
+            paginator = CursorPaginator(qs, 100, filter_rows=filter_rows)
+            cursor = paginator.get_page().next_cursor()
+            page_qs = qs.order_by("-moment", "-pk")[:100]
+            self.stdout.write(self.style.HTTP_INFO(name))
+            self.stdout.write(page_qs.explain())
+            self.stdout.write(
+                "  first page: {:.2f} ms, next page: {:.2f} ms, count: {:.2f} ms".format(
+                    self.time(lambda: paginator.get_page(), repeat),
+                    self.time(lambda: paginator.get_page(after=cursor), repeat),
+                    self.time(lambda: qs.count(), repeat),
+                )
+            )
+
+    @staticmethod
+    def time(fn, repeat: int) -> float:
+        """Returns the best wall clock time of the function in milliseconds."""
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            timings.append(time.perf_counter() - start)
+        return min(timings) * 1000
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from creditmanagement.models import BalanceCheckpoint
+
+
+class Command(BaseCommand):
+    help = (
+        "Creates monthly balance checkpoints up to now. "
+        "Only the months since the latest checkpoint are processed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rebuild",
+            action="store_true",
+            help="Delete all existing checkpoints and create them from scratch.",
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            if options["rebuild"]:
+                BalanceCheckpoint.objects.all().delete()
+            created = BalanceCheckpoint.objects.create_monthly()
+        self.stdout.write(self.style.SUCCESS(f"Created {created} checkpoint(s)"))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from creditmanagement.models import DailyAccountFlow
+
+
+class Command(BaseCommand):
+    help = "Recreates the daily account flows from all transactions."
+
+    def handle(self, *args, **options):
+        created = DailyAccountFlow.objects.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Created {created} daily flow(s)"))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from creditmanagement.models import Account
+
+
+class Command(BaseCommand):
+    help = "Recomputes the stored account balances from the transactions."
+
+    def handle(self, *args, **options):
+        fixed = Account.objects.recompute_balances()
+        if fixed:
+            self.stdout.write(self.style.WARNING(f"Fixed {fixed} account balance(s)"))
+        else:
+            self.stdout.write(self.style.SUCCESS("All account balances are correct"))
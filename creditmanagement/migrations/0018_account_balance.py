@@ -0,0 +1,43 @@
+# Generated by Django 4.1.4 on 2026-10-17 06:00
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def compute_balances(apps, schema_editor):
+    """Fills the new balance column using the existing transactions."""
+    Account = apps.get_model("creditmanagement", "Account")
+    Transaction = apps.get_model("creditmanagement", "Transaction")
+
+    balances = {}
+    for row in Transaction.objects.values("target").annotate(sum=Sum("amount")):
+        balances[row["target"]] = balances.get(row["target"], 0) + row["sum"]
+    for row in Transaction.objects.values("source").annotate(sum=Sum("amount")):
+        balances[row["source"]] = balances.get(row["source"], 0) - row["sum"]
+
+    for account_id, balance in balances.items():
+        Account.objects.filter(pk=account_id).update(balance=balance)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("creditmanagement", "0017_remove_cancel_column"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="account",
+            name="balance",
+            field=models.DecimalField(
+                decimal_places=2,
+                default=Decimal("0.00"),
+                editable=False,
+                max_digits=12,
+            ),
+        ),
+        migrations.RunPython(
+            compute_balances, reverse_code=migrations.RunPython.noop, elidable=True
+        ),
+    ]
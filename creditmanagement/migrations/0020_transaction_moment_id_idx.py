@@ -0,0 +1,18 @@
+# Generated by Django 4.1.4 on 2026-10-17 06:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("creditmanagement", "0019_balancecheckpoint"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="transaction",
+            index=models.Index(
+                fields=["moment", "id"], name="transaction_moment_id_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.1.4 on 2026-10-17 06:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("creditmanagement", "0020_transaction_moment_id_idx"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="transaction",
+            index=models.Index(
+                fields=["source", "moment"], name="transaction_source_moment_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="transaction",
+            index=models.Index(
+                fields=["target", "moment"], name="transaction_target_moment_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,84 @@
+# Generated by Django 4.1.4 on 2026-10-17 06:18
+
+from decimal import Decimal
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+
+def create_flows(apps, schema_editor):
+    """Fills the daily flows using the existing transactions."""
+    DailyAccountFlow = apps.get_model("creditmanagement", "DailyAccountFlow")
+    Transaction = apps.get_model("creditmanagement", "Transaction")
+
+    flows = {}
+    day = TruncDate("moment", tzinfo=timezone.get_current_timezone())
+    transactions = Transaction.objects.annotate(day=day)
+    for row in transactions.values("target", "day").annotate(sum=Sum("amount")):
+        flow = flows.setdefault(
+            (row["target"], row["day"]),
+            DailyAccountFlow(account_id=row["target"], date=row["day"]),
+        )
+        flow.influx = row["sum"]
+    for row in transactions.values("source", "day").annotate(sum=Sum("amount")):
+        flow = flows.setdefault(
+            (row["source"], row["day"]),
+            DailyAccountFlow(account_id=row["source"], date=row["day"]),
+        )
+        flow.outflux = row["sum"]
+    DailyAccountFlow.objects.bulk_create(flows.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("creditmanagement", "0021_transaction_account_moment_idx"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DailyAccountFlow",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField()),
+                (
+                    "influx",
+                    models.DecimalField(
+                        decimal_places=2, default=Decimal("0.00"), max_digits=12
+                    ),
+                ),
+                (
+                    "outflux",
+                    models.DecimalField(
+                        decimal_places=2, default=Decimal("0.00"), max_digits=12
+                    ),
+                ),
+                (
+                    "account",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="creditmanagement.account",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="dailyaccountflow",
+            constraint=models.UniqueConstraint(
+                fields=("account", "date"), name="unique_account_date_flow"
+            ),
+        ),
+        migrations.RunPython(
+            create_flows, reverse_code=migrations.RunPython.noop, elidable=True
+        ),
+    ]
@@ -1,16 +1,77 @@
-from datetime import datetime
+from collections import defaultdict
+from datetime import date, datetime, timedelta
 from decimal import Decimal
-from typing import Optional, Union
+from typing import Iterable, Optional, Tuple, Union
 
 from django.core.validators import MinValueValidator
-from django.db import models
-from django.db.models import Q, QuerySet, Sum
+from django.db import models, transaction
+from django.db.models import F, Max, Min, OuterRef, Q, QuerySet, Subquery, Sum
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import TruncDate
 from django.utils import timezone
 
 from userdetails.models import Association, User
 
+# Checkpoints are only created for months that ended at least this long ago, so
+# that transactions which are recorded late (e.g. for a dining list of the last
+# days of the month) still end up before the checkpoint instead of being missed.
+CHECKPOINT_MARGIN = timedelta(days=7)
 
-class AccountManager(models.Manager):
+# Computes the moment since which the balance of an account is negative, see
+# Account.negative_since(). The moment is that of the latest transaction
+# before which the balance was not negative. The balance before a transaction
+# equals the current balance minus the sum of that transaction and all later
+# transactions, which we compute with a running sum from new to old.
+#
+# Only transactions after the latest non-negative balance checkpoint are
+# scanned, because the balance was not negative at that moment. Transactions
+# that have the account both as source and target do not change the balance and
+# are left out.
+#
+# The query refers to the account table of the outer query, it is used as an
+# annotation by AccountQuerySet.with_negative_since().
+NEGATIVE_SINCE_SQL = """
+CASE WHEN creditmanagement_account.balance < 0 THEN (
+    SELECT MAX(ledger.moment) FROM (
+        SELECT account_tx.moment, SUM(account_tx.amount) OVER (
+            ORDER BY account_tx.moment DESC, account_tx.id DESC
+            ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW
+        ) AS later_sum
+        FROM (
+            SELECT tx.id, tx.moment, tx.amount
+            FROM creditmanagement_transaction tx
+            WHERE tx.target_id = creditmanagement_account.id
+                AND tx.source_id <> tx.target_id
+            UNION ALL
+            SELECT tx.id, tx.moment, -tx.amount
+            FROM creditmanagement_transaction tx
+            WHERE tx.source_id = creditmanagement_account.id
+                AND tx.source_id <> tx.target_id
+        ) account_tx
+        WHERE account_tx.moment >= COALESCE((
+            SELECT MAX(cp.moment) FROM creditmanagement_balancecheckpoint cp
+            WHERE cp.account_id = creditmanagement_account.id AND cp.balance >= 0
+        ), account_tx.moment)
+    ) ledger
+    WHERE creditmanagement_account.balance - ledger.later_sum >= 0
+) END
+"""
+
+
+class AccountQuerySet(QuerySet):
+    def with_negative_since(self):
+        """Annotates negative_since_moment, see Account.negative_since().
+
+        The moment is computed in the same query for all accounts.
+        """
+        return self.annotate(
+            negative_since_moment=RawSQL(
+                NEGATIVE_SINCE_SQL, [], output_field=models.DateTimeField()
+            )
+        )
+
+
+class AccountManager(models.Manager.from_queryset(AccountQuerySet)):
     def get_by_natural_key(self, type, name=None):
         # See https://docs.djangoproject.com/en/4.1/topics/serialization/#natural-keys
         if type.lower() == "user":
@@ -20,6 +81,69 @@ class AccountManager(models.Manager):
         else:
             return self.get(special=type)
 
+    def add_to_balances(self, transactions: Iterable["Transaction"]):
+        """Adds the amounts of new transactions to the stored account balances.
+
+        Uses one UPDATE query per distinct amount that is added, e.g. refunding
+        the kitchen cost to many users is a single query. The accounts are
+        locked in order of their primary key first, so that concurrent calls
+        can't deadlock on each other.
+        """
+        deltas = {}
+        for tx in transactions:
+            deltas[tx.source_id] = deltas.get(tx.source_id, 0) - tx.amount
+            deltas[tx.target_id] = deltas.get(tx.target_id, 0) + tx.amount
+        accounts = defaultdict(list)
+        for account_id, delta in deltas.items():
+            if delta:
+                accounts[delta].append(account_id)
+        account_ids = [pk for ids in accounts.values() for pk in ids]
+        if len(account_ids) > 1:
+            locked = self.select_for_update().filter(pk__in=account_ids)
+            list(locked.order_by("pk").values_list("pk"))
+        for delta, ids in accounts.items():
+            self.filter(pk__in=ids).update(balance=F("balance") + delta)
+
+    def recompute_balances(self) -> int:
+        """Recomputes the stored balance of all accounts from the transactions.
+
+        This is the fallback for when the stored balances have drifted, e.g.
+        after transactions were inserted with raw SQL. The full ledger is summed
+        because the checkpoints might be outdated as well.
+
+        The balances of all accounts are computed with two grouped aggregates.
+        Only the accounts of which the stored balance differs are locked, and
+        their balance is computed again while locked, because a transaction
+        might have been added in the meantime.
+
+        Returns:
+            The number of accounts of which the stored balance was incorrect.
+        """
+        balances = {}
+        transactions = Transaction.objects.order_by()
+        for row in transactions.values("target").annotate(sum=Sum("amount")):
+            balances[row["target"]] = balances.get(row["target"], 0) + row["sum"]
+        for row in transactions.values("source").annotate(sum=Sum("amount")):
+            balances[row["source"]] = balances.get(row["source"], 0) - row["sum"]
+        drifted = [
+            pk
+            for pk, balance in self.values_list("pk", "balance")
+            if balance != balances.get(pk, 0)
+        ]
+        if not drifted:
+            return 0
+
+        fixed = 0
+        with transaction.atomic():
+            for account in (
+                self.select_for_update().filter(pk__in=drifted).order_by("pk")
+            ):
+                balance = account.compute_balance(use_checkpoint=False)
+                if account.balance != balance:
+                    self.filter(pk=account.pk).update(balance=balance)
+                    fixed += 1
+        return fixed
+
 
 class Account(models.Model):
     """Money account which can be used as a transaction source or target."""
@@ -50,10 +174,40 @@ class Account(models.Model):
         choices=SPECIAL_ACCOUNTS,
     )
 
+    # The sum of all transactions of this account. It is updated in the same
+    # database transaction as each transaction insert, see
+    # creditmanagement.receivers. Do not change it directly.
+    balance = models.DecimalField(
+        decimal_places=2, max_digits=12, default=Decimal("0.00"), editable=False
+    )
+
     objects = AccountManager()
 
     def get_balance(self) -> Decimal:
+        """Returns the current balance.
+
+        The balance is read from the database so that it is always up-to-date,
+        even when this instance was loaded before a transaction was made.
+        """
+        self.balance = Account.objects.values_list("balance", flat=True).get(pk=self.pk)
+        return self.balance
+
+    get_balance.short_description = "Balance"  # (used in admin site)
+
+    def compute_balance(self, use_checkpoint=True) -> Decimal:
+        """Computes the balance from the transactions instead of the stored value.
+
+        Args:
+            use_checkpoint: When True, only the transactions after the latest
+                balance checkpoint are summed. Use False to sum the full ledger,
+                e.g. to verify the stored balance independent of checkpoints.
+        """
         qs = Transaction.objects.all()
+        start = Decimal("0.00")
+        checkpoint = self.get_latest_checkpoint() if use_checkpoint else None
+        if checkpoint:
+            qs = qs.filter(moment__gte=checkpoint.moment)
+            start = checkpoint.balance
         # 2 separate queries for the source and target sums
         # If there are no rows, the value will be made 0.00
         source_sum = qs.filter(source=self).aggregate(sum=Sum("amount"))[
@@ -62,9 +216,15 @@ class Account(models.Model):
         target_sum = qs.filter(target=self).aggregate(sum=Sum("amount"))[
             "sum"
         ] or Decimal("0.00")
-        return target_sum - source_sum
+        return start + target_sum - source_sum
 
-    get_balance.short_description = "Balance"  # (used in admin site)
+    def get_latest_checkpoint(self, **filters) -> Optional["BalanceCheckpoint"]:
+        """Returns the most recent balance checkpoint of this account.
+
+        Args:
+            filters: Additional filters for the checkpoint, e.g. balance__gte=0.
+        """
+        return self.balancecheckpoint_set.filter(**filters).order_by("-moment").first()
 
     def get_entity(self) -> Union[User, Association, None]:
         """Returns the user or association for this account.
@@ -80,26 +240,17 @@ class Account(models.Model):
     def negative_since(self) -> Optional[datetime]:
         """Computes the date when the users balance has become negative.
 
+        Use AccountQuerySet.with_negative_since() when you need this for
+        multiple accounts.
+
         Returns:
             The computed date or None if the user balance is positive.
         """
-        balance = self.get_balance()
-        if balance >= 0:
-            # balance is already positive, return nothing
-            return None
-
-        # Loop over all transactions from new to old, while reversing the balance
-        transactions = Transaction.objects.filter_account(self).order_by("-moment")
-        for tx in transactions:
-            if tx.source == self:
-                balance += tx.amount
-            else:
-                balance -= tx.amount
-            # If balance is positive now, return the current transaction date
-            if balance >= 0:
-                return tx.moment
-        # This should not be reached, it would indicate that the starting balance was below 0
-        raise RuntimeError
+        return (
+            Account.objects.with_negative_since()
+            .values_list("negative_since_moment", flat=True)
+            .get(pk=self.pk)
+        )
 
     def __str__(self):
         if self.get_entity():
@@ -118,9 +269,47 @@ class Account(models.Model):
 
 
 class TransactionQuerySet(QuerySet):
-    def filter_account(self, account: Account):
-        """Filters transactions that have the given account as source or target."""
-        return self.filter(Q(source=account) | Q(target=account))
+    def filter_account(self, account: Account, extra: Q = Q()):
+        """Filters transactions that have the given account as source or target.
+
+        This is a union of the transactions with the account as source and
+        those with the account as target, so that each part can be served from
+        its (account, moment) index. Filters and select_related() need to be
+        applied before calling this, afterwards only ordering, slicing,
+        counting and iteration are possible.
+
+        Args:
+            account: The source or target account.
+            extra: An additional condition that is applied to each part.
+        """
+        qs = self.filter(extra)
+        return qs.filter(source=account).union(
+            qs.filter(target=account).exclude(source=account), all=True
+        )
+
+    def select_accounts(self):
+        """Joins the source and target accounts and their user or association.
+
+        The string representation of an account needs these.
+        """
+        return self.select_related(
+            "source__user", "source__association", "target__user", "target__association"
+        )
+
+    def bulk_create(self, objs, *args, **kwargs):
+        """Inserts the transactions and updates the balances and daily flows.
+
+        Everything happens in a single database transaction. Conflict handling
+        is not supported, because the balances are updated for all given
+        transactions.
+        """
+        if kwargs.get("ignore_conflicts") or kwargs.get("update_conflicts"):
+            raise ValueError("Transactions can't be bulk created with conflicts")
+        with transaction.atomic(using=self.db):
+            objs = super().bulk_create(objs, *args, **kwargs)
+            Account.objects.add_to_balances(objs)
+            DailyAccountFlow.objects.add_transactions(objs)
+        return objs
 
 
 class Transaction(models.Model):
@@ -143,13 +332,230 @@ class Transaction(models.Model):
 
     objects = TransactionQuerySet.as_manager()
 
+    class Meta:
+        indexes = [
+            # Used for ordering and for cursor pagination
+            models.Index(fields=["moment", "id"], name="transaction_moment_id_idx"),
+            # Used for the transactions of an account, see filter_account()
+            models.Index(
+                fields=["source", "moment"], name="transaction_source_moment_idx"
+            ),
+            models.Index(
+                fields=["target", "moment"], name="transaction_target_moment_idx"
+            ),
+        ]
+
+    def save(self, *args, **kwargs):
+        # Receivers update the account balances and daily flows after the
+        # insert. We use a database transaction so that the row and these are
+        # committed together.
+        with transaction.atomic(using=kwargs.get("using")):
+            super().save(*args, **kwargs)
+
     def reversal(self, reverted_by: User):
         """Returns a reversal transaction for this transaction (unsaved)."""
         return Transaction(
-            source=self.target,
-            target=self.source,
+            source_id=self.target_id,
+            target_id=self.source_id,
             amount=self.amount,
             # I'm undecided between 'revert' and 'refund'.
             description=f'Refund "{self.description}"',
             created_by=reverted_by,
         )
+
+
+class BalanceCheckpointManager(models.Manager):
+    def create_monthly(self) -> int:
+        """Creates checkpoints at the start of each month that has passed.
+
+        This continues from the latest checkpoint that exists, so it only needs
+        to process the transactions since then. Checkpoints are only created for
+        accounts that had transactions in the month before the checkpoint.
+
+        Only months that ended at least CHECKPOINT_MARGIN ago get a checkpoint,
+        because transactions that are recorded late could otherwise still end up
+        before it.
+
+        Returns:
+            The number of created checkpoints.
+        """
+        last = self.aggregate(moment=Max("moment"))["moment"]
+        if last is None:
+            first = Transaction.objects.aggregate(moment=Min("moment"))["moment"]
+            if first is None:
+                return 0
+            last = first.astimezone(timezone.get_default_timezone())
+            last = last.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+        # The balance of each account at the latest checkpoint
+        latest = self.filter(account=OuterRef("pk")).order_by("-moment")
+        balances = dict(
+            Account.objects.annotate(
+                checkpoint_balance=Subquery(latest.values("balance")[:1])
+            )
+            .filter(checkpoint_balance__isnull=False)
+            .values_list("pk", "checkpoint_balance")
+        )
+
+        created = 0
+        moment = _next_month(last)
+        while moment <= timezone.now() - CHECKPOINT_MARGIN:
+            period = Transaction.objects.filter(moment__gte=last, moment__lt=moment)
+            deltas = {}
+            for row in period.values("target").annotate(sum=Sum("amount")):
+                deltas[row["target"]] = deltas.get(row["target"], 0) + row["sum"]
+            for row in period.values("source").annotate(sum=Sum("amount")):
+                deltas[row["source"]] = deltas.get(row["source"], 0) - row["sum"]
+
+            checkpoints = []
+            for account_id, delta in deltas.items():
+                balances[account_id] = balances.get(account_id, 0) + delta
+                checkpoints.append(
+                    BalanceCheckpoint(
+                        account_id=account_id,
+                        moment=moment,
+                        balance=balances[account_id],
+                    )
+                )
+            self.bulk_create(checkpoints)
+            created += len(checkpoints)
+            last, moment = moment, _next_month(moment)
+        return created
+
+
+def _next_month(moment: datetime) -> datetime:
+    """Returns the start of the month after the given (local) moment."""
+    moment = timezone.localtime(moment).replace(tzinfo=None)
+    if moment.month == 12:
+        return timezone.make_aware(datetime(moment.year + 1, 1, 1))
+    return timezone.make_aware(datetime(moment.year, moment.month + 1, 1))
+
+
+class BalanceCheckpoint(models.Model):
+    """The balance of an account at a moment, i.e. the sum of earlier transactions.
+
+    Balance computations only need to sum the transactions from the moment of
+    the latest checkpoint. This assumes that transactions are never inserted
+    with a moment that lies before existing checkpoints, which holds because
+    the transaction moment defaults to the current time.
+
+    The checkpoints are created by the create_balance_checkpoints management
+    command. They can safely be deleted altogether.
+    """
+
+    account = models.ForeignKey(Account, on_delete=models.CASCADE)
+    moment = models.DateTimeField()
+    balance = models.DecimalField(decimal_places=2, max_digits=12)
+
+    objects = BalanceCheckpointManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["account", "moment"], name="unique_account_checkpoint"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.account} at {self.moment}: {self.balance}"
+
+
+class DailyAccountFlowManager(models.Manager):
+    def add_transactions(self, transactions: Iterable[Transaction]):
+        """Adds the amounts of new transactions to the daily flows.
+
+        Missing flows are inserted with one query, after which there is one
+        UPDATE query per day and distinct influx and outflux that is added.
+        """
+        deltas = {}
+        for tx in transactions:
+            day = timezone.localdate(tx.moment)
+            influx, outflux = deltas.get((tx.target_id, day), (0, 0))
+            deltas[(tx.target_id, day)] = (influx + tx.amount, outflux)
+            influx, outflux = deltas.get((tx.source_id, day), (0, 0))
+            deltas[(tx.source_id, day)] = (influx, outflux + tx.amount)
+        if not deltas:
+            return
+        # Flows that already exist (or are inserted concurrently) are skipped
+        self.bulk_create(
+            [DailyAccountFlow(account_id=a, date=d) for a, d in deltas],
+            ignore_conflicts=True,
+        )
+        accounts = defaultdict(list)
+        for (account_id, day), (influx, outflux) in deltas.items():
+            accounts[(day, influx, outflux)].append(account_id)
+        for (day, influx, outflux), account_ids in accounts.items():
+            self.filter(account_id__in=account_ids, date=day).update(
+                influx=F("influx") + influx, outflux=F("outflux") + outflux
+            )
+
+    def rebuild(self) -> int:
+        """Recreates all daily flows from the transactions.
+
+        Returns:
+            The number of created rows.
+        """
+        flows = {}
+        day = TruncDate("moment", tzinfo=timezone.get_current_timezone())
+        transactions = Transaction.objects.annotate(day=day)
+        for row in transactions.values("target", "day").annotate(sum=Sum("amount")):
+            flow = flows.setdefault(
+                (row["target"], row["day"]),
+                DailyAccountFlow(account_id=row["target"], date=row["day"]),
+            )
+            flow.influx = row["sum"]
+        for row in transactions.values("source", "day").annotate(sum=Sum("amount")):
+            flow = flows.setdefault(
+                (row["source"], row["day"]),
+                DailyAccountFlow(account_id=row["source"], date=row["day"]),
+            )
+            flow.outflux = row["sum"]
+        with transaction.atomic():
+            self.all().delete()
+            self.bulk_create(flows.values(), batch_size=1000)
+        return len(flows)
+
+    def get_flow(
+        self, account: Account, start: date, end: date
+    ) -> Tuple[Decimal, Decimal]:
+        """Returns the influx and outflux of an account between two dates.
+
+        Both dates are inclusive. A transfer from an account to itself counts as
+        both influx and outflux.
+        """
+        flow = self.filter(account=account, date__gte=start, date__lte=end).aggregate(
+            influx=Sum("influx"), outflux=Sum("outflux")
+        )
+        return flow["influx"] or Decimal("0.00"), flow["outflux"] or Decimal("0.00")
+
+
+class DailyAccountFlow(models.Model):
+    """The sum of the incoming and outgoing transactions of an account on a day.
+
+    Flow statistics for a date range only need to sum these rows instead of all
+    transactions. The rows are updated by a receiver when a transaction is
+    created, see creditmanagement.receivers, and can be recreated with the
+    rebuild_daily_flows management command.
+    """
+
+    account = models.ForeignKey(Account, on_delete=models.CASCADE)
+    # The day in the local time zone
+    date = models.DateField()
+    influx = models.DecimalField(
+        decimal_places=2, max_digits=12, default=Decimal("0.00")
+    )
+    outflux = models.DecimalField(
+        decimal_places=2, max_digits=12, default=Decimal("0.00")
+    )
+
+    objects = DailyAccountFlowManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["account", "date"], name="unique_account_date_flow"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.account} on {self.date}: +{self.influx} -{self.outflux}"
@@ -2,7 +2,7 @@ from django.db import DatabaseError
 from django.db.models.signals import post_migrate, post_save
 from django.dispatch import receiver
 
-from creditmanagement.models import Account
+from creditmanagement.models import Account, DailyAccountFlow, Transaction
 from userdetails.models import Association, User
 
 
@@ -18,6 +18,24 @@ def create_association_account(sender, instance, created, **kwargs):
         Account.objects.create(association=instance)
 
 
+@receiver(post_save, sender=Transaction)
+def update_account_balances(sender, instance, created, **kwargs):
+    """Adds a new transaction to the stored balance of its accounts.
+
+    Transactions are never changed after creation, so only inserts matter. This
+    also runs for transactions that are loaded from a fixture.
+    """
+    if created:
+        Account.objects.add_to_balances([instance])
+
+
+@receiver(post_save, sender=Transaction)
+def update_daily_flows(sender, instance, created, **kwargs):
+    """Adds a new transaction to the daily flows of its accounts."""
+    if created:
+        DailyAccountFlow.objects.add_transactions([instance])
+
+
 @receiver(post_migrate)
 def create_special_accounts(sender, **kwargs):
     """Ensures that the special bookkeeping accounts exist."""
@@ -0,0 +1,53 @@
+import csv
+from decimal import Decimal
+
+from django.test import TestCase
+
+from creditmanagement.csv import transactions_csv_response
+from creditmanagement.models import Account, Transaction
+from userdetails.models import Association, User
+
+
+class TransactionsCSVTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            "jan", email="jan@localhost", first_name="Jan"
+        )
+        cls.association = Association.objects.create(name="Quadrivium")
+        cls.kitchen = Account.objects.get(special="kitchen_cost")
+        for i in range(5):
+            Transaction.objects.create(
+                source=cls.user.account,
+                target=cls.kitchen,
+                amount=Decimal("0.50"),
+                description=f"Kitchen cost {i}",
+                created_by=cls.user,
+            )
+        Transaction.objects.create(
+            source=cls.association.account,
+            target=cls.user.account,
+            amount=Decimal("10.00"),
+            description="Deposit",
+            created_by=cls.user,
+        )
+
+    def test_streaming(self):
+        """Tests the content and that all rows are fetched in a single query."""
+        response = transactions_csv_response(
+            self.user.account,
+            "transactions.csv",
+        )
+        with self.assertNumQueries(1):
+            content = b"".join(response.streaming_content).decode()
+        rows = list(csv.reader(content.splitlines()))
+        self.assertEqual(len(rows), 7)
+        self.assertEqual(rows[0][:3], ["date", "direction", "account_type"])
+        self.assertEqual(
+            rows[1][1:7],
+            ["in", "association", "Quadrivium", "", "10.00", "Deposit"],
+        )
+        self.assertEqual(
+            rows[2][1:7],
+            ["out", "special", "Kitchen cost", "", "0.50", "Kitchen cost 4"],
+        )
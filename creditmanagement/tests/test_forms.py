@@ -0,0 +1,65 @@
+from decimal import Decimal
+
+from django.test import TestCase
+from django.utils import timezone
+
+from creditmanagement.forms import ClearOpenExpensesForm
+from creditmanagement.models import Transaction
+from userdetails.models import Association, User, UserMembership
+
+
+class ClearOpenExpensesFormTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.association = Association.objects.create(name="Quadrivium")
+        cls.board = User.objects.create_user("board", email="board@localhost")
+        cls.users = []
+        for i in range(3):
+            user = User.objects.create_user(f"user{i}", email=f"{i}@localhost")
+            UserMembership.objects.create(
+                related_user=user,
+                association=cls.association,
+                is_verified=True,
+                verified_on=timezone.now(),
+            )
+            cls.users.append(user)
+        # User 0 and 1 are negative, user 2 is positive
+        for user, amount in zip(cls.users, ["2.00", "0.50"]):
+            Transaction.objects.create(
+                source=user.account,
+                target=cls.association.account,
+                amount=Decimal(amount),
+                created_by=cls.board,
+            )
+        Transaction.objects.create(
+            source=cls.association.account,
+            target=cls.users[2].account,
+            amount=Decimal("1.00"),
+            created_by=cls.board,
+        )
+        # A non-member with negative balance is not included
+        Transaction.objects.create(
+            source=cls.board.account,
+            target=cls.association.account,
+            amount=Decimal("3.00"),
+            created_by=cls.board,
+        )
+
+    def test_transactions(self):
+        form = ClearOpenExpensesForm(association=self.association, user=self.board)
+        self.assertEqual(
+            sorted((tx.target.user.pk, tx.amount) for tx in form.transactions),
+            [(self.users[0].pk, Decimal("2.00")), (self.users[1].pk, Decimal("0.50"))],
+        )
+
+    def test_save(self):
+        form = ClearOpenExpensesForm(
+            {"description": "Q-rekening"}, association=self.association, user=self.board
+        )
+        form.save()
+        for user in self.users[:2]:
+            self.assertEqual(user.account.get_balance(), Decimal("0.00"))
+        self.assertEqual(self.association.account.get_balance(), Decimal("2.00"))
+        self.assertEqual(
+            Transaction.objects.filter(description="Q-rekening").count(), 2
+        )
@@ -1,8 +1,17 @@
+from datetime import date, datetime, timedelta
 from decimal import Decimal
+from unittest.mock import patch
 
 from django.test import TestCase
+from django.utils import timezone
 
-from creditmanagement.models import Account, Transaction
+from creditmanagement.models import (
+    CHECKPOINT_MARGIN,
+    Account,
+    BalanceCheckpoint,
+    DailyAccountFlow,
+    Transaction,
+)
 from userdetails.models import User
 
 
@@ -38,3 +47,258 @@ class CreditTestCase(TestCase):
         tx.reversal(self.u).save()
         self.assertEqual(self.a1.get_balance(), Decimal("0.00"))
         self.assertEqual(self.a2.get_balance(), Decimal("0.00"))
+
+    def test_negative_since(self):
+        """Tests negative_since when the balance went negative more than once."""
+        moments = [
+            timezone.make_aware(datetime(2022, 1, day, 12, 0)) for day in range(1, 5)
+        ]
+        for source, target, amount, moment in [
+            (self.a1, self.a2, "2.00", moments[0]),
+            (self.a2, self.a1, "5.00", moments[1]),
+            (self.a1, self.a2, "4.00", moments[2]),
+            (self.a1, self.a2, "1.50", moments[3]),
+        ]:
+            Transaction.objects.create(
+                source=source,
+                target=target,
+                amount=Decimal(amount),
+                moment=moment,
+                created_by=self.u,
+            )
+        self.assertEqual(self.a1.negative_since(), moments[2])
+        self.assertIsNone(self.a2.negative_since())
+
+    def test_with_negative_since(self):
+        """Tests the negative_since annotation for multiple accounts in one query."""
+        tx = Transaction.objects.create(
+            source=self.a1, target=self.a2, amount=Decimal("1.00"), created_by=self.u
+        )
+        with self.assertNumQueries(1):
+            accounts = {
+                a.pk: a.negative_since_moment
+                for a in Account.objects.with_negative_since().filter(
+                    pk__in=[self.a1.pk, self.a2.pk]
+                )
+            }
+        self.assertEqual(accounts, {self.a1.pk: tx.moment, self.a2.pk: None})
+
+    def test_balance_stored(self):
+        """Tests that the stored balance is updated when a transaction is made."""
+        Transaction.objects.create(
+            source=self.a1, target=self.a2, amount=Decimal("3.20"), created_by=self.u
+        )
+        self.a1.refresh_from_db()
+        self.a2.refresh_from_db()
+        self.assertEqual(self.a1.balance, Decimal("-3.20"))
+        self.assertEqual(self.a2.balance, Decimal("3.20"))
+
+    def test_balance_same_source_target(self):
+        """Tests that a transaction to the account itself does not change the balance."""
+        Transaction.objects.create(
+            source=self.a1, target=self.a1, amount=Decimal("3.20"), created_by=self.u
+        )
+        self.assertEqual(self.a1.get_balance(), Decimal("0.00"))
+
+    def test_balance_bulk_create(self):
+        """Tests that bulk created transactions are added to the stored balance."""
+        Transaction.objects.bulk_create(
+            [
+                Transaction(
+                    source=self.a1,
+                    target=self.a2,
+                    amount=Decimal("1.00"),
+                    created_by=self.u,
+                ),
+                Transaction(
+                    source=self.a1,
+                    target=self.a2,
+                    amount=Decimal("2.50"),
+                    created_by=self.u,
+                ),
+            ]
+        )
+        self.assertEqual(self.a1.get_balance(), Decimal("-3.50"))
+        self.assertEqual(self.a2.get_balance(), Decimal("3.50"))
+        self.assertEqual(self.a1.get_balance(), self.a1.compute_balance())
+
+    def test_recompute_balances(self):
+        """Tests that a drifted stored balance is fixed."""
+        Transaction.objects.create(
+            source=self.a1, target=self.a2, amount=Decimal("4.00"), created_by=self.u
+        )
+        Account.objects.filter(pk=self.a1.pk).update(balance=Decimal("10.00"))
+        self.assertEqual(Account.objects.recompute_balances(), 1)
+        self.assertEqual(self.a1.get_balance(), Decimal("-4.00"))
+        self.assertEqual(self.a2.get_balance(), Decimal("4.00"))
+
+    def test_recompute_balances_queries(self):
+        """Tests that correct balances are checked with grouped aggregates."""
+        for i in range(5):
+            Transaction.objects.create(
+                source=self.a1, target=self.a2, amount=Decimal(i), created_by=self.u
+            )
+        # Two aggregates and the stored balances, nothing is locked
+        with self.assertNumQueries(3):
+            self.assertEqual(Account.objects.recompute_balances(), 0)
+
+
+class BalanceCheckpointTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.a1 = Account.objects.create()
+        cls.a2 = Account.objects.create()
+        cls.u = User.objects.create(username="user")
+
+    def create_tx(self, source, target, amount, moment=None):
+        return Transaction.objects.create(
+            source=source,
+            target=target,
+            amount=Decimal(amount),
+            moment=moment or timezone.now(),
+            created_by=self.u,
+        )
+
+    def test_create_monthly(self):
+        """Tests that checkpoints are created for months with transactions."""
+        self.create_tx(
+            self.a2, self.a1, "10.00", datetime(2022, 1, 10, tzinfo=timezone.utc)
+        )
+        self.create_tx(
+            self.a1, self.a2, "3.00", datetime(2022, 2, 10, tzinfo=timezone.utc)
+        )
+        self.create_tx(self.a1, self.a2, "20.00")
+
+        self.assertEqual(BalanceCheckpoint.objects.create_monthly(), 4)
+        checkpoints = self.a1.balancecheckpoint_set.order_by("moment")
+        self.assertEqual(
+            [c.balance for c in checkpoints], [Decimal("10.00"), Decimal("7.00")]
+        )
+        self.assertEqual(
+            checkpoints[0].moment, timezone.make_aware(datetime(2022, 2, 1))
+        )
+        # Running again does not create new checkpoints
+        self.assertEqual(BalanceCheckpoint.objects.create_monthly(), 0)
+
+    def test_compute_balance(self):
+        """Tests that the computed balance equals the stored balance with checkpoints."""
+        self.create_tx(
+            self.a2, self.a1, "10.00", datetime(2022, 1, 10, tzinfo=timezone.utc)
+        )
+        BalanceCheckpoint.objects.create_monthly()
+        self.create_tx(self.a1, self.a2, "4.00")
+        self.assertEqual(self.a1.compute_balance(), Decimal("6.00"))
+        self.assertEqual(self.a2.compute_balance(), Decimal("-6.00"))
+
+    def test_create_monthly_margin(self):
+        """Tests that no checkpoint is created for a month that just ended."""
+        self.create_tx(
+            self.a2, self.a1, "10.00", datetime(2022, 1, 10, tzinfo=timezone.utc)
+        )
+        self.create_tx(
+            self.a1, self.a2, "3.00", datetime(2022, 2, 10, tzinfo=timezone.utc)
+        )
+        march = timezone.make_aware(datetime(2022, 3, 1))
+        with patch("django.utils.timezone.now", return_value=march + timedelta(1)):
+            self.assertEqual(BalanceCheckpoint.objects.create_monthly(), 2)
+        self.assertFalse(BalanceCheckpoint.objects.filter(moment=march).exists())
+        with patch("django.utils.timezone.now", return_value=march + CHECKPOINT_MARGIN):
+            self.assertEqual(BalanceCheckpoint.objects.create_monthly(), 2)
+
+    def test_recompute_balances_backdated(self):
+        """Tests that a transaction before the latest checkpoint is not a drift."""
+        self.create_tx(
+            self.a2, self.a1, "10.00", datetime(2022, 1, 10, tzinfo=timezone.utc)
+        )
+        BalanceCheckpoint.objects.create_monthly()
+        self.create_tx(
+            self.a1, self.a2, "4.00", datetime(2022, 1, 20, tzinfo=timezone.utc)
+        )
+        self.assertEqual(Account.objects.recompute_balances(), 0)
+        self.assertEqual(self.a1.get_balance(), Decimal("6.00"))
+        self.assertEqual(self.a1.compute_balance(use_checkpoint=False), Decimal("6.00"))
+
+    def test_negative_since(self):
+        """Tests negative_since with a checkpoint before the balance became negative."""
+        self.create_tx(
+            self.a2, self.a1, "10.00", datetime(2022, 1, 10, tzinfo=timezone.utc)
+        )
+        BalanceCheckpoint.objects.create_monthly()
+        tx = self.create_tx(self.a1, self.a2, "12.00")
+        self.assertEqual(self.a1.negative_since(), tx.moment)
+        self.assertIsNone(self.a2.negative_since())
+
+
+class DailyAccountFlowTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.a1 = Account.objects.create()
+        cls.a2 = Account.objects.create()
+        cls.u = User.objects.create(username="user")
+        # 23:30 UTC is already the next day in the local time zone
+        moments = [
+            datetime(2022, 1, 10, 12, tzinfo=timezone.utc),
+            datetime(2022, 1, 10, 23, 30, tzinfo=timezone.utc),
+            datetime(2022, 1, 12, 12, tzinfo=timezone.utc),
+        ]
+        for moment in moments:
+            Transaction.objects.create(
+                source=cls.a1,
+                target=cls.a2,
+                amount=Decimal("1.00"),
+                moment=moment,
+                created_by=cls.u,
+            )
+        Transaction.objects.bulk_create(
+            [
+                Transaction(
+                    source=cls.a2,
+                    target=cls.a1,
+                    amount=Decimal("5.00"),
+                    moment=moments[0],
+                    created_by=cls.u,
+                ),
+                Transaction(
+                    source=cls.a2,
+                    target=cls.a2,
+                    amount=Decimal("2.00"),
+                    moment=moments[0],
+                    created_by=cls.u,
+                ),
+            ]
+        )
+
+    def get_flows(self):
+        return list(
+            DailyAccountFlow.objects.order_by("account", "date").values_list(
+                "account", "date", "influx", "outflux"
+            )
+        )
+
+    def test_incremental(self):
+        self.assertEqual(
+            self.get_flows(),
+            [
+                (self.a1.pk, date(2022, 1, 10), Decimal("5.00"), Decimal("1.00")),
+                (self.a1.pk, date(2022, 1, 11), Decimal("0.00"), Decimal("1.00")),
+                (self.a1.pk, date(2022, 1, 12), Decimal("0.00"), Decimal("1.00")),
+                (self.a2.pk, date(2022, 1, 10), Decimal("3.00"), Decimal("7.00")),
+                (self.a2.pk, date(2022, 1, 11), Decimal("1.00"), Decimal("0.00")),
+                (self.a2.pk, date(2022, 1, 12), Decimal("1.00"), Decimal("0.00")),
+            ],
+        )
+
+    def test_rebuild(self):
+        flows = self.get_flows()
+        self.assertEqual(DailyAccountFlow.objects.rebuild(), 6)
+        self.assertEqual(self.get_flows(), flows)
+
+    def test_get_flow(self):
+        flow = DailyAccountFlow.objects.get_flow(
+            self.a1, date(2022, 1, 11), date(2022, 1, 12)
+        )
+        self.assertEqual(flow, (Decimal("0.00"), Decimal("2.00")))
+        flow = DailyAccountFlow.objects.get_flow(
+            self.a1, date(2021, 1, 1), date(2021, 12, 31)
+        )
+        self.assertEqual(flow, (Decimal("0.00"), Decimal("0.00")))
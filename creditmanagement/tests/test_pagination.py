@@ -0,0 +1,77 @@
+from datetime import datetime, timezone
+from decimal import Decimal
+from functools import partial
+
+from django.test import TestCase
+from django.urls import reverse
+
+from creditmanagement.models import Account, Transaction
+from general.pagination import CursorPaginator
+from userdetails.models import User
+
+
+class CursorPaginatorTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("jan")
+        kitchen = Account.objects.get(special="kitchen_cost")
+        # Pairs of transactions with the same moment, to test the tiebreaker
+        cls.transactions = [
+            Transaction.objects.create(
+                source=cls.user.account,
+                target=kitchen,
+                amount=Decimal("0.50"),
+                moment=datetime(2022, 1, 1 + i // 2, tzinfo=timezone.utc),
+                description=f"Kitchen cost {i}",
+                created_by=cls.user,
+            )
+            for i in range(7)
+        ]
+        cls.newest_first = cls.transactions[::-1]
+
+    def setUp(self):
+        self.paginator = CursorPaginator(
+            Transaction.objects.filter_account(self.user.account),
+            3,
+            filter_rows=partial(Transaction.objects.filter_account, self.user.account),
+        )
+
+    def test_forward_and_back(self):
+        page1 = self.paginator.get_page()
+        self.assertEqual(page1.object_list, self.newest_first[0:3])
+        self.assertFalse(page1.has_previous())
+        self.assertTrue(page1.has_next())
+
+        page2 = self.paginator.get_page(after=page1.next_cursor())
+        self.assertEqual(page2.object_list, self.newest_first[3:6])
+        self.assertTrue(page2.has_previous())
+
+        page3 = self.paginator.get_page(after=page2.next_cursor())
+        self.assertEqual(page3.object_list, self.newest_first[6:])
+        self.assertFalse(page3.has_next())
+        self.assertIsNone(page3.next_cursor())
+
+        back = self.paginator.get_page(before=page3.previous_cursor())
+        self.assertEqual(back.object_list, page2.object_list)
+        back = self.paginator.get_page(before=back.previous_cursor())
+        self.assertEqual(back.object_list, page1.object_list)
+        self.assertFalse(back.has_previous())
+
+    def test_invalid_cursor(self):
+        page = self.paginator.get_page(after="invalid")
+        self.assertEqual(page.object_list, self.newest_first[0:3])
+
+    def test_no_count_query(self):
+        cursor = self.paginator.get_page().next_cursor()
+        with self.assertNumQueries(1):
+            self.paginator.get_page(after=cursor)
+
+    def test_view(self):
+        self.client.force_login(self.user)
+        url = reverse("credits:transaction_list")
+        response = self.client.get(url)
+        self.assertEqual(list(response.context["object_list"]), self.newest_first)
+        cursor = self.paginator.get_cursor(self.newest_first[2])
+        response = self.client.get(url, {"after": cursor})
+        self.assertEqual(list(response.context["object_list"]), self.newest_first[3:])
+        self.assertContains(response, "?before=")
@@ -0,0 +1,12 @@
+from django.test import TestCase
+
+from utils.testing import QueryBudget, QueryBudgetTestMixin
+
+
+class CreditManagementQueryBudgetTestCase(QueryBudgetTestMixin, TestCase):
+    urlconf = "creditmanagement.urls"
+    budgets = [
+        QueryBudget("credits:transaction_list", 15),
+        QueryBudget("credits:transaction_add", 15),
+        QueryBudget("credits:transaction_csv", 4),
+    ]
@@ -1,22 +1,27 @@
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.http import HttpResponse, HttpResponseRedirect
+from django.db.models import Q
+from django.http import HttpResponseRedirect
 from django.urls import reverse_lazy
 from django.views.generic import FormView, View
 from django.views.generic.list import ListView
 
-from creditmanagement.csv import write_transactions_csv
+from creditmanagement.csv import transactions_csv_response
 from creditmanagement.forms import TransactionForm
 from creditmanagement.models import Account, Transaction
+from general.pagination import CursorPaginationMixin
 
 
-class TransactionListView(LoginRequiredMixin, ListView):
+class TransactionListView(LoginRequiredMixin, CursorPaginationMixin, ListView):
     template_name = "credit_management/transaction_history.html"
     paginate_by = 20
 
     def get_queryset(self):
-        return Transaction.objects.filter_account(self.request.user.account).order_by(
-            "-moment"
+        return self.filter_queryset(Q())
+
+    def filter_queryset(self, condition):
+        return Transaction.objects.select_accounts().filter_account(
+            self.request.user.account, condition
         )
 
 
@@ -24,13 +29,7 @@ class TransactionCSVView(LoginRequiredMixin, View):
     """Returns a CSV with transactions of the current user."""
 
     def get(self, request, *args, **kwargs):
-        response = HttpResponse(content_type="text/csv")
-        response["Content-Disposition"] = 'attachment; filename="user_transactions.csv"'
-        qs = Transaction.objects.filter_account(request.user.account).order_by(
-            "-moment"
-        )
-        write_transactions_csv(response, qs, request.user.account)
-        return response
+        return transactions_csv_response(request.user.account, "user_transactions.csv")
 
 
 class TransactionFormView(FormView):
@@ -0,0 +1,251 @@
+"""Decides what a user can do on dining lists.
+
+The checks need the owners and diner counts of the dining lists and the
+memberships and balance of the user. For display, the comment visits of the
+user are loaded as well. EligibilityEvaluator loads these once for
+a group of dining lists, so that the number of queries does not depend on the
+number of dining lists and checks.
+
+A check returns None when the action is allowed and otherwise a
+ValidationError with the reason as message and code. Forms can raise the error
+directly.
+"""
+from collections import defaultdict
+from datetime import datetime
+from functools import cached_property
+from typing import Dict, Iterable, List, Optional
+
+from django.conf import settings
+from django.db.models import Max
+from django.forms import ValidationError
+
+from creditmanagement.models import Account
+from dining.models import DiningCommentVisitTracker, DiningEntry, DiningList
+from userdetails.models import User, UserMembership
+
+
+class UserInfo:
+    """The memberships and balance of a user, needed for joining."""
+
+    def __init__(self, user: User):
+        memberships = UserMembership.objects.filter(related_user=user).values_list(
+            "association_id", "is_verified", "association__has_min_exception"
+        )
+        self.associations = set()
+        self.verified_associations = set()
+        self.has_min_balance_exception = False
+        for association_id, is_verified, has_min_exception in memberships:
+            self.associations.add(association_id)
+            if is_verified:
+                self.verified_associations.add(association_id)
+                self.has_min_balance_exception |= has_min_exception
+        self.balance = Account.objects.values_list("balance", flat=True).get(user=user)
+
+
+class DiningListStatus:
+    """The result of all checks on one dining list, for use in templates."""
+
+    def __init__(self, evaluator: "EligibilityEvaluator", dining_list: DiningList):
+        self.dining_list = dining_list
+        self.diner_count = evaluator.get_diner_count(dining_list)
+        self.entry = evaluator.get_entry(dining_list)
+        self.has_joined = self.entry is not None
+        self.join_error = evaluator.get_join_error(dining_list)
+        self.can_join = self.join_error is None
+        self.leave_error = (
+            evaluator.get_delete_error(self.entry) if self.entry else None
+        )
+        self.can_leave = self.has_joined and self.leave_error is None
+        self.can_add_others = evaluator.can_add_others(dining_list)
+        self.has_unread_comments = dining_list.has_unread_comments(
+            evaluator.get_comment_visit(dining_list)
+        )
+
+
+class EligibilityEvaluator:
+    """Evaluates the actions of a user on a group of dining lists.
+
+    Data is loaded on first use with one query for all dining lists, so
+    evaluating many dining lists costs a fixed number of queries. The data is
+    not refreshed, create a new evaluator for new checks.
+    """
+
+    def __init__(self, user: User, dining_lists: Iterable[DiningList]):
+        """Constructor.
+
+        Args:
+            user: The user performing the actions, e.g. joining or adding
+                someone else.
+            dining_lists: The dining lists that will be evaluated.
+        """
+        self.user = user
+        self.dining_lists = list(dining_lists)
+        self._user_info = {}
+
+    @cached_property
+    def owner_ids(self) -> Dict[int, set]:
+        """The user ids of the owners of each dining list."""
+        owners = DiningList.owners.through.objects.filter(
+            dininglist__in=self.dining_lists
+        ).values_list("dininglist_id", "user_id")
+        owner_ids = defaultdict(set)
+        for dining_list_id, user_id in owners:
+            owner_ids[dining_list_id].add(user_id)
+        return owner_ids
+
+    @cached_property
+    def diner_counts(self) -> Dict[int, int]:
+        """The number of entries on each dining list.
+
+        The stored counts are read again so that they are up-to-date.
+        """
+        return dict(
+            DiningList.objects.filter(
+                pk__in=[d.pk for d in self.dining_lists]
+            ).values_list("pk", "diner_count")
+        )
+
+    @cached_property
+    def entries(self) -> Dict[int, DiningEntry]:
+        """The internal entry of the user on each dining list, if present."""
+        dining_lists = {d.pk: d for d in self.dining_lists}
+        entries = {}
+        for entry in (
+            DiningEntry.objects.internal()
+            .filter(dining_list__in=self.dining_lists, user=self.user)
+            .order_by("pk")
+        ):
+            entry.dining_list = dining_lists[entry.dining_list_id]
+            entries.setdefault(entry.dining_list_id, entry)
+        return entries
+
+    @cached_property
+    def comment_visits(self) -> Dict[int, datetime]:
+        """The latest visit of the comments of each dining list by the user."""
+        return dict(
+            DiningCommentVisitTracker.objects.filter(
+                dining_list__in=[d for d in self.dining_lists if d.comment_count],
+                user=self.user,
+            )
+            .order_by()
+            .values("dining_list")
+            .annotate(timestamp=Max("timestamp"))
+            .values_list("dining_list", "timestamp")
+        )
+
+    def get_user_info(self, user: User) -> UserInfo:
+        if user.pk not in self._user_info:
+            self._user_info[user.pk] = UserInfo(user)
+        return self._user_info[user.pk]
+
+    def is_owner(self, dining_list: DiningList, user: User = None) -> bool:
+        user = user or self.user
+        return user.pk in self.owner_ids[dining_list.pk]
+
+    def get_diner_count(self, dining_list: DiningList) -> int:
+        return self.diner_counts.get(dining_list.pk, 0)
+
+    def has_room(self, dining_list: DiningList) -> bool:
+        return self.get_diner_count(dining_list) < dining_list.max_diners
+
+    def get_entry(self, dining_list: DiningList) -> Optional[DiningEntry]:
+        return self.entries.get(dining_list.pk)
+
+    def get_comment_visit(self, dining_list: DiningList) -> Optional[datetime]:
+        if not dining_list.comment_count:
+            # Not needed, avoids the query for lists without comments
+            return None
+        return self.comment_visits.get(dining_list.pk)
+
+    def get_join_error(
+        self, dining_list: DiningList, user: User = None
+    ) -> Optional[ValidationError]:
+        """Checks whether an entry can be added to the dining list.
+
+        Args:
+            dining_list: The dining list.
+            user: The user who will be on the entry and pays the kitchen cost.
+                Defaults to the evaluated user, i.e. joining yourself.
+        """
+        user = user or self.user
+        if not dining_list.is_adjustable():
+            return ValidationError(
+                "Dining list can no longer be adjusted", code="closed"
+            )
+
+        # Closed (exception for owner)
+        is_owner = self.is_owner(dining_list)
+        if not is_owner and not dining_list.is_open():
+            return ValidationError("Dining list is closed", code="closed")
+
+        # Full (exception for owner)
+        if not is_owner and not self.has_room(dining_list):
+            return ValidationError("Dining list is full", code="full")
+
+        info = self.get_user_info(user)
+        if dining_list.limit_signups_to_association_only:
+            # User should be verified association member, except when the entry creator is owner
+            if (
+                not is_owner
+                and dining_list.association_id not in info.verified_associations
+            ):
+                return ValidationError(
+                    "Dining list is limited to members only", code="members_only"
+                )
+
+        # User balance check
+        if (
+            not info.has_min_balance_exception
+            and info.balance < settings.MINIMUM_BALANCE_FOR_DINING_SIGN_UP
+        ):
+            return ValidationError(
+                "The balance of the user is too low to add", code="no_money"
+            )
+        return None
+
+    def get_delete_error(self, entry: DiningEntry) -> Optional[ValidationError]:
+        """Checks whether the evaluated user can delete the entry."""
+        dining_list = entry.dining_list
+        is_owner = self.is_owner(dining_list)
+
+        if not dining_list.is_adjustable():
+            return ValidationError(
+                "The dining list is locked, changes can no longer be made",
+                code="locked",
+            )
+
+        # Validate dining list is still open (except for claimant)
+        if not is_owner and not dining_list.is_open():
+            return ValidationError(
+                "The dining list is closed, ask the chef to remove this entry instead",
+                code="closed",
+            )
+
+        # Check permission: either she's owner, or the entry is about herself, or she created the entry
+        if (
+            not is_owner
+            and entry.user_id != self.user.pk
+            and entry.created_by_id != self.user.pk
+        ):
+            return ValidationError("Can only delete own entries", code="not_owner")
+        return None
+
+    def can_add_others(self, dining_list: DiningList) -> bool:
+        """Whether the evaluated user can add others on the dining list.
+
+        This is not thoroughly tested for correctness, but that is not needed since
+        it's only for view usage.
+        """
+        is_adjustable = dining_list.is_adjustable()
+        is_owner = self.is_owner(dining_list)
+        has_room = dining_list.is_open() and self.has_room(dining_list)
+        limited = (
+            dining_list.limit_signups_to_association_only
+            and dining_list.association_id
+            not in self.get_user_info(self.user).associations
+        )
+        return is_adjustable and (is_owner or (has_room and not limited))
+
+    def get_statuses(self) -> List[DiningListStatus]:
+        """Returns the result of all checks for each dining list."""
+        return [DiningListStatus(self, d) for d in self.dining_lists]
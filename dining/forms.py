@@ -1,29 +1,33 @@
 from datetime import timedelta
 from decimal import ROUND_UP, Decimal
-from typing import Dict, List, Literal
+from typing import Dict, Iterable, List, Literal
 
 from dal_select2.widgets import ModelSelect2, ModelSelect2Multiple
 from django import forms
 from django.conf import settings
-from django.core import mail
 from django.core.mail import EmailMessage
 from django.core.serializers import serialize
 from django.core.validators import MinValueValidator
 from django.db import transaction
-from django.db.models import Exists, OuterRef, QuerySet
+from django.db.models import Exists, OuterRef, prefetch_related_objects
 from django.forms import ValidationError
 from django.utils import timezone
+from django.utils.functional import cached_property
 
 from creditmanagement.models import Account, Transaction
+from dining.eligibility import EligibilityEvaluator
 from dining.models import (
+    DailyDiningStats,
     DeletedList,
     DiningComment,
     DiningEntry,
     DiningList,
     PaymentReminderLock,
 )
+from dining.receivers import deleting_dining_list
 from general.forms import ConcurrenflictFormMixin
 from general.mail_control import construct_templated_mail
+from general.models import OutgoingMail
 from general.util import SelectWithDisabled
 from userdetails.models import Association, User, UserMembership
 
@@ -37,6 +41,7 @@ __all__ = [
     "DiningListDeleteForm",
     "DiningCommentForm",
     "SendReminderForm",
+    "send_payment_reminders",
 ]
 
 
@@ -321,46 +326,24 @@ class DiningEntryInternalForm(forms.ModelForm):
         user = self.get_user()
         creator = self.instance.created_by
 
-        # Adjustable
-        if not dining_list.is_adjustable():
-            raise ValidationError(
-                "Dining list can no longer be adjusted", code="closed"
-            )
-
-        # Closed (exception for owner)
-        if not dining_list.is_owner(creator) and not dining_list.is_open():
-            raise ValidationError("Dining list is closed", code="closed")
-
-        # Full (exception for owner)
-        if not dining_list.is_owner(creator) and not dining_list.has_room():
-            raise ValidationError("Dining list is full", code="full")
-
-        if dining_list.limit_signups_to_association_only:
-            # User should be verified association member, except when the entry creator is owner
-            if not dining_list.is_owner(creator) and not user.is_verified_member_of(
-                dining_list.association
-            ):
-                raise ValidationError(
-                    "Dining list is limited to members only", code="members_only"
-                )
-
-        # User balance check
-        if (
-            not user.has_min_balance_exception()
-            and user.account.get_balance() < settings.MINIMUM_BALANCE_FOR_DINING_SIGN_UP
-        ):
-            raise ValidationError(
-                "The balance of the user is too low to add", code="no_money"
-            )
+        evaluator = EligibilityEvaluator(creator, [dining_list])
+        error = evaluator.get_join_error(dining_list, user)
+        if error:
+            raise error
 
         return cleaned_data
 
     def save(self, commit=True):
-        """Creates a kitchen cost transaction and saves the entry."""
+        """Creates a kitchen cost transaction and saves the entry.
+
+        Raises:
+            ValidationError: When the dining list has become full.
+        """
         instance = super().save(commit=False)  # type: DiningEntry
         if commit:
             with transaction.atomic():
-                amount = instance.dining_list.kitchen_cost
+                dining_list = instance.dining_list
+                amount = dining_list.kitchen_cost
                 # Skip transaction if dining list is free
                 if amount != Decimal("0.00"):
                     tx = Transaction.objects.create(
@@ -371,6 +354,15 @@ class DiningEntryInternalForm(forms.ModelForm):
                         created_by=instance.created_by,
                     )
                     instance.transaction = tx
+                # The capacity is checked again, because the list might have
+                # become full since clean(). The owner can always add diners.
+                # The list is locked after the transaction so that the rows
+                # are locked in the same order as when an entry is deleted.
+                check_capacity = not dining_list.is_owner(instance.created_by)
+                if check_capacity and not DiningList.objects.lock_if_not_full(
+                    dining_list.pk
+                ):
+                    raise ValidationError("Dining list is full", code="full")
                 instance.save()
         return instance
 
@@ -405,29 +397,10 @@ class DiningEntryDeleteForm(forms.Form):
     def clean(self):
         cleaned_data = super().clean()
 
-        dining_list = self.entry.dining_list
-        is_owner = dining_list.is_owner(self.deleter)
-
-        if not dining_list.is_adjustable():
-            raise ValidationError(
-                "The dining list is locked, changes can no longer be made",
-                code="locked",
-            )
-
-        # Validate dining list is still open (except for claimant)
-        if not is_owner and not dining_list.is_open():
-            raise ValidationError(
-                "The dining list is closed, ask the chef to remove this entry instead",
-                code="closed",
-            )
-
-        # Check permission: either she's owner, or the entry is about herself, or she created the entry
-        if (
-            not is_owner
-            and self.entry.user != self.deleter
-            and self.entry.created_by != self.deleter
-        ):
-            raise ValidationError("Can only delete own entries", code="not_owner")
+        evaluator = EligibilityEvaluator(self.deleter, [self.entry.dining_list])
+        error = evaluator.get_delete_error(self.entry)
+        if error:
+            raise error
 
         return cleaned_data
 
@@ -469,11 +442,24 @@ class DiningListDeleteForm(forms.ModelForm):
         return cleaned_data
 
     def execute(self, deleted_by):
-        """Deletes the dining list."""
+        """Deletes the dining list.
+
+        The entries are handled in bulk: all kitchen costs are refunded with a
+        single insert and the statistics are updated once, independent of the
+        number of entries. The checks of DiningEntryDeleteForm are not repeated for each entry, the
+        dining list is adjustable and only owners can delete it (see
+        SlotDeleteView), so each entry can be deleted.
+        """
         if self.errors:
             raise ValueError("Form didn't validate")
 
         with transaction.atomic():
+            entries = list(
+                self.instance.dining_entries.select_related("transaction").order_by(
+                    "pk"
+                )
+            )
+
             # Create audit log entry
             DeletedList.objects.create(
                 deleted_by=deleted_by,
@@ -481,20 +467,23 @@ class DiningListDeleteForm(forms.ModelForm):
                 json_list=serialize(
                     "json", DiningList.objects.filter(pk=self.instance.pk)
                 ),
-                json_diners=serialize("json", self.instance.dining_entries.all()),
+                json_diners=serialize("json", entries),
             )
 
-            # Delete entries
-            for entry in self.instance.dining_entries.all():
-                form = DiningEntryDeleteForm(entry, deleted_by, {})
-                if not form.is_valid():
-                    raise RuntimeError(
-                        "Could not validate dining entry while deleting a dining list"
-                    )
-                form.execute()
+            # Refund kitchen costs
+            Transaction.objects.bulk_create(
+                [e.transaction.reversal(deleted_by) for e in entries if e.transaction]
+            )
 
-            # Delete dining list
-            self.instance.delete()
+            # Delete the entries and the dining list. The per-entry receivers
+            # are skipped, instead the statistics are updated once.
+            deltas = DailyDiningStats.objects.list_deltas(self.instance)
+            with deleting_dining_list():
+                DiningEntry.objects.filter(dining_list=self.instance).delete()
+                self.instance.delete()
+            DailyDiningStats.objects.add(
+                self.instance.date, self.instance.association_id, **deltas
+            )
 
     def execute_and_notify(self, request, day_view_url):
         """Deletes the dining list and notifies diners.
@@ -526,7 +515,7 @@ class DiningListDeleteForm(forms.ModelForm):
         with transaction.atomic():
             # Delete and inform the diners
             self.execute(deleted_by)
-            mail.get_connection().send_messages(messages)
+            OutgoingMail.objects.queue(messages)
 
 
 class DiningCommentForm(forms.ModelForm):
@@ -539,18 +528,72 @@ class DiningCommentForm(forms.ModelForm):
         fields = ["message"]
 
 
+class ReminderRecipients:
+    """The diners of a dining list who have not yet paid."""
+
+    def __init__(self):
+        # Users who need to pay themselves
+        self.users = []  # type: List[User]
+        # Users with the names of their guests who need to pay
+        self.guests = {}  # type: Dict[User, List[str]]
+
+    def __bool__(self):
+        return bool(self.users or self.guests)
+
+
+def get_reminder_recipients(
+    dining_lists: Iterable[DiningList],
+) -> Dict[int, ReminderRecipients]:
+    """Finds the unpaid diners of many dining lists with a single query.
+
+    Returns:
+        A dictionary from dining list id to the recipients.
+    """
+    dining_lists = list(dining_lists)
+    recipients = {d.pk: ReminderRecipients() for d in dining_lists}
+    entries = (
+        DiningEntry.objects.filter(dining_list__in=dining_lists, has_paid=False)
+        .select_related("user")
+        .order_by("pk")
+    )
+    for entry in entries:
+        r = recipients[entry.dining_list_id]
+        if entry.is_internal():
+            r.users.append(entry.user)
+        else:
+            r.guests.setdefault(entry.user, []).append(entry.get_name())
+    return recipients
+
+
 class SendReminderForm(forms.Form):
-    def __init__(self, *args, dining_list: DiningList = None, **kwargs):
+    def __init__(
+        self,
+        *args,
+        dining_list: DiningList = None,
+        recipients: ReminderRecipients = None,
+        **kwargs,
+    ):
+        """Constructor.
+
+        Args:
+            dining_list: The dining list.
+            recipients: The unpaid diners, if already known. Found using the
+                database otherwise.
+        """
         if dining_list is None:
             raise ValueError("dining_list is required")
         self.dining_list = dining_list
+        if recipients is not None:
+            self.recipients = recipients
         super().__init__(*args, **kwargs)
 
+    @cached_property
+    def recipients(self) -> ReminderRecipients:
+        return get_reminder_recipients([self.dining_list])[self.dining_list.pk]
+
     def clean(self):
         # Verify that there are people to inform
-        if not DiningEntry.objects.filter(
-            dining_list=self.dining_list, has_paid=False
-        ).exists():
+        if not self.recipients:
             raise ValidationError(
                 "There was nobody to inform, everybody has paid", code="all_paid"
             )
@@ -559,16 +602,9 @@ class SendReminderForm(forms.Form):
                 "There was no payment url defined", code="payment_url_missing"
             )
 
-    def get_user_recipients(self) -> QuerySet:
-        """Returns the users that need to pay themselves, excluding external entries.
-
-        Returns:
-            A QuerySet of User instances.
-        """
-        unpaid_user_entries = self.dining_list.internal_dining_entries().filter(
-            has_paid=False
-        )
-        return User.objects.filter(diningentry__in=unpaid_user_entries)
+    def get_user_recipients(self) -> List[User]:
+        """Returns the users that need to pay themselves, excluding external entries."""
+        return self.recipients.users
 
     def get_guest_recipients(self) -> Dict[User, List[str]]:
         """Returns external diners who have not yet paid.
@@ -577,24 +613,23 @@ class SendReminderForm(forms.Form):
             A dictionary from User to a list of guest names who were added by
             the user.
         """
-        unpaid_guest_entries = self.dining_list.external_dining_entries().filter(
-            has_paid=False
-        )
+        return self.recipients.guests
+
+    def construct_messages(
+        self, request=None, reminder: User = None
+    ) -> List[EmailMessage]:
+        """Constructs the emails to send.
 
-        recipients = {}
-        for user in User.objects.filter(
-            diningentry__in=unpaid_guest_entries
-        ).distinct():
-            recipients[user] = [
-                e.get_name() for e in unpaid_guest_entries.filter(user=user)
-            ]
-        return recipients
-
-    def construct_messages(self, request) -> List[EmailMessage]:
-        """Constructs the emails to send."""
+        Args:
+            request: Used for the site URL and the context processors.
+            reminder: The user who asks to pay, defaults to the request user.
+        """
         messages = []
 
+        reminder = reminder or request.user
         is_reminder = timezone.now().date() > self.dining_list.date
+        # The mail templates show the owners and association
+        prefetch_related_objects([self.dining_list], "association", "owners")
 
         # Mail for internal diners
         messages.extend(
@@ -603,7 +638,7 @@ class SendReminderForm(forms.Form):
                 self.get_user_recipients(),
                 context={
                     "dining_list": self.dining_list,
-                    "reminder": request.user,
+                    "reminder": reminder,
                     "is_reminder": is_reminder,
                 },
                 request=request,
@@ -618,7 +653,7 @@ class SendReminderForm(forms.Form):
                     user,
                     context={
                         "dining_list": self.dining_list,
-                        "reminder": request.user,
+                        "reminder": reminder,
                         "is_reminder": is_reminder,
                         "guests": guests,
                     },
@@ -658,8 +693,45 @@ class SendReminderForm(forms.Form):
                 # A mail was sent too recently.
                 return False
             else:
-                # Update the lock and send the emails.
+                # Update the lock and queue the emails.
                 lock.sent = timezone.now()
                 lock.save()
-                mail.get_connection().send_messages(self.construct_messages(request))
+                OutgoingMail.objects.queue(self.construct_messages(request))
                 return True
+
+
+def send_payment_reminders(
+    dining_lists: Iterable[DiningList], reminder: User = None, request=None
+) -> int:
+    """Queues payment reminders for many dining lists at once.
+
+    The unpaid diners of all dining lists are found with one query. Dining
+    lists without payment link or without unpaid diners are skipped. Unlike
+    SendReminderForm.send_reminder(), this doesn't rate-limit.
+
+    Args:
+        dining_lists: The dining lists.
+        reminder: The user who asks to pay, defaults to the first owner of each
+            dining list or the association when it has no owners.
+        request: Used for the site URL and the context processors, optional.
+
+    Returns:
+        The number of dining lists for which reminders were queued.
+    """
+    dining_lists = list(dining_lists)
+    prefetch_related_objects(dining_lists, "association", "owners")
+    recipients = get_reminder_recipients(dining_lists)
+    messages = []
+    count = 0
+    for dining_list in dining_lists:
+        form = SendReminderForm(
+            {}, dining_list=dining_list, recipients=recipients[dining_list.pk]
+        )
+        if not form.is_valid():
+            continue
+        owners = dining_list.owners.all()
+        sender = reminder or (owners[0] if owners else dining_list.association)
+        messages.extend(form.construct_messages(request, sender))
+        count += 1
+    OutgoingMail.objects.queue(messages)
+    return count
@@ -0,0 +1,309 @@
+import random
+import statistics
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import timedelta
+from decimal import Decimal
+from typing import Dict, List
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from django.utils import timezone
+
+from creditmanagement.models import Account, Transaction
+from dining.datesequence import sequenced_date
+from dining.models import DiningEntry, DiningList
+from userdetails.models import Association, User, UserMembership
+
+# Statements that take row locks, see RequestStats
+WRITES = ("INSERT", "UPDATE", "DELETE")
+
+
+class RequestStats:
+    """Measurements of a single request."""
+
+    def __init__(self, kind: str, dining_list: DiningList):
+        self.kind = kind
+        self.dining_list = dining_list
+        self.duration = 0.0
+        self.queries = 0
+        self.lock_time = 0.0
+        self.outcome = None
+        self.error = None
+
+    def __call__(self, execute, sql, params, many, context):
+        """Database execute wrapper, counts the queries of the request.
+
+        The time spent in statements that take row locks is recorded as lock
+        time: all writes and SELECT ... FOR UPDATE, including the wait for the
+        locks. For a sign-up, the first of these is the kitchen cost
+        transaction, which locks the shared kitchen cost account row, followed
+        by the dining list row.
+        """
+        self.queries += 1
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            statement = sql.lstrip().upper()
+            if statement.startswith(WRITES) or "FOR UPDATE" in statement:
+                self.lock_time += time.perf_counter() - start
+
+
+class Command(BaseCommand):
+    help = (
+        "Simulates the rush before the sign up deadline: many members concurrently "
+        "sign up and sign out on the dining lists of a day using the Django test "
+        "client. Reports throughput, latency, query counts, lock times and "
+        "capacity violations. Needs PostgreSQL, SQLite locks the whole database "
+        "on each write. The seeded data is kept, so use a throwaway database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=200)
+        parser.add_argument("--lists", type=int, default=4)
+        parser.add_argument(
+            "--max-diners", type=int, default=40, help="Maximum of each list."
+        )
+        parser.add_argument("--threads", type=int, default=16)
+        parser.add_argument(
+            "--requests", type=int, default=50, help="Number of requests per thread."
+        )
+        parser.add_argument("--seed", type=int, default=None)
+
+    def handle(self, *args, **options):
+        if connection.vendor == "sqlite":
+            raise CommandError(
+                "SQLite locks the whole database on each write, so concurrent "
+                "sign-ups fail instead of waiting. Use a PostgreSQL database."
+            )
+        random.seed(options["seed"])
+        setup_test_environment()
+        try:
+            dining_lists, users = self.seed(
+                options["users"], options["lists"], options["max_diners"]
+            )
+            stats = self.run(
+                dining_lists, users, options["threads"], options["requests"]
+            )
+            self.report(dining_lists, stats)
+        finally:
+            teardown_test_environment()
+
+    def seed(self, user_count: int, list_count: int, max_diners: int):
+        """Creates the open dining lists of a day and their members.
+
+        Each user is a verified member of one of the associations and has a
+        balance, like the regular diners of a real dining day.
+        """
+        tag = "loadtest{}".format(int(time.time()))
+        self.stdout.write(
+            f"Seeding {list_count} dining lists and {user_count} members ({tag})"
+        )
+        day = sequenced_date.upcoming()
+        owner = User.objects.create_user(f"{tag}_owner", f"{tag}_owner@example.com")
+        associations, dining_lists = [], []
+        for i in range(list_count):
+            association = Association.objects.create(
+                name=f"{tag} {i}", slug=f"{tag}{i}"
+            )
+            dining_list = DiningList.objects.create(
+                date=day,
+                association=association,
+                sign_up_deadline=timezone.now() + timedelta(hours=1),
+                max_diners=max_diners,
+                kitchen_cost=Decimal("0.50"),
+            )
+            dining_list.owners.add(owner)
+            associations.append(association)
+            dining_lists.append(dining_list)
+
+        users = []
+        for i in range(user_count):
+            # Hashing passwords is slow and not needed for force_login()
+            user = User(username=f"{tag}_{i}", email=f"{tag}_{i}@example.com")
+            user.set_unusable_password()
+            user.save()
+            users.append(user)
+        UserMembership.objects.bulk_create(
+            UserMembership(
+                related_user=user,
+                association=associations[i % list_count],
+                is_verified=True,
+                verified_on=timezone.now(),
+            )
+            for i, user in enumerate(users)
+        )
+        accounts = dict(
+            Account.objects.filter(user__in=users).values_list("user", "pk")
+        )
+        Transaction.objects.bulk_create(
+            Transaction(
+                source_id=associations[i % list_count].account.pk,
+                target_id=accounts[user.pk],
+                amount=Decimal(random.randint(5, 50)),
+                description="Deposit",
+                created_by=owner,
+            )
+            for i, user in enumerate(users)
+        )
+        return dining_lists, users
+
+    def run(
+        self,
+        dining_lists: List[DiningList],
+        users: List[User],
+        threads: int,
+        requests: int,
+    ) -> List[RequestStats]:
+        """Fires the requests from all threads at the same time."""
+        clients = {}
+        for user in users:
+            clients[user.pk] = Client()
+            clients[user.pk].force_login(user)
+
+        stats = []
+        barrier = threading.Barrier(threads + 1)
+
+        def worker(own_users: List[User]):
+            try:
+                barrier.wait()
+                for _ in range(requests):
+                    user = random.choice(own_users)
+                    dining_list = random.choice(dining_lists)
+                    stats.append(self.toggle(dining_list, user, clients[user.pk]))
+            finally:
+                connection.close()
+
+        # Each user is used by a single thread, so that its entries are known
+        pool = [
+            threading.Thread(target=worker, args=(users[i::threads],))
+            for i in range(threads)
+        ]
+        for thread in pool:
+            thread.start()
+        self.stdout.write(f"Running {threads} threads with {requests} requests each")
+        barrier.wait()
+        self.start = time.perf_counter()
+        for thread in pool:
+            thread.join()
+        self.duration = time.perf_counter() - self.start
+        return stats
+
+    def toggle(self, dining_list: DiningList, user: User, client: Client):
+        """Signs the user up, or out when the user already has an entry.
+
+        The outcome is determined from the database afterwards, also when the
+        request failed, so that it matches what was committed.
+        """
+        entries = DiningEntry.objects.internal().filter(
+            dining_list=dining_list, user=user
+        )
+        entry_pk = entries.values_list("pk", flat=True).first()
+        if entry_pk:
+            request = RequestStats("sign-out", dining_list)
+            url = reverse("entry_delete", kwargs={"pk": entry_pk})
+            data = {}
+        else:
+            request = RequestStats("sign-up", dining_list)
+            url = reverse(
+                "entry_add",
+                kwargs={
+                    "year": dining_list.date.year,
+                    "month": dining_list.date.month,
+                    "day": dining_list.date.day,
+                    "identifier": dining_list.association.slug,
+                },
+            )
+            data = {"user": str(user.pk)}
+
+        start = time.perf_counter()
+        try:
+            with connection.execute_wrapper(request):
+                client.post(url, data)
+        except Exception as e:
+            request.error = type(e).__name__
+        request.duration = time.perf_counter() - start
+
+        joined = entries.exists()
+        if request.kind == "sign-up":
+            request.outcome = "joined" if joined else "rejected"
+        else:
+            request.outcome = "rejected" if joined else "left"
+        return request
+
+    def report(self, dining_lists: List[DiningList], stats: List[RequestStats]):
+        self.stdout.write(
+            self.style.MIGRATE_HEADING(f"Results ({connection.vendor} database)")
+        )
+        self.stdout.write(
+            "{} requests in {:.2f} s: {:.1f} requests/s".format(
+                len(stats), self.duration, len(stats) / self.duration
+            )
+        )
+
+        by_kind: Dict[str, List[RequestStats]] = defaultdict(list)
+        for request in stats:
+            by_kind[request.kind].append(request)
+        for kind, requests in sorted(by_kind.items()):
+            self.stdout.write(self.style.HTTP_INFO(kind))
+            outcomes = Counter(r.outcome for r in requests)
+            self.stdout.write(
+                "  outcomes: "
+                + ", ".join(f"{k} {v}" for k, v in sorted(outcomes.items()))
+            )
+            errors = Counter(r.error for r in requests if r.error)
+            if errors:
+                self.stdout.write(
+                    self.style.ERROR(
+                        "  errors: "
+                        + ", ".join(f"{k} {v}" for k, v in sorted(errors.items()))
+                    )
+                )
+            self.stdout.write(
+                "  latency: " + self.percentiles([r.duration for r in requests])
+            )
+            self.stdout.write(
+                "  lock time: " + self.percentiles([r.lock_time for r in requests])
+            )
+            queries = [r.queries for r in requests]
+            self.stdout.write(
+                "  queries: mean {:.1f}, max {}".format(
+                    statistics.mean(queries), max(queries)
+                )
+            )
+
+        consistent = True
+        for dining_list in dining_lists:
+            dining_list.refresh_from_db()
+            entries = dining_list.dining_entries.count()
+            self.stdout.write(
+                "{}: entries {}, stored diner count {}, max diners {}".format(
+                    dining_list.association.slug,
+                    entries,
+                    dining_list.diner_count,
+                    dining_list.max_diners,
+                )
+            )
+            if entries > dining_list.max_diners:
+                self.stdout.write(self.style.ERROR("  Capacity violated"))
+                consistent = False
+            if entries != dining_list.diner_count:
+                self.stdout.write(self.style.ERROR("  Stored diner count has drifted"))
+                consistent = False
+        if consistent:
+            self.stdout.write(self.style.SUCCESS("No capacity violations"))
+
+    @staticmethod
+    def percentiles(durations: List[float]) -> str:
+        """Formats the p50, p95 and p99 of the durations in milliseconds."""
+        if len(durations) < 2:
+            durations = durations * 2
+        q = statistics.quantiles(durations, n=100, method="inclusive")
+        return "p50 {:.1f} ms, p95 {:.1f} ms, p99 {:.1f} ms".format(
+            q[49] * 1000, q[94] * 1000, q[98] * 1000
+        )
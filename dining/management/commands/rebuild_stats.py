@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from dining.models import DailyDiningStats
+
+
+class Command(BaseCommand):
+    help = "Recreates the daily dining statistics from all dining lists."
+
+    def handle(self, *args, **options):
+        created = DailyDiningStats.objects.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Created {created} daily stat(s)"))
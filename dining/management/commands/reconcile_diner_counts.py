@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from dining.models import DiningList
+
+
+class Command(BaseCommand):
+    help = (
+        "Corrects the stored diner count and comment count of dining lists using "
+        "the entries and comments."
+    )
+
+    def handle(self, *args, **options):
+        fixed = DiningList.objects.reconcile_diner_counts()
+        self.stdout.write(self.style.SUCCESS(f"Corrected {fixed} diner count(s)"))
+        fixed = DiningList.objects.reconcile_comment_counts()
+        self.stdout.write(self.style.SUCCESS(f"Corrected {fixed} comment count(s)"))
@@ -0,0 +1,66 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from dining.forms import send_payment_reminders
+from dining.models import DiningList, PaymentReminderLock
+
+
+class Command(BaseCommand):
+    help = (
+        "Queues payment reminders for all dining lists past their date that have "
+        "a payment link and unpaid entries. A dining list is reminded at most "
+        "once per interval. Run it daily, e.g. from cron, and run "
+        "send_queued_mail to deliver the mails."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=7,
+            help="Minimum number of days between reminders of a list (default: 7).",
+        )
+        parser.add_argument(
+            "--max-age",
+            type=int,
+            default=30,
+            help="Lists older than this number of days are skipped (default: 30).",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only list the dining lists that would be reminded.",
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            # Lists that are being reminded using the button are skipped, they
+            # will be reminded in the next run when still needed.
+            dining_lists = list(
+                DiningList.objects.due_payment_reminders(
+                    interval=timedelta(days=options["interval"]),
+                    max_age=timedelta(days=options["max_age"]),
+                )
+                .select_for_update(skip_locked=True, of=("self",))
+                .order_by("date", "pk")
+            )
+            if options["dry_run"]:
+                for dining_list in dining_lists:
+                    self.stdout.write(str(dining_list))
+                self.stdout.write(f"{len(dining_lists)} dining list(s) are due")
+                return
+
+            count = send_payment_reminders(dining_lists)
+            now = timezone.now()
+            PaymentReminderLock.objects.bulk_create(
+                [PaymentReminderLock(dining_list=d, sent=now) for d in dining_lists],
+                update_conflicts=True,
+                unique_fields=["dining_list"],
+                update_fields=["sent"],
+            )
+        self.stdout.write(
+            self.style.SUCCESS(f"Queued reminders for {count} dining list(s)")
+        )
@@ -0,0 +1,37 @@
+# Generated by Django 4.1.4 on 2026-10-17 06:26
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_diners(apps, schema_editor):
+    """Fills the diner count using the existing entries."""
+    DiningEntry = apps.get_model("dining", "DiningEntry")
+    DiningList = apps.get_model("dining", "DiningList")
+
+    entries = (
+        DiningEntry.objects.filter(dining_list=OuterRef("pk"))
+        .order_by()
+        .values("dining_list")
+        .annotate(count=Count("pk"))
+        .values("count")
+    )
+    DiningList.objects.update(diner_count=Coalesce(Subquery(entries), 0))
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("dining", "0028_alter_dininglist_payment_link"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="dininglist",
+            name="diner_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(
+            count_diners, reverse_code=migrations.RunPython.noop, elidable=True
+        ),
+    ]
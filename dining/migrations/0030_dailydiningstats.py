@@ -0,0 +1,96 @@
+# Generated by Django 4.1.4 on 2026-10-17 06:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Exists, OuterRef, Q
+
+
+def create_stats(apps, schema_editor):
+    """Fills the daily statistics using the existing dining lists."""
+    DailyDiningStats = apps.get_model("dining", "DailyDiningStats")
+    DiningEntry = apps.get_model("dining", "DiningEntry")
+    DiningList = apps.get_model("dining", "DiningList")
+    UserMembership = apps.get_model("userdetails", "UserMembership")
+
+    stats = {}
+    for row in (
+        DiningList.objects.order_by()
+        .values("date", "association")
+        .annotate(count=Count("pk"))
+    ):
+        stats[(row["date"], row["association"])] = DailyDiningStats(
+            date=row["date"],
+            association_id=row["association"],
+            lists_claimed=row["count"],
+        )
+    own_member = UserMembership.objects.filter(
+        related_user=OuterRef("user"),
+        association=OuterRef("dining_list__association"),
+        is_verified=True,
+    )
+    entries = (
+        DiningEntry.objects.order_by()
+        .values("dining_list__date", "dining_list__association")
+        .annotate(
+            entries=Count("pk"),
+            guest_entries=Count("pk", filter=~Q(external_name="")),
+            own_member_entries=Count("pk", filter=Exists(own_member)),
+            distinct_diners=Count("user", distinct=True, filter=Q(external_name="")),
+        )
+    )
+    for row in entries:
+        day_stats = stats[(row["dining_list__date"], row["dining_list__association"])]
+        day_stats.entries = row["entries"]
+        day_stats.guest_entries = row["guest_entries"]
+        day_stats.own_member_entries = row["own_member_entries"]
+        day_stats.distinct_diners = row["distinct_diners"]
+    DailyDiningStats.objects.bulk_create(stats.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("userdetails", "0023_alter_user_allergies"),
+        ("dining", "0029_dininglist_diner_count"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DailyDiningStats",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField()),
+                ("lists_claimed", models.PositiveIntegerField(default=0)),
+                ("entries", models.PositiveIntegerField(default=0)),
+                ("guest_entries", models.PositiveIntegerField(default=0)),
+                ("own_member_entries", models.PositiveIntegerField(default=0)),
+                ("distinct_diners", models.PositiveIntegerField(default=0)),
+                (
+                    "association",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="userdetails.association",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "daily dining stats",
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="dailydiningstats",
+            constraint=models.UniqueConstraint(
+                fields=("date", "association"), name="unique_date_association_stats"
+            ),
+        ),
+        migrations.RunPython(
+            create_stats, reverse_code=migrations.RunPython.noop, elidable=True
+        ),
+    ]
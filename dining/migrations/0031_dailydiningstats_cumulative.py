@@ -0,0 +1,64 @@
+# Generated by Django 4.1.4 on 2026-10-17 06:52
+
+from django.db import migrations, models
+
+CUMULATIVE = {
+    "cumulative_lists_claimed": "lists_claimed",
+    "cumulative_entries": "entries",
+    "cumulative_guest_entries": "guest_entries",
+    "cumulative_own_member_entries": "own_member_entries",
+}
+
+
+def compute_cumulative(apps, schema_editor):
+    """Fills the cumulative counts using the existing daily statistics."""
+    DailyDiningStats = apps.get_model("dining", "DailyDiningStats")
+
+    stats = list(DailyDiningStats.objects.order_by("association", "date"))
+    totals = {}
+    for day_stats in stats:
+        total = totals.setdefault(
+            day_stats.association_id, dict.fromkeys(CUMULATIVE, 0)
+        )
+        for field, counter in CUMULATIVE.items():
+            total[field] += getattr(day_stats, counter)
+            setattr(day_stats, field, total[field])
+    DailyDiningStats.objects.bulk_update(stats, list(CUMULATIVE), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("dining", "0030_dailydiningstats"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="dailydiningstats",
+            name="cumulative_entries",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="dailydiningstats",
+            name="cumulative_guest_entries",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="dailydiningstats",
+            name="cumulative_lists_claimed",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="dailydiningstats",
+            name="cumulative_own_member_entries",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name="dailydiningstats",
+            index=models.Index(
+                fields=["association", "date"], name="dailystats_association_idx"
+            ),
+        ),
+        migrations.RunPython(
+            compute_cumulative, reverse_code=migrations.RunPython.noop, elidable=True
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.1.4 on 2026-10-17 06:56
+
+from django.db import migrations, models
+from django.db.models import Count, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_comments(apps, schema_editor):
+    """Fills the comment count and last comment time using the comments."""
+    DiningComment = apps.get_model("dining", "DiningComment")
+    DiningList = apps.get_model("dining", "DiningList")
+
+    comments = (
+        DiningComment.objects.filter(dining_list=OuterRef("pk"))
+        .order_by()
+        .values("dining_list")
+    )
+    DiningList.objects.update(
+        comment_count=Coalesce(
+            Subquery(comments.annotate(c=Count("pk")).values("c")), 0
+        ),
+        last_comment_at=Subquery(comments.annotate(m=Max("timestamp")).values("m")),
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("dining", "0031_dailydiningstats_cumulative"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="dininglist",
+            name="comment_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="dininglist",
+            name="last_comment_at",
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.RunPython(
+            count_comments, reverse_code=migrations.RunPython.noop, elidable=True
+        ),
+    ]
@@ -1,16 +1,18 @@
-from datetime import datetime, time
+from datetime import date, datetime, time, timedelta
 from decimal import Decimal
+from typing import Dict, List
 
 from django.conf import settings
 from django.core.exceptions import MultipleObjectsReturned, ValidationError
 from django.core.validators import MinValueValidator
-from django.db import models
-from django.db.models import Sum
+from django.db import models, transaction
+from django.db.models import Count, Exists, F, Max, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 
 from creditmanagement.models import Transaction
 from general.models import AbstractVisitTracker
-from userdetails.models import Association, User
+from userdetails.models import Association, User, UserMembership
 
 
 class DiningListManager(models.Manager):
@@ -27,6 +29,100 @@ class DiningListManager(models.Manager):
         )
         return settings.MAX_SLOT_NUMBER - len(self.filter(date=date)) - announce_slots
 
+    def add_diner(self, dining_list_id: int, check_capacity=True) -> bool:
+        """Increments the diner count of a dining list with a single UPDATE.
+
+        With check_capacity, the count is only incremented when the list has
+        room. The UPDATE locks the row, so concurrent sign-ups can't exceed
+        the maximum.
+
+        Returns:
+            False when the dining list is full.
+        """
+        qs = self.filter(pk=dining_list_id)
+        if check_capacity:
+            qs = qs.filter(diner_count__lt=F("max_diners"))
+        return qs.update(diner_count=F("diner_count") + 1) == 1
+
+    def lock_if_not_full(self, dining_list_id: int) -> bool:
+        """Locks the dining list row when it has room for another diner.
+
+        The lock is held until the end of the database transaction, so a
+        concurrent sign-up waits until the new entry is counted and can't
+        exceed the maximum.
+
+        Returns:
+            False when the dining list is full.
+        """
+        qs = self.select_for_update().filter(
+            pk=dining_list_id, diner_count__lt=F("max_diners")
+        )
+        return bool(qs.values_list("pk"))
+
+    def reconcile_diner_counts(self) -> int:
+        """Recomputes the stored diner count of all dining lists from the entries.
+
+        Returns:
+            The number of dining lists of which the diner count was incorrect.
+        """
+        entries = (
+            DiningEntry.objects.filter(dining_list=OuterRef("pk"))
+            .order_by()
+            .values("dining_list")
+            .annotate(count=Count("pk"))
+            .values("count")
+        )
+        count = Coalesce(Subquery(entries), 0)
+        return (
+            self.annotate(entry_count=count)
+            .exclude(diner_count=F("entry_count"))
+            .update(diner_count=count)
+        )
+
+    def reconcile_comment_counts(self) -> int:
+        """Recomputes the comment count and last comment time from the comments.
+
+        Returns:
+            The number of dining lists of which the values were incorrect.
+        """
+        comments = (
+            DiningComment.objects.filter(dining_list=OuterRef("pk"))
+            .order_by()
+            .values("dining_list")
+        )
+        count = Coalesce(Subquery(comments.annotate(c=Count("pk")).values("c")), 0)
+        last = Subquery(comments.annotate(m=Max("timestamp")).values("m"))
+        return (
+            self.annotate(actual_count=count, actual_last=last)
+            .filter(
+                ~Q(comment_count=F("actual_count"))
+                | Q(last_comment_at__lt=F("actual_last"))
+                | Q(last_comment_at__gt=F("actual_last"))
+                | Q(last_comment_at__isnull=True, actual_last__isnull=False)
+                | Q(last_comment_at__isnull=False, actual_last__isnull=True)
+            )
+            .update(comment_count=count, last_comment_at=last)
+        )
+
+    def due_payment_reminders(self, interval: timedelta, max_age: timedelta):
+        """Returns the dining lists that need an automatic payment reminder.
+
+        These are dining lists past their date, with a payment link and unpaid
+        entries, for which no reminder was sent during the interval. Dining
+        lists older than max_age are no longer reminded.
+        """
+        today = timezone.localdate()
+        unpaid = DiningEntry.objects.filter(dining_list=OuterRef("pk"), has_paid=False)
+        recently_sent = PaymentReminderLock.objects.filter(
+            dining_list=OuterRef("pk"), sent__gte=timezone.now() - interval
+        )
+        return (
+            self.filter(date__lt=today, date__gte=today - max_age)
+            .exclude(payment_link="")
+            .filter(Exists(unpaid))
+            .exclude(Exists(recently_sent))
+        )
+
 
 class DiningList(models.Model):
     """A single dining list (slot) model.
@@ -95,6 +191,15 @@ class DiningList(models.Model):
         User, through="DiningEntry", through_fields=("dining_list", "user")
     )
 
+    # The number of dining entries. It is updated in the same database
+    # transaction as each entry insert and delete, see dining.receivers. Do not
+    # change it directly.
+    diner_count = models.PositiveIntegerField(default=0, editable=False)
+    # The number of comments and the time of the latest comment, updated by
+    # dining.receivers like the diner count
+    comment_count = models.PositiveIntegerField(default=0, editable=False)
+    last_comment_at = models.DateTimeField(null=True, editable=False)
+
     objects = DiningListManager()
 
     def is_owner(self, user: User) -> bool:
@@ -126,8 +231,25 @@ class DiningList(models.Model):
         return timezone.now() < self.sign_up_deadline
 
     def has_room(self):
-        """Determines whether this dining list can have more entries."""
-        return self.diners.count() < self.max_diners
+        """Determines whether this dining list can have more entries.
+
+        The diner count is read from the database so that it is up-to-date.
+        """
+        self.diner_count = DiningList.objects.values_list("diner_count", flat=True).get(
+            pk=self.pk
+        )
+        return self.diner_count < self.max_diners
+
+    def has_unread_comments(self, last_visit) -> bool:
+        """Whether there are comments since the last visit of the comments page.
+
+        Args:
+            last_visit: The time of the last visit or None, see
+                DiningCommentVisitTracker.get_latest_visit().
+        """
+        if self.last_comment_at is None:
+            return False
+        return last_visit is None or self.last_comment_at >= last_visit
 
     def __str__(self):
         return "{} {}".format(self.date, self.association)
@@ -207,6 +329,13 @@ class DiningEntry(models.Model):
     class Meta:
         verbose_name_plural = "dining entries"
 
+    def save(self, *args, **kwargs):
+        # A receiver updates the diner count of the dining list after the
+        # insert. We use a database transaction so that the row and the count
+        # are committed together.
+        with transaction.atomic(using=kwargs.get("using")):
+            super().save(*args, **kwargs)
+
     def get_name(self):
         """Return name of diner."""
         return self.external_name or self.user.get_full_name()
@@ -308,7 +437,7 @@ class PaymentReminderLock(models.Model):
 
     This table stores temporary data and can safely be removed or recreated.
 
-    See SlotPaymentView.
+    See SlotPaymentView and the send_payment_reminders management command.
     """
 
     # We use primary_key=True to prevent an unnecessary auto id column.
@@ -329,3 +458,320 @@ class DeletedList(models.Model):
 
     def __str__(self):
         return f"Deleted on {self.date.date()} by {self.deleted_by}"
+
+
+class DailyDiningStatsManager(models.Manager):
+    def compute(self, dining_lists) -> List["DailyDiningStats"]:
+        """Computes the statistics of the given dining lists.
+
+        Args:
+            dining_lists: A DiningList QuerySet.
+
+        Returns:
+            Unsaved statistics, one for each date and association that has
+            dining lists.
+        """
+        stats = {}
+        for row in (
+            dining_lists.order_by()
+            .values("date", "association")
+            .annotate(count=Count("pk"))
+        ):
+            stats[(row["date"], row["association"])] = DailyDiningStats(
+                date=row["date"],
+                association_id=row["association"],
+                lists_claimed=row["count"],
+            )
+
+        own_member = UserMembership.objects.filter(
+            related_user=OuterRef("user"),
+            association=OuterRef("dining_list__association"),
+            is_verified=True,
+        )
+        entries = (
+            DiningEntry.objects.filter(dining_list__in=dining_lists)
+            .order_by()
+            .values("dining_list__date", "dining_list__association")
+            .annotate(
+                entries=Count("pk"),
+                guest_entries=Count("pk", filter=~Q(external_name="")),
+                own_member_entries=Count("pk", filter=Exists(own_member)),
+                distinct_diners=Count(
+                    "user", distinct=True, filter=Q(external_name="")
+                ),
+            )
+        )
+        for row in entries:
+            day_stats = stats[
+                (row["dining_list__date"], row["dining_list__association"])
+            ]
+            day_stats.entries = row["entries"]
+            day_stats.guest_entries = row["guest_entries"]
+            day_stats.own_member_entries = row["own_member_entries"]
+            day_stats.distinct_diners = row["distinct_diners"]
+        return list(stats.values())
+
+    def add(self, day: date, association_id: int, **deltas: int):
+        """Adds the given amounts to the counters of a day with F() updates.
+
+        The cumulative counts of the day and all later days are adjusted by the
+        same amounts. The row of the day is created when it doesn't exist yet.
+
+        Args:
+            day: The date of the statistics.
+            association_id: The association of the statistics.
+            deltas: The change of each counter, see DailyDiningStats.COUNTERS.
+        """
+        counters = {c: F(c) + d for c, d in deltas.items() if d}
+        if not counters:
+            return
+        with transaction.atomic():
+            day_stats = self.filter(date=day, association=association_id)
+            if not day_stats.update(**counters):
+                _, created = self.get_or_create(date=day, association_id=association_id)
+                if created:
+                    self.start_cumulative(day, association_id)
+                day_stats.update(**counters)
+            cumulative = {
+                f: F(f) + deltas[c]
+                for f, c in DailyDiningStats.CUMULATIVE.items()
+                if deltas.get(c)
+            }
+            if cumulative:
+                self.filter(association=association_id, date__gte=day).update(
+                    **cumulative
+                )
+
+    def add_entry(self, entry: "DiningEntry", sign=1):
+        """Counts a new entry, or with sign=-1 removes a deleted entry.
+
+        Whether the user is a member and already dined that day is looked up
+        in a single query, the counters are then changed with add().
+        """
+        others = DiningEntry.objects.filter(
+            user=entry.user_id,
+            external_name="",
+            dining_list__date=OuterRef("date"),
+            dining_list__association=OuterRef("association"),
+        ).exclude(pk=entry.pk)
+        member = UserMembership.objects.filter(
+            related_user=entry.user_id,
+            association=OuterRef("association"),
+            is_verified=True,
+        )
+        row = (
+            DiningList.objects.filter(pk=entry.dining_list_id)
+            .values("date", "association", member=Exists(member), dined=Exists(others))
+            .get()
+        )
+        self.add(
+            row["date"],
+            row["association"],
+            entries=sign,
+            guest_entries=sign if entry.is_external() else 0,
+            own_member_entries=sign if row["member"] else 0,
+            distinct_diners=sign if entry.is_internal() and not row["dined"] else 0,
+        )
+
+    def list_deltas(self, dining_list: "DiningList") -> Dict[str, int]:
+        """Returns the change of the counters when a dining list is deleted.
+
+        The counts of all its entries are computed in a single query, so that
+        the list and its entries can be deleted without per-entry receivers,
+        see DiningListDeleteForm.execute().
+
+        Returns:
+            Negative counts that can be passed to add().
+        """
+        member = UserMembership.objects.filter(
+            related_user=OuterRef("user"),
+            association=dining_list.association_id,
+            is_verified=True,
+        )
+        elsewhere = (
+            DiningEntry.objects.internal()
+            .filter(
+                user=OuterRef("user"),
+                dining_list__date=dining_list.date,
+                dining_list__association=dining_list.association_id,
+            )
+            .exclude(dining_list=dining_list)
+        )
+        counts = dining_list.dining_entries.aggregate(
+            entries=Count("pk"),
+            guest_entries=Count("pk", filter=~Q(external_name="")),
+            own_member_entries=Count("pk", filter=Exists(member)),
+            distinct_diners=Count(
+                "user",
+                distinct=True,
+                filter=Q(~Exists(elsewhere), external_name=""),
+            ),
+        )
+        return {"lists_claimed": -1, **{c: -n for c, n in counts.items()}}
+
+    def add_member(self, user_id: int, association_id: int, sign=1):
+        """Counts the entries of a new member as own member entries.
+
+        With sign=-1 the entries are no longer counted. All days on which the
+        user dined at the association are changed with a single UPDATE.
+        """
+        entries = DiningEntry.objects.filter(
+            user=user_id, dining_list__association=association_id
+        )
+
+        def count(**filters):
+            counts = (
+                entries.filter(**filters)
+                .order_by()
+                .values("user")
+                .annotate(count=Count("pk"))
+                .values("count")
+            )
+            return Coalesce(Subquery(counts), 0) * sign
+
+        self.filter(
+            Exists(entries.filter(dining_list__date__lte=OuterRef("date"))),
+            association=association_id,
+        ).update(
+            own_member_entries=F("own_member_entries")
+            + count(dining_list__date=OuterRef("date")),
+            cumulative_own_member_entries=F("cumulative_own_member_entries")
+            + count(dining_list__date__lte=OuterRef("date")),
+        )
+
+    def start_cumulative(self, day: date, association_id: int):
+        """Copies the cumulative counts of the previous day with statistics.
+
+        The previous row is locked, so that a concurrent change of its counts
+        is waited for.
+        """
+        previous = self.filter(association=association_id, date__lt=day).order_by(
+            "-date"
+        )
+        list(previous.select_for_update().values_list("pk")[:1])
+        self.filter(date=day, association=association_id).update(
+            **{
+                f: Coalesce(Subquery(previous.values(f)[:1]), 0)
+                for f in DailyDiningStats.CUMULATIVE
+            }
+        )
+
+    def rebuild(self) -> int:
+        """Recreates all statistics from the dining lists and entries.
+
+        Returns:
+            The number of created rows.
+        """
+        stats = sorted(
+            self.compute(DiningList.objects.all()),
+            key=lambda s: (s.association_id, s.date),
+        )
+        totals = {}
+        for day_stats in stats:
+            total = totals.setdefault(
+                day_stats.association_id,
+                dict.fromkeys(DailyDiningStats.CUMULATIVE, 0),
+            )
+            for field, counter in DailyDiningStats.CUMULATIVE.items():
+                total[field] += getattr(day_stats, counter)
+                setattr(day_stats, field, total[field])
+        with transaction.atomic():
+            self.all().delete()
+            self.bulk_create(stats, batch_size=1000)
+        return len(stats)
+
+    def totals(self, start: date, end: date) -> Dict[int, Dict[str, int]]:
+        """Returns the counts of each association from start up to end.
+
+        The end date is exclusive. Each count is the difference of the
+        cumulative counts of two days, so the cost doesn't depend on the length
+        of the range.
+
+        Returns:
+            A dictionary from association id to a dictionary with the counts,
+            see DailyDiningStats.CUMULATIVE. Associations without statistics
+            are missing.
+        """
+        rows = self.filter(association=OuterRef("pk")).order_by("-date")
+        annotations = {}
+        for field in DailyDiningStats.CUMULATIVE:
+            for name, bound in (("end", end), ("start", start)):
+                annotations[f"{field}_{name}"] = Coalesce(
+                    Subquery(rows.filter(date__lt=bound).values(field)[:1]), 0
+                )
+        totals = {}
+        for row in (
+            Association.objects.filter(Exists(rows))
+            .annotate(**annotations)
+            .values("pk", *annotations)
+        ):
+            totals[row["pk"]] = {
+                counter: row[f"{field}_end"] - row[f"{field}_start"]
+                for field, counter in DailyDiningStats.CUMULATIVE.items()
+            }
+        return totals
+
+
+class DailyDiningStats(models.Model):
+    """The dining statistics of an association on a day.
+
+    Statistics for a date range only need to sum these rows instead of joining
+    all dining lists, entries and memberships. The counts are changed by
+    receivers when dining lists, entries or memberships change, see
+    dining.receivers, and can be recreated with the rebuild_stats management
+    command.
+
+    The cumulative counts hold the running totals of the association, so the
+    counts of any date range are the difference of two rows, see totals().
+    The distinct diners can't be summed over multiple days, because a user
+    who dined on both days would be counted twice.
+    """
+
+    COUNTERS = [
+        "lists_claimed",
+        "entries",
+        "guest_entries",
+        "own_member_entries",
+        "distinct_diners",
+    ]
+    # The running totals of the counters up to and including the date
+    CUMULATIVE = {
+        "cumulative_lists_claimed": "lists_claimed",
+        "cumulative_entries": "entries",
+        "cumulative_guest_entries": "guest_entries",
+        "cumulative_own_member_entries": "own_member_entries",
+    }
+
+    date = models.DateField()
+    # The association that owns the dining lists
+    association = models.ForeignKey(Association, on_delete=models.CASCADE)
+    lists_claimed = models.PositiveIntegerField(default=0)
+    # All entries, including guests
+    entries = models.PositiveIntegerField(default=0)
+    guest_entries = models.PositiveIntegerField(default=0)
+    # Entries of verified members of the association, including their guests
+    own_member_entries = models.PositiveIntegerField(default=0)
+    # Users who dined themselves
+    distinct_diners = models.PositiveIntegerField(default=0)
+    cumulative_lists_claimed = models.PositiveIntegerField(default=0)
+    cumulative_entries = models.PositiveIntegerField(default=0)
+    cumulative_guest_entries = models.PositiveIntegerField(default=0)
+    cumulative_own_member_entries = models.PositiveIntegerField(default=0)
+
+    objects = DailyDiningStatsManager()
+
+    class Meta:
+        verbose_name_plural = "daily dining stats"
+        indexes = [
+            models.Index(
+                fields=["association", "date"], name="dailystats_association_idx"
+            )
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["date", "association"], name="unique_date_association_stats"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.association} on {self.date}"
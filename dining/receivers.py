@@ -0,0 +1,149 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db.models import Case, F, OuterRef, Q, Subquery, Value, When
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from dining.models import DailyDiningStats, DiningComment, DiningEntry, DiningList
+from userdetails.models import UserMembership
+
+# True while a dining list is deleted as a whole, see deleting_dining_list()
+_deleting_list = ContextVar("deleting_list", default=False)
+
+
+@contextmanager
+def deleting_dining_list():
+    """Skips the delete receivers of dining lists, entries and comments.
+
+    Use this when a dining list is deleted together with its entries and
+    comments. The diner and comment counts don't need to be updated, because
+    the dining list is deleted too. The caller needs to update the statistics,
+    see DailyDiningStatsManager.list_deltas().
+    """
+    token = _deleting_list.set(True)
+    try:
+        yield
+    finally:
+        _deleting_list.reset(token)
+
+
+@receiver(post_save, sender=DiningEntry)
+def increment_diner_count(sender, instance, created, **kwargs):
+    """Counts a new entry in the diner count of its dining list.
+
+    The capacity is not checked here, see DiningEntryInternalForm.save().
+    """
+    if created:
+        DiningList.objects.add_diner(instance.dining_list_id, check_capacity=False)
+
+
+@receiver(post_delete, sender=DiningEntry)
+def decrement_diner_count(sender, instance, **kwargs):
+    if _deleting_list.get():
+        return
+    DiningList.objects.filter(pk=instance.dining_list_id).update(
+        diner_count=F("diner_count") - 1
+    )
+
+
+@receiver(post_save, sender=DiningComment)
+def increment_comment_count(sender, instance, created, **kwargs):
+    """Counts a new comment and updates the time of the latest comment."""
+    if created:
+        DiningList.objects.filter(pk=instance.dining_list_id).update(
+            comment_count=F("comment_count") + 1,
+            last_comment_at=Case(
+                When(
+                    Q(last_comment_at__gte=instance.timestamp),
+                    then=F("last_comment_at"),
+                ),
+                default=Value(instance.timestamp),
+            ),
+        )
+
+
+@receiver(post_delete, sender=DiningComment)
+def decrement_comment_count(sender, instance, **kwargs):
+    if _deleting_list.get():
+        return
+    latest = (
+        DiningComment.objects.filter(dining_list=OuterRef("pk"))
+        .order_by("-timestamp")
+        .values("timestamp")[:1]
+    )
+    DiningList.objects.filter(pk=instance.dining_list_id).update(
+        comment_count=F("comment_count") - 1, last_comment_at=Subquery(latest)
+    )
+
+
+@receiver(post_save, sender=DiningEntry)
+def update_stats_on_entry_create(sender, instance, created, **kwargs):
+    if created:
+        DailyDiningStats.objects.add_entry(instance)
+
+
+@receiver(post_delete, sender=DiningEntry)
+def update_stats_on_entry_delete(sender, instance, **kwargs):
+    if _deleting_list.get():
+        return
+    DailyDiningStats.objects.add_entry(instance, sign=-1)
+
+
+@receiver(post_save, sender=DiningList)
+def update_stats_on_list_create(sender, instance, created, **kwargs):
+    if created:
+        DailyDiningStats.objects.add(
+            instance.date, instance.association_id, lists_claimed=1
+        )
+
+
+@receiver(post_delete, sender=DiningList)
+def update_stats_on_list_delete(sender, instance, **kwargs):
+    if _deleting_list.get():
+        return
+    DailyDiningStats.objects.add(
+        instance.date, instance.association_id, lists_claimed=-1
+    )
+
+
+@receiver(pre_save, sender=UserMembership)
+def load_verified_state(sender, instance, **kwargs):
+    """Stores whether the membership was verified before the save.
+
+    This is used by update_stats_on_membership_save to know whether the
+    entries of the user start or stop counting as own member entries.
+    """
+    instance._was_verified = (
+        instance.pk is not None
+        and UserMembership.objects.filter(pk=instance.pk, is_verified=True).exists()
+    )
+
+
+def update_member_stats(membership: UserMembership, sign: int):
+    """Changes the own member entries of the user of a membership.
+
+    Nothing changes when the user has another verified membership of the
+    association, because the entries are then counted already.
+    """
+    others = UserMembership.objects.filter(
+        related_user=membership.related_user_id,
+        association=membership.association_id,
+        is_verified=True,
+    ).exclude(pk=membership.pk)
+    if not others.exists():
+        DailyDiningStats.objects.add_member(
+            membership.related_user_id, membership.association_id, sign
+        )
+
+
+@receiver(post_save, sender=UserMembership)
+def update_stats_on_membership_save(sender, instance, **kwargs):
+    if instance.is_verified != instance._was_verified:
+        update_member_stats(instance, 1 if instance.is_verified else -1)
+
+
+@receiver(post_delete, sender=UserMembership)
+def update_stats_on_membership_delete(sender, instance, **kwargs):
+    if instance.is_verified:
+        update_member_stats(instance, -1)
@@ -5,7 +5,8 @@ from django import template
 from django.conf import settings
 from django.utils import timezone
 
-from dining.forms import DiningEntryDeleteForm, DiningEntryInternalForm
+from dining.eligibility import EligibilityEvaluator
+from dining.forms import DiningEntryDeleteForm
 from dining.models import DiningEntry, DiningList
 from userdetails.models import User
 
@@ -14,37 +15,19 @@ register = template.Library()
 
 @register.filter
 def can_join(dining_list, user):
-    # Try creating an entry
-    entry = DiningEntry(dining_list=dining_list, created_by=user)
-    form = DiningEntryInternalForm({"user": str(user.pk)}, instance=entry)
-    return form.is_valid()
+    return EligibilityEvaluator(user, [dining_list]).get_join_error(dining_list) is None
 
 
 @register.filter
 def cant_join_reason(dining_list, user):
     """Returns the reason why someone can't join (raises exception when they can join)."""
-    entry = DiningEntry(dining_list=dining_list, created_by=user)
-    form = DiningEntryInternalForm({"user": str(user.pk)}, instance=entry)
-    return form.non_field_errors()[0]
+    return EligibilityEvaluator(user, [dining_list]).get_join_error(dining_list).message
 
 
 @register.filter
 def can_add_others(dining_list, user):
-    """Whether a user can add others on a dining list.
-
-    This is not thoroughly tested for correctness, but that is not needed since
-    it's only for view usage.
-    """
-    is_adjustable = dining_list.is_adjustable()
-    is_owner = dining_list.is_owner(user)
-    has_room = dining_list.is_open() and dining_list.has_room()
-    limited = (
-        dining_list.limit_signups_to_association_only
-        and not user.usermembership_set.filter(
-            association=dining_list.association
-        ).exists()
-    )
-    return is_adjustable and (is_owner or (has_room and not limited))
+    """Whether a user can add others on a dining list."""
+    return EligibilityEvaluator(user, [dining_list]).can_add_others(dining_list)
 
 
 @register.filter
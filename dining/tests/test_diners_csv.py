@@ -0,0 +1,49 @@
+from datetime import date, datetime
+
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from dining.models import DiningEntry, DiningList
+from userdetails.models import Association, User, UserMembership
+
+
+class DailyDinersCSVViewTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.a1 = Association.objects.create(slug="a1", name="A1")
+        cls.a2 = Association.objects.create(slug="a2", name="A2")
+        cls.admin = User.objects.create(
+            username="admin", email="admin@localhost", is_superuser=True
+        )
+        cls.piet = User.objects.create(
+            username="piet", first_name="Piet", last_name="Jansen", email="p@localhost"
+        )
+        UserMembership.objects.create(
+            related_user=cls.piet, association=cls.a2, is_verified=True
+        )
+        UserMembership.objects.create(related_user=cls.piet, association=cls.a1)
+        for day in (10, 11, 20):
+            dining_list = DiningList.objects.create(
+                date=date(2022, 1, day),
+                association=cls.a1,
+                sign_up_deadline=datetime(2022, 1, 1, tzinfo=timezone.utc),
+            )
+            DiningEntry.objects.create(
+                dining_list=dining_list, user=cls.piet, created_by=cls.piet
+            )
+
+    def get_csv(self, user, query):
+        self.client.force_login(user)
+        return self.client.get(reverse("diners_csv"), query)
+
+    def test_csv(self):
+        response = self.get_csv(self.admin, {"from": "10/01/22", "to": "11/01/22"})
+        self.assertEqual(
+            b"".join(response.streaming_content).decode().splitlines(),
+            ["Name,Joined,A1,A2", "Piet Jansen,2,0,1"],
+        )
+
+    def test_not_superuser(self):
+        response = self.get_csv(self.piet, {})
+        self.assertEqual(response.status_code, 403)
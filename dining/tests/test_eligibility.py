@@ -0,0 +1,109 @@
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from creditmanagement.models import Account, Transaction
+from dining.eligibility import EligibilityEvaluator
+from dining.models import DiningEntry, DiningList
+from userdetails.models import Association, User, UserMembership
+
+
+class EligibilityEvaluatorTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("jan", email="jan@localhost")
+        cls.owner = User.objects.create_user("tessa", email="tessa@localhost")
+        cls.date = date(2089, 1, 4)  # (a weekday)
+
+    def create_dining_list(self, **kwargs):
+        number = Association.objects.count()
+        dining_list = DiningList.objects.create(
+            date=self.date,
+            association=Association.objects.create(
+                name=f"A{number}", slug=f"a{number}"
+            ),
+            sign_up_deadline=datetime(2088, 1, 1, tzinfo=timezone.utc),
+            **kwargs,
+        )
+        dining_list.owners.add(self.owner)
+        return dining_list
+
+    def test_reason_codes(self):
+        open_list = self.create_dining_list()
+        full_list = self.create_dining_list(max_diners=1)
+        DiningEntry.objects.create(
+            dining_list=full_list, user=self.owner, created_by=self.owner
+        )
+        members_list = self.create_dining_list(limit_signups_to_association_only=True)
+        closed_list = self.create_dining_list()
+        closed_list.sign_up_deadline = timezone.now() - timedelta(hours=1)
+        closed_list.save()
+
+        evaluator = EligibilityEvaluator(
+            self.user, [open_list, full_list, members_list, closed_list]
+        )
+        self.assertIsNone(evaluator.get_join_error(open_list))
+        self.assertEqual(evaluator.get_join_error(full_list).code, "full")
+        self.assertEqual(evaluator.get_join_error(members_list).code, "members_only")
+        self.assertEqual(evaluator.get_join_error(closed_list).code, "closed")
+
+        # The owner can add to a full list
+        evaluator = EligibilityEvaluator(self.owner, [full_list])
+        self.assertIsNone(evaluator.get_join_error(full_list, self.user))
+
+    def test_no_money(self):
+        dining_list = self.create_dining_list()
+        Transaction.objects.create(
+            source=self.user.account,
+            target=Account.objects.get(special="kitchen_cost"),
+            amount=Decimal("100.00"),
+            description="Debt",
+            created_by=self.user,
+        )
+        evaluator = EligibilityEvaluator(self.user, [dining_list])
+        self.assertEqual(evaluator.get_join_error(dining_list).code, "no_money")
+
+        # Members of an association with a minimum balance exception can join
+        UserMembership.objects.create(
+            related_user=self.user,
+            association=Association.objects.create(slug="q", has_min_exception=True),
+            is_verified=True,
+        )
+        evaluator = EligibilityEvaluator(self.user, [dining_list])
+        self.assertIsNone(evaluator.get_join_error(dining_list))
+
+    @override_settings(MAX_SLOT_NUMBER=10)
+    def test_day_view_queries(self):
+        """Tests that the number of queries doesn't depend on the number of lists."""
+        self.client.force_login(self.user)
+        url = reverse(
+            "day_view",
+            kwargs={
+                "year": self.date.year,
+                "month": self.date.month,
+                "day": self.date.day,
+            },
+        )
+
+        def count_queries():
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            return len(queries)
+
+        dining_list = self.create_dining_list()
+        DiningEntry.objects.create(
+            dining_list=dining_list, user=self.user, created_by=self.user
+        )
+        queries = count_queries()
+        for _ in range(3):
+            dining_list = self.create_dining_list()
+            DiningEntry.objects.create(
+                dining_list=dining_list, user=self.user, created_by=self.user
+            )
+        self.assertEqual(count_queries(), queries)
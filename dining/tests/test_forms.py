@@ -20,7 +20,7 @@ from dining.forms import (
     DiningPaymentForm,
     SendReminderForm,
 )
-from dining.models import DiningEntry, DiningList
+from dining.models import DailyDiningStats, DiningEntry, DiningList
 from general.forms import ConcurrenflictFormMixin
 from userdetails.models import Association, User, UserMembership
 from utils.testing import FormValidityMixin, TestPatchMixin, patch
@@ -571,6 +571,59 @@ class TestDiningListDeleteForm(FormValidityMixin, TestCase):
             old_cancelled_transaction_count + diner_count,
         )
 
+    @patch_time()
+    def test_db_balances(self):
+        """Tests that the kitchen costs are refunded to the diners."""
+        balances = {a.pk: a.balance for a in Account.objects.all()}
+        for entry in self.dining_list.dining_entries.exclude(transaction=None):
+            balances[entry.transaction.source_id] += entry.transaction.amount
+            balances[entry.transaction.target_id] -= entry.transaction.amount
+
+        self.assertFormValid({}).execute(self.user)
+
+        self.assertEqual(balances, {a.pk: a.balance for a in Account.objects.all()})
+        self.assertEqual(Account.objects.recompute_balances(), 0)
+
+    def assert_execute_queries(self):
+        form = self.assertFormValid({})
+        # The number of queries doesn't depend on the number of entries
+        with self.assertNumQueries(30):
+            form.execute(self.user)
+
+    @patch_time()
+    def test_query_count(self):
+        self.assertGreaterEqual(self.dining_list.dining_entries.count(), 8)
+        self.assert_execute_queries()
+
+    @patch_time()
+    def test_query_count_more_entries(self):
+        for i in range(20):
+            DiningEntry.objects.create(
+                dining_list=self.dining_list,
+                user=self.user,
+                created_by=self.user,
+                external_name=f"Guest {i}",
+            )
+        self.assert_execute_queries()
+
+    @patch_time()
+    def test_derived_counts(self):
+        """Tests that the statistics and balances are consistent after deletion."""
+        self.assertGreaterEqual(self.dining_list.dining_entries.count(), 8)
+        stats = DailyDiningStats.objects.filter(
+            date=self.dining_list.date, association=self.dining_list.association
+        )
+        self.assertEqual(stats.get().lists_claimed, 1)
+
+        self.assertFormValid({}).execute(self.user)
+
+        self.assertFalse(DiningList.objects.filter(pk=self.dining_list.pk).exists())
+        self.assertEqual(
+            stats.values("lists_claimed", "entries", "distinct_diners").get(),
+            {"lists_claimed": 0, "entries": 0, "distinct_diners": 0},
+        )
+        self.assertEqual(Account.objects.recompute_balances(), 0)
+
     def test_form_editing_time_limit(self):
         """Asserts that the form can not be used after the timelimit."""
         # The form will be locked by default because the dining list instance has a date in the past.
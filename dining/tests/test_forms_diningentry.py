@@ -1,7 +1,7 @@
 from datetime import date, datetime, time
 from decimal import Decimal
 
-from django.core.exceptions import NON_FIELD_ERRORS
+from django.core.exceptions import NON_FIELD_ERRORS, ValidationError
 from django.test import TestCase
 from django.utils import timezone
 
@@ -132,6 +132,30 @@ class DiningEntryInternalFormTestCase(TestCase):
         self.post_data["user"] = "100"
         self.assertFalse(self.form.is_valid())
 
+    def test_save_diner_count(self):
+        self.assertTrue(self.form.is_valid())
+        self.form.save()
+        self.dining_list.refresh_from_db()
+        self.assertEqual(self.dining_list.diner_count, 1)
+
+    def test_save_full(self):
+        """Tests a dining list that becomes full after validating the form."""
+        self.assertTrue(self.form.is_valid())
+        DiningList.objects.filter(pk=self.dining_list.pk).update(max_diners=0)
+        with self.assertRaises(ValidationError):
+            self.form.save()
+        self.assertFalse(DiningEntry.objects.exists())
+        self.dining_list.refresh_from_db()
+        self.assertEqual(self.dining_list.diner_count, 0)
+
+    def test_save_full_owner(self):
+        self.dining_entry.created_by = self.user  # Entry creator is dining list owner
+        self.assertTrue(self.form.is_valid())
+        DiningList.objects.filter(pk=self.dining_list.pk).update(max_diners=0)
+        self.form.save()
+        self.dining_list.refresh_from_db()
+        self.assertEqual(self.dining_list.diner_count, 1)
+
 
 class DiningEntryExternalFormTestCase(TestCase):
     """This class only tests a valid form instance since the clean method has been tested above already."""
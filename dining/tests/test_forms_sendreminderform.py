@@ -6,8 +6,9 @@ from django.http import HttpRequest
 from django.test import TestCase, TransactionTestCase, skipUnlessDBFeature
 from django.utils import timezone
 
-from dining.forms import SendReminderForm
+from dining.forms import SendReminderForm, send_payment_reminders
 from dining.models import DiningEntry, DiningList
+from general.models import OutgoingMail
 from userdetails.models import Association, User
 
 
@@ -115,6 +116,75 @@ class SendReminderFormTestCase(TestCase):
         messages = self.form.construct_messages(request)
         self.assertEqual([m.to for m in messages], [["0@localhost"], ["2@localhost"]])
 
+    def test_recipients_single_query(self):
+        """Tests that the recipients are found with one query."""
+        for i in range(3):
+            user = User.objects.create(username=f"{i}", email=f"{i}@localhost")
+            self.create_dining_entry(user, has_paid=False)
+            self.create_dining_entry(user, has_paid=False, guest_name=f"Guest {i}")
+        with self.assertNumQueries(1):
+            self.assertEqual(len(self.form.get_user_recipients()), 3)
+            self.assertEqual(len(self.form.get_guest_recipients()), 3)
+
+
+class SendPaymentRemindersTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create(username="owner", email="owner@localhost")
+        cls.lists = []
+        for i in range(3):
+            dining_list = DiningList.objects.create(
+                date=date(2020, 1, 1),
+                association=Association.objects.create(
+                    slug=f"assoc{i}", name=f"Association {i}"
+                ),
+                sign_up_deadline=datetime(2020, 1, 1, 12, 0, tzinfo=timezone.utc),
+                payment_link="https://example.com/pay",
+            )
+            dining_list.owners.add(cls.owner)
+            cls.lists.append(dining_list)
+        cls.users = [
+            User.objects.create(username=f"{i}", email=f"{i}@localhost")
+            for i in range(3)
+        ]
+        for dining_list in cls.lists[:2]:
+            for user in cls.users:
+                DiningEntry.objects.create(
+                    user=user, dining_list=dining_list, created_by=user
+                )
+            DiningEntry.objects.create(
+                user=cls.users[0],
+                dining_list=dining_list,
+                created_by=cls.users[0],
+                external_name="Guest",
+            )
+        # Everybody has paid on the third list
+        DiningEntry.objects.create(
+            user=cls.users[0],
+            dining_list=cls.lists[2],
+            created_by=cls.users[0],
+            has_paid=True,
+        )
+
+    def test_send(self):
+        self.assertEqual(send_payment_reminders(self.lists), 2)
+        # 3 internal and 1 external mail per list
+        self.assertEqual(OutgoingMail.objects.count(), 8)
+
+    def test_skips_missing_payment_link(self):
+        DiningList.objects.filter(pk=self.lists[0].pk).update(payment_link="")
+        lists = DiningList.objects.filter(pk__in=[d.pk for d in self.lists])
+        self.assertEqual(send_payment_reminders(lists), 1)
+        self.assertEqual(OutgoingMail.objects.count(), 4)
+
+    def test_query_count(self):
+        """Tests that the number of queries doesn't grow with the lists."""
+        lists = DiningList.objects.filter(pk__in=[d.pk for d in self.lists])
+        # Dining lists, associations, owners, entries, the site and queueing
+        # the mail
+        with self.assertNumQueries(6):
+            send_payment_reminders(lists)
+
 
 class SendReminderFormLockTestCase(TransactionTestCase):
     """Tests that no simultaneous emails are sent.
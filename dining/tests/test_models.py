@@ -5,8 +5,9 @@ from django.core.exceptions import ValidationError
 from django.test import TestCase
 from django.utils import timezone
 
-from dining.models import DiningEntry, DiningList
-from userdetails.models import Association, User
+from dining.models import DailyDiningStats, DiningComment, DiningEntry, DiningList
+from dining.receivers import deleting_dining_list
+from userdetails.models import Association, User, UserMembership
 
 
 class DiningListTestCase(TestCase):
@@ -119,3 +120,293 @@ class DiningEntryTestCase(TestCase):
             created_by=self.user,
         )
         entry.full_clean()  # No ValidationError
+
+
+class DinerCountTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("piet")
+        cls.dining_list = DiningList.objects.create(
+            date=date(2123, 2, 1),
+            association=Association.objects.create(slug="assoc"),
+            sign_up_deadline=datetime(2100, 1, 1, tzinfo=timezone.utc),
+            max_diners=2,
+        )
+
+    def create_entry(self, **kwargs):
+        return DiningEntry.objects.create(
+            dining_list=self.dining_list,
+            user=self.user,
+            created_by=self.user,
+            **kwargs,
+        )
+
+    def get_diner_count(self):
+        self.dining_list.refresh_from_db()
+        return self.dining_list.diner_count
+
+    def test_create_and_delete(self):
+        entry = self.create_entry()
+        self.create_entry(external_name="Klaas")
+        self.assertEqual(self.get_diner_count(), 2)
+        entry.delete()
+        self.assertEqual(self.get_diner_count(), 1)
+
+    def test_add_diner(self):
+        self.assertTrue(DiningList.objects.add_diner(self.dining_list.pk))
+        self.assertTrue(DiningList.objects.add_diner(self.dining_list.pk))
+        self.assertFalse(DiningList.objects.add_diner(self.dining_list.pk))
+        self.assertEqual(self.get_diner_count(), 2)
+        # Without capacity check
+        self.assertTrue(DiningList.objects.add_diner(self.dining_list.pk, False))
+        self.assertEqual(self.get_diner_count(), 3)
+
+    def test_create_over_capacity(self):
+        """Tests that entries saved outside the forms are always counted."""
+        for name in ("", "Klaas", "Jan"):
+            self.create_entry(external_name=name)
+        self.assertEqual(self.get_diner_count(), 3)
+
+    def test_lock_if_not_full(self):
+        self.assertTrue(DiningList.objects.lock_if_not_full(self.dining_list.pk))
+        self.create_entry()
+        self.create_entry(external_name="Klaas")
+        self.assertFalse(DiningList.objects.lock_if_not_full(self.dining_list.pk))
+
+    def test_reconcile_diner_counts(self):
+        self.create_entry()
+        DiningList.objects.update(diner_count=5)
+        self.assertEqual(DiningList.objects.reconcile_diner_counts(), 1)
+        self.assertEqual(self.get_diner_count(), 1)
+        self.assertEqual(DiningList.objects.reconcile_diner_counts(), 0)
+
+
+class CommentCountTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("piet")
+        cls.dining_list = DiningList.objects.create(
+            date=date(2123, 2, 1),
+            association=Association.objects.create(slug="assoc"),
+            sign_up_deadline=datetime(2100, 1, 1, tzinfo=timezone.utc),
+        )
+
+    def create_comment(self, minute):
+        return DiningComment.objects.create(
+            dining_list=self.dining_list,
+            poster=self.user,
+            message="Hello",
+            timestamp=datetime(2123, 1, 1, 12, minute, tzinfo=timezone.utc),
+        )
+
+    def test_create_and_delete(self):
+        later = self.create_comment(30)
+        self.create_comment(10)
+        self.dining_list.refresh_from_db()
+        self.assertEqual(self.dining_list.comment_count, 2)
+        self.assertEqual(self.dining_list.last_comment_at, later.timestamp)
+
+        later.delete()
+        self.dining_list.refresh_from_db()
+        self.assertEqual(self.dining_list.comment_count, 1)
+        self.assertEqual(self.dining_list.last_comment_at.minute, 10)
+
+    def test_has_unread_comments(self):
+        self.assertFalse(self.dining_list.has_unread_comments(None))
+        comment = self.create_comment(10)
+        self.dining_list.refresh_from_db()
+        self.assertTrue(self.dining_list.has_unread_comments(None))
+        self.assertTrue(self.dining_list.has_unread_comments(comment.timestamp))
+        self.assertFalse(
+            self.dining_list.has_unread_comments(
+                datetime(2123, 1, 1, 13, tzinfo=timezone.utc)
+            )
+        )
+
+    def test_reconcile_comment_counts(self):
+        comment = self.create_comment(10)
+        DiningList.objects.update(comment_count=5, last_comment_at=None)
+        self.assertEqual(DiningList.objects.reconcile_comment_counts(), 1)
+        self.dining_list.refresh_from_db()
+        self.assertEqual(self.dining_list.comment_count, 1)
+        self.assertEqual(self.dining_list.last_comment_at, comment.timestamp)
+        self.assertEqual(DiningList.objects.reconcile_comment_counts(), 0)
+
+
+class DailyDiningStatsTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.association = Association.objects.create(slug="assoc", name="Assoc")
+        cls.member = User.objects.create_user("piet", email="piet@localhost")
+        cls.other = User.objects.create_user("klaas", email="klaas@localhost")
+        UserMembership.objects.create(
+            related_user=cls.member, association=cls.association, is_verified=True
+        )
+        cls.dining_list = DiningList.objects.create(
+            date=date(2123, 2, 1),
+            association=cls.association,
+            sign_up_deadline=datetime(2100, 1, 1, tzinfo=timezone.utc),
+        )
+
+    def create_entry(self, user, **kwargs):
+        return DiningEntry.objects.create(
+            dining_list=self.dining_list, user=user, created_by=user, **kwargs
+        )
+
+    def get_stats(self):
+        return DailyDiningStats.objects.values(*DailyDiningStats.COUNTERS).get(
+            date=date(2123, 2, 1), association=self.association
+        )
+
+    def test_entries(self):
+        self.create_entry(self.member)
+        self.create_entry(self.member, external_name="Guest")
+        entry = self.create_entry(self.other)
+        self.assertEqual(
+            self.get_stats(),
+            {
+                "lists_claimed": 1,
+                "entries": 3,
+                "guest_entries": 1,
+                "own_member_entries": 2,
+                "distinct_diners": 2,
+            },
+        )
+        entry.delete()
+        self.assertEqual(self.get_stats()["entries"], 2)
+        self.assertEqual(self.get_stats()["distinct_diners"], 1)
+
+    def test_membership_change(self):
+        self.create_entry(self.other)
+        self.assertEqual(self.get_stats()["own_member_entries"], 0)
+        membership = UserMembership.objects.create(
+            related_user=self.other, association=self.association, is_verified=True
+        )
+        self.assertEqual(self.get_stats()["own_member_entries"], 1)
+        membership.set_verified(False)
+        self.assertEqual(self.get_stats()["own_member_entries"], 0)
+        membership.set_verified(True)
+        membership.save()
+        self.assertEqual(self.get_stats()["own_member_entries"], 1)
+        membership.delete()
+        self.assertEqual(self.get_stats()["own_member_entries"], 0)
+
+    def test_membership_cumulative(self):
+        """Tests that a membership change updates all later days."""
+        self.create_entry(self.other)
+        self.create_entry(self.other, external_name="Guest")
+        later = self.create_list(10)
+        DiningEntry.objects.create(
+            dining_list=later, user=self.other, created_by=self.other
+        )
+        self.create_list(20)
+        UserMembership.objects.create(
+            related_user=self.other, association=self.association, is_verified=True
+        )
+        stats = self.get_all_stats()
+        self.assertEqual([s["cumulative_own_member_entries"] for s in stats], [2, 3, 3])
+        DailyDiningStats.objects.rebuild()
+        self.assertEqual(self.get_all_stats(), stats)
+
+    def test_list_delete(self):
+        self.assertEqual(self.get_stats()["lists_claimed"], 1)
+        self.dining_list.delete()
+        self.assertEqual(self.get_stats()["lists_claimed"], 0)
+
+    def test_list_deltas(self):
+        """Tests deleting a dining list with its entries without the receivers."""
+        other_list = self.create_list(1)
+        DiningEntry.objects.create(
+            dining_list=other_list, user=self.member, created_by=self.member
+        )
+        self.create_entry(self.member)
+        self.create_entry(self.other)
+        self.create_entry(self.other, external_name="Guest")
+
+        deltas = DailyDiningStats.objects.list_deltas(self.dining_list)
+        self.assertEqual(
+            deltas,
+            {
+                "lists_claimed": -1,
+                "entries": -3,
+                "guest_entries": -1,
+                "own_member_entries": -1,
+                "distinct_diners": -1,
+            },
+        )
+        with deleting_dining_list():
+            self.dining_list.dining_entries.all().delete()
+            self.dining_list.delete()
+        DailyDiningStats.objects.add(date(2123, 2, 1), self.association.pk, **deltas)
+        stats = self.get_stats()
+        DailyDiningStats.objects.rebuild()
+        self.assertEqual(self.get_stats(), stats)
+
+    def test_rebuild(self):
+        """Tests that the rebuild gives the same result as the receivers."""
+        self.create_entry(self.member)
+        self.create_entry(self.other, external_name="Guest")
+        stats = self.get_stats()
+        DailyDiningStats.objects.all().delete()
+        self.assertEqual(DailyDiningStats.objects.rebuild(), 1)
+        self.assertEqual(self.get_stats(), stats)
+
+    def create_list(self, day):
+        return DiningList.objects.create(
+            date=date(2123, 2, day),
+            association=self.association,
+            sign_up_deadline=datetime(2100, 1, 1, tzinfo=timezone.utc),
+        )
+
+    def get_all_stats(self):
+        fields = ["date", *DailyDiningStats.COUNTERS, *DailyDiningStats.CUMULATIVE]
+        return list(DailyDiningStats.objects.order_by("date").values(*fields))
+
+    def test_cumulative(self):
+        """Tests the cumulative counts after changes in the middle of the range."""
+        later = self.create_list(10)
+        self.create_entry(self.member)
+        DiningEntry.objects.create(
+            dining_list=later, user=self.other, created_by=self.other
+        )
+        # A new day between existing days
+        middle = self.create_list(5)
+        DiningEntry.objects.create(
+            dining_list=middle,
+            user=self.member,
+            created_by=self.member,
+            external_name="Guest",
+        )
+        self.create_entry(self.other).delete()
+
+        stats = self.get_all_stats()
+        self.assertEqual([s["cumulative_entries"] for s in stats], [1, 2, 3])
+        DailyDiningStats.objects.rebuild()
+        self.assertEqual(self.get_all_stats(), stats)
+
+    def test_totals(self):
+        self.create_entry(self.member)
+        self.create_entry(self.other, external_name="Guest")
+        DiningEntry.objects.create(
+            dining_list=self.create_list(10), user=self.other, created_by=self.other
+        )
+        totals = DailyDiningStats.objects.totals
+        expected = {
+            "lists_claimed": 2,
+            "entries": 3,
+            "guest_entries": 1,
+            "own_member_entries": 1,
+        }
+        self.assertEqual(
+            totals(date(2123, 1, 1), date(2123, 3, 1)),
+            {self.association.pk: expected},
+        )
+        # The end date is exclusive
+        self.assertEqual(
+            totals(date(2123, 2, 2), date(2123, 2, 10))[self.association.pk],
+            dict.fromkeys(expected, 0),
+        )
+        self.assertEqual(
+            totals(date(2123, 2, 2), date(2123, 2, 11))[self.association.pk]["entries"],
+            1,
+        )
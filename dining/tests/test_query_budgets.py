@@ -0,0 +1,35 @@
+from django.test import TestCase, override_settings
+
+from utils.testing import QueryBudget, QueryBudgetTestMixin
+
+
+def day_kwargs(dataset):
+    d = dataset.date
+    return {"year": d.year, "month": d.month, "day": d.day}
+
+
+def slot_kwargs(dataset):
+    return dict(day_kwargs(dataset), identifier=dataset.association.slug)
+
+
+# Allows a dining list on the date for every association of the dataset
+@override_settings(MAX_SLOT_NUMBER=20)
+class DiningQueryBudgetTestCase(QueryBudgetTestMixin, TestCase):
+    urlconf = "dining.urls"
+    budgets = [
+        QueryBudget("index", 0, status_code=302),
+        QueryBudget("diners_csv", 5, query={"from": "01/12/60", "to": "31/01/61"}),
+        QueryBudget("day_view", 29, kwargs=day_kwargs),
+        QueryBudget("new_slot", 19, kwargs=day_kwargs),
+        QueryBudget("slot_details", 31, kwargs=slot_kwargs),
+        QueryBudget("slot_list", 38, kwargs=slot_kwargs),
+        QueryBudget("slot_allergy", 18, kwargs=slot_kwargs),
+        QueryBudget("entry_add", 16, kwargs=slot_kwargs),
+        QueryBudget("slot_change", 22, kwargs=slot_kwargs),
+        QueryBudget("slot_delete", 18, kwargs=slot_kwargs),
+        QueryBudget("statistics", 18, query={"from": "2060-12-01", "to": "2061-02-01"}),
+    ]
+    exempt = {
+        "entry_delete": "Only accepts POST requests",
+        "slot_inform_payment": "Only accepts POST requests",
+    }
@@ -0,0 +1,82 @@
+from datetime import datetime, time, timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from dining.models import DiningEntry, DiningList, PaymentReminderLock
+from general.models import OutgoingMail
+from userdetails.models import Association, User
+
+
+class SendPaymentRemindersCommandTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username="user", email="user@localhost")
+        cls.association = Association.objects.create(slug="assoc", name="Assoc")
+
+    def create_list(self, days_ago: int, has_paid=False, payment_link="https://pay"):
+        list_date = timezone.localdate() - timedelta(days=days_ago)
+        dining_list = DiningList.objects.create(
+            date=list_date,
+            association=self.association,
+            sign_up_deadline=timezone.make_aware(datetime.combine(list_date, time(12))),
+            payment_link=payment_link,
+        )
+        DiningEntry.objects.create(
+            dining_list=dining_list,
+            user=self.user,
+            created_by=self.user,
+            has_paid=has_paid,
+        )
+        return dining_list
+
+    def call(self, **kwargs):
+        call_command("send_payment_reminders", stdout=StringIO(), **kwargs)
+
+    def test_due(self):
+        due = self.create_list(2)
+        self.create_list(0)  # Today
+        self.create_list(2, has_paid=True)
+        self.create_list(2, payment_link="")
+        self.create_list(40)  # Too old
+        self.assertQuerysetEqual(
+            DiningList.objects.due_payment_reminders(
+                timedelta(days=7), timedelta(days=30)
+            ),
+            [due],
+        )
+
+    def test_send(self):
+        dining_list = self.create_list(2)
+        self.call()
+        self.assertEqual(OutgoingMail.objects.count(), 1)
+        self.assertIsNotNone(PaymentReminderLock.objects.get(pk=dining_list.pk).sent)
+
+    def test_throttle(self):
+        """Tests that a list is reminded at most once per interval."""
+        dining_list = self.create_list(2)
+        self.call()
+        self.call()
+        self.assertEqual(OutgoingMail.objects.count(), 1)
+
+        # The interval has passed
+        PaymentReminderLock.objects.filter(pk=dining_list.pk).update(
+            sent=timezone.now() - timedelta(days=8)
+        )
+        self.call()
+        self.assertEqual(OutgoingMail.objects.count(), 2)
+
+    def test_recent_button_reminder(self):
+        """Tests that a reminder sent by an owner counts as well."""
+        dining_list = self.create_list(2)
+        PaymentReminderLock.objects.create(dining_list=dining_list, sent=timezone.now())
+        self.call()
+        self.assertFalse(OutgoingMail.objects.exists())
+
+    def test_dry_run(self):
+        self.create_list(2)
+        self.call(dry_run=True)
+        self.assertFalse(OutgoingMail.objects.exists())
+        self.assertFalse(PaymentReminderLock.objects.exists())
@@ -0,0 +1,71 @@
+from datetime import date, datetime
+
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from dining.models import DiningEntry, DiningList
+from userdetails.models import Association, User, UserMembership
+
+
+class StatisticsViewTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.a1 = Association.objects.create(slug="a1", name="A1")
+        cls.a2 = Association.objects.create(slug="a2", name="A2")
+        cls.users = [
+            User.objects.create(username=f"u{i}", email=f"u{i}@localhost")
+            for i in range(3)
+        ]
+        # User 0 is member of both, user 1 of A1 and user 2 is not verified
+        for user, association, verified in [
+            (cls.users[0], cls.a1, True),
+            (cls.users[0], cls.a2, True),
+            (cls.users[1], cls.a1, True),
+            (cls.users[2], cls.a2, False),
+        ]:
+            UserMembership.objects.create(
+                related_user=user, association=association, is_verified=verified
+            )
+
+        def create_list(association, day):
+            return DiningList.objects.create(
+                date=day,
+                association=association,
+                sign_up_deadline=datetime(2022, 1, 1, tzinfo=timezone.utc),
+            )
+
+        l1 = create_list(cls.a1, date(2022, 1, 10))
+        l2 = create_list(cls.a1, date(2022, 1, 11))
+        create_list(cls.a2, date(2022, 1, 10))  # Without entries
+        outside = create_list(cls.a2, date(2022, 3, 1))
+        for dining_list, user, guest in [
+            (l1, cls.users[0], ""),
+            (l1, cls.users[0], "Guest"),
+            (l1, cls.users[2], ""),
+            (l2, cls.users[0], ""),
+            (l2, cls.users[1], ""),
+            (outside, cls.users[1], ""),
+        ]:
+            DiningEntry.objects.create(
+                dining_list=dining_list,
+                user=user,
+                created_by=user,
+                external_name=guest,
+            )
+
+    def test_counts(self):
+        self.client.force_login(self.users[0])
+        response = self.client.get(
+            reverse("statistics"), {"from": "2022-01-01", "to": "2022-02-01"}
+        )
+        self.assertEqual(
+            response.context["per_association"],
+            {
+                self.a1: {"lists": 2, "users": 2, "entries": 5},
+                self.a2: {"lists": 1, "users": 1, "entries": 0},
+            },
+        )
+        self.assertEqual(
+            response.context["totals"], {"lists": 3, "users": 3, "entries": 5}
+        )
@@ -3,14 +3,14 @@ from datetime import date, datetime
 
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.core.exceptions import NON_FIELD_ERRORS, PermissionDenied
+from django.core.exceptions import NON_FIELD_ERRORS, PermissionDenied, ValidationError
 from django.db import transaction
-from django.db.models import Count, Q
+from django.db.models import Count
 from django.http import (
     Http404,
-    HttpResponse,
     HttpResponseForbidden,
     HttpResponseRedirect,
+    StreamingHttpResponse,
 )
 from django.shortcuts import get_object_or_404, redirect
 from django.urls import reverse
@@ -20,6 +20,7 @@ from django.views.generic import FormView, TemplateView, View
 from django.views.generic.detail import SingleObjectMixin
 
 from dining.datesequence import sequenced_date
+from dining.eligibility import EligibilityEvaluator
 from dining.forms import (
     CreateSlotForm,
     DiningCommentForm,
@@ -32,6 +33,7 @@ from dining.forms import (
     SendReminderForm,
 )
 from dining.models import (
+    DailyDiningStats,
     DiningComment,
     DiningCommentVisitTracker,
     DiningDayAnnouncement,
@@ -39,7 +41,8 @@ from dining.models import (
     DiningList,
 )
 from general.mail_control import send_templated_mail
-from userdetails.models import Association, User
+from userdetails.models import Association, User, UserMembership
+from utils.csv import Echo
 
 
 def index(request):
@@ -103,7 +106,15 @@ class DayView(LoginRequiredMixin, DayMixin, TemplateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
 
-        context["dining_lists"] = DiningList.objects.filter(date=self.date)
+        dining_lists = (
+            DiningList.objects.filter(date=self.date)
+            .select_related("association")
+            .prefetch_related("owners")
+        )
+        context["dining_lists"] = dining_lists
+        context["dining_list_statuses"] = EligibilityEvaluator(
+            self.request.user, dining_lists
+        ).get_statuses()
         context["Announcements"] = DiningDayAnnouncement.objects.filter(date=self.date)
 
         # Make the view clickable
@@ -118,72 +129,57 @@ class DailyDinersCSVView(LoginRequiredMixin, View):
     def get(self, request, *args, **kwargs):
         # Only superusers can access this page
         if not request.user.is_superuser:
-            return HttpResponseForbidden
+            return HttpResponseForbidden()
 
         # Get the end date
         date_end = request.GET.get("to", None)
         if date_end:
-            # Why do you use datetime here and not date?
-            date_end = datetime.strptime(date_end, "%d/%m/%y")
+            date_end = datetime.strptime(date_end, "%d/%m/%y").date()
         else:
-            date_end = timezone.now()
+            date_end = timezone.localdate()
 
         # Filter on a start date
         date_start = request.GET.get("from", None)
         if date_start:
-            date_start = datetime.strptime(date_start, "%d/%m/%y")
+            date_start = datetime.strptime(date_start, "%d/%m/%y").date()
         else:
             date_start = date_end
 
-        # Count all dining entries in the given period
-        entry_count = Count(
-            "diningentry",
-            filter=(
-                Q(diningentry__dining_list__date__lte=date_end)
-                & Q(diningentry__dining_list__date__gte=date_start)
-            ),
+        entries = DiningEntry.objects.filter(
+            dining_list__date__lte=date_end, dining_list__date__gte=date_start
+        )
+        # Count the dining entries of each user in the given period
+        users = (
+            User.objects.filter(diningentry__in=entries)
+            .annotate(diningentry_count=Count("diningentry"))
+            .order_by("pk")
+            .only("first_name", "last_name")
         )
 
-        # Annotate the counts to the user
-        users = User.objects.annotate(diningentry_count=entry_count)
-        users = users.filter(diningentry_count__gt=0)
-
-        # Get the related membership objects for speed optimisation
-        users.select_related("usermembership")
-
-        # Get all associations
-        associations = Association.objects.all()
-
-        # Create the CSV file
-        # Set up
-        response = HttpResponse(content_type="text/csv")
+        # Get all associations with the ids of their verified members who dined,
+        # using a single query
+        associations = list(Association.objects.all())
+        members = {a.pk: set() for a in associations}
+        for association_id, user_id in UserMembership.objects.filter(
+            is_verified=True, related_user__in=entries.values("user")
+        ).values_list("association", "related_user"):
+            members[association_id].add(user_id)
+
+        def rows():
+            yield ["Name", "Joined"] + [a.name for a in associations]
+            for user in users.iterator(chunk_size=2000):
+                yield [user.get_full_name(), user.diningentry_count] + [
+                    1 if user.pk in members[a.pk] else 0 for a in associations
+                ]
+
+        # Stream the CSV file
+        csv_writer = csv.writer(Echo())
+        response = StreamingHttpResponse(
+            (csv_writer.writerow(row) for row in rows()), content_type="text/csv"
+        )
         response[
             "Content-Disposition"
         ] = 'attachment; filename="association_members.csv"'
-        csv_writer = csv.writer(response)
-
-        # Write header
-        header = ["Name", "Joined"]
-        for association in associations:
-            header += [association.name]
-
-        csv_writer.writerow(header)
-
-        # Write content
-        for user in users:
-            user_info = [user.get_full_name(), user.diningentry_count]
-
-            # Get all associated memberships
-            memberships = []
-            for association in associations:
-                if user.is_verified_member_of(association):
-                    memberships.append(1)
-                else:
-                    memberships.append(0)
-
-            csv_writer.writerow(user_info + memberships)
-
-        # Return the CSV file
         return response
 
 
@@ -254,23 +250,23 @@ class DiningListMixin(DayMixin):
 
 
 class UpdateSlotViewTrackerMixin:
-    """Sets comments_total and comments_unread context variables."""
+    """Sets comments_total and comments_unread context variables.
+
+    The comment count and latest comment time are stored on the dining list,
+    so this needs at most one query for the visit of the user.
+    """
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # Get the amount of messages
-        context["comments_total"] = self.dining_list.diningcomment_set.count()
-        # Get the amount of unread messages
-        view_time = DiningCommentVisitTracker.get_latest_visit(
-            user=self.request.user, dining_list=self.dining_list
-        )
-        if view_time is None:
-            context["comments_unread"] = context["comments_total"]
-        else:
-            context["comments_unread"] = self.dining_list.diningcomment_set.filter(
-                timestamp__gte=view_time
-            ).count()
-
+        context["comments_total"] = self.dining_list.comment_count
+        # Whether there are unread messages
+        context["comments_unread"] = False
+        if self.dining_list.comment_count:
+            view_time = DiningCommentVisitTracker.get_latest_visit(
+                user=self.request.user, dining_list=self.dining_list
+            )
+            context["comments_unread"] = self.dining_list.has_unread_comments(view_time)
         return context
 
 
@@ -311,8 +307,13 @@ class EntryAddView(LoginRequiredMixin, DiningListMixin, TemplateView):
             form = DiningEntryInternalForm(request.POST, instance=entry)
 
         if form.is_valid():
-            entry = form.save()
+            try:
+                entry = form.save()
+            except ValidationError as e:
+                # The dining list became full after validating the form
+                form.add_error(None, e)
 
+        if form.is_valid():
             # The entry is for another existing user, send a mail to them.
             if entry.is_internal() and entry.user != request.user:
                 send_templated_mail(
@@ -668,33 +669,44 @@ class StatisticsView(LoginRequiredMixin, TemplateView):
         context = super().get_context_data(**kwargs)
         range_from, range_to = self.get_range()
 
-        # Dining lists in the period
+        # Each count is computed for all associations at once using GROUP BY
         lists = DiningList.objects.filter(date__gte=range_from, date__lt=range_to)
+        # Number of lists and entries of the lists owned by each association,
+        # from the cumulative daily statistics
+        list_counts = DailyDiningStats.objects.totals(range_from, range_to)
+        # Distinct users can't be summed from the daily statistics, because a
+        # user may have dined on multiple days
         # Users who dined in the given period (excludes external entries)
-        users = User.objects.filter(
-            diningentry__dining_list__in=lists, diningentry__external_name=""
-        ).distinct()
-        # Entries in given period
-        entries = DiningEntry.objects.filter(dining_list__in=lists)
-        # Filter on association
+        diners = DiningEntry.objects.filter(
+            dining_list__in=lists, external_name=""
+        ).values("user")
+        # Number of diners that are verified member of each association
+        user_counts = dict(
+            UserMembership.objects.filter(related_user__in=diners, is_verified=True)
+            .order_by()
+            .values("association")
+            .annotate(count=Count("related_user", distinct=True))
+            .values_list("association", "count")
+        )
         per_association = {
             a: {
-                "users": users.filter(
-                    usermembership__association=a, usermembership__is_verified=True
-                ),
-                "lists": lists.filter(association=a),
-                "entries": entries.filter(dining_list__association=a),
+                "users": user_counts.get(a.pk, 0),
+                "lists": list_counts.get(a.pk, {}).get("lists_claimed", 0),
+                "entries": list_counts.get(a.pk, {}).get("entries", 0),
             }
             for a in Association.objects.order_by("name")
         }
+        totals = {
+            "lists": sum(row["lists_claimed"] for row in list_counts.values()),
+            "users": diners.order_by().distinct().count(),
+            "entries": sum(row["entries"] for row in list_counts.values()),
+        }
 
         context.update(
             {
                 "range_from": range_from,
                 "range_to": range_to,
-                "lists": lists,
-                "users": users,
-                "entries": entries,
+                "totals": totals,
                 "per_association": per_association,
                 "next": range_to + (range_to - range_from),
                 "prev": range_from - (range_to - range_from),
@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from general.models import SiteUpdate
+from general.models import OutgoingMail, SiteUpdate
 
 
 class SiteUpdateAdmin(admin.ModelAdmin):
@@ -8,3 +8,10 @@ class SiteUpdateAdmin(admin.ModelAdmin):
 
 
 admin.site.register(SiteUpdate, SiteUpdateAdmin)
+
+
+@admin.register(OutgoingMail)
+class OutgoingMailAdmin(admin.ModelAdmin):
+    list_display = ("subject", "created", "sent", "attempts", "next_attempt")
+    list_filter = ("sent",)
+    readonly_fields = ("sent", "attempts", "last_error")
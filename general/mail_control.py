@@ -1,18 +1,17 @@
 from typing import List
 
 from django.contrib.sites.shortcuts import get_current_site
-from django.core import mail
 from django.core.mail import EmailMessage, EmailMultiAlternatives
 from django.http import HttpRequest
-from django.template.loader import render_to_string
+from django.template import Context
+from django.template.loader import get_template
 
+from general.models import OutgoingMail
 from userdetails.models import User
 
 
-def get_mail_context(
-    recipient: User, extra_context: dict = None, request: HttpRequest = None
-):
-    """Creates the context used in mail templates."""
+def get_site_context(request: HttpRequest = None) -> dict:
+    """Returns the context of the site, which is the same for all recipients."""
     # This is how Django does it with their password reset email
     current_site = get_current_site(request)
     use_https = request.is_secure() if request else False
@@ -20,13 +19,72 @@ def get_mail_context(
     return {
         "domain": current_site.domain,
         "site_name": current_site.name,
-        "recipient": recipient,
         "protocol": protocol,
         "site_uri": "{}://{}".format(protocol, current_site.domain),
+    }
+
+
+def get_mail_context(
+    recipient: User, extra_context: dict = None, request: HttpRequest = None
+):
+    """Creates the context used in mail templates."""
+    return {
+        **get_site_context(request),
+        "recipient": recipient,
         **(extra_context or {}),
     }
 
 
+class MailRenderer:
+    """Renders the templates of a mail for many recipients.
+
+    Everything that doesn't depend on the recipient is done once: loading the
+    templates, finding the site and running the context processors. Only the
+    recipient is added to the context for each mail.
+    """
+
+    def __init__(self, template_dir: str, context: dict = None, request=None):
+        """Constructor.
+
+        See send_templated_mail() for an explanation of the arguments.
+        """
+        self.subject_template = get_template(template_dir + "/subject.txt").template
+        self.html_template = get_template(template_dir + "/body.html").template
+        self.text_template = get_template(template_dir + "/body.txt").template
+
+        # Like render_to_string(), the context processors go below the context
+        self.context = {}
+        if request is not None:
+            for processor in self.html_template.engine.template_context_processors:
+                self.context.update(processor(request))
+        self.context.update(get_site_context(request))
+        self.extra_context = context or {}
+
+    def render(self, recipient: User, context: dict = None) -> EmailMessage:
+        """Renders the mail for one recipient.
+
+        Args:
+            recipient: The user to send the mail to.
+            context: Additional context for only this recipient.
+        """
+        context = Context(
+            {
+                **self.context,
+                "recipient": recipient,
+                **self.extra_context,
+                **(context or {}),
+            }
+        )
+        subject = self.subject_template.render(context).strip()
+        html_body = self.html_template.render(context)
+        text_body = self.text_template.render(context)
+        message = EmailMultiAlternatives(
+            subject=subject, body=text_body, to=[recipient.email]
+        )
+        message.attach_alternative(html_body, "text/html")
+        return message
+
+
 def construct_templated_mail(
     template_dir: str, recipients, context: dict = None, request=None
 ) -> List[EmailMessage]:
@@ -37,26 +95,8 @@ def construct_templated_mail(
     if isinstance(recipients, User):
         recipients = [recipients]
 
-    messages = []
-    for recipient in recipients:
-        # Render templates
-        local_context = get_mail_context(recipient, context, request)
-        subject = render_to_string(
-            template_dir + "/subject.txt", context=local_context, request=request
-        ).strip()
-        html_body = render_to_string(
-            template_dir + "/body.html", context=local_context, request=request
-        )
-        text_body = render_to_string(
-            template_dir + "/body.txt", context=local_context, request=request
-        )
-        # Create message
-        message = EmailMultiAlternatives(
-            subject=subject, body=text_body, to=[recipient.email]
-        )
-        message.attach_alternative(html_body, "text/html")
-        messages.append(message)
-    return messages
+    renderer = MailRenderer(template_dir, context, request)
+    return [renderer.render(recipient) for recipient in recipients]
 
 
 def send_templated_mail(
@@ -64,6 +104,10 @@ def send_templated_mail(
 ):
     """Sends a mail using a template.
 
+    The mail is queued in the outbox and sent in the background by the
+    send_queued_mail management command. When this is called inside a database
+    transaction, the mail is only sent if the transaction is committed.
+
     Args:
         template_dir: The directory containing the email templates. They should
             be named body.html, body.txt and subject.txt.
@@ -76,4 +120,4 @@ def send_templated_mail(
             and for running the standard context processors.
     """
     messages = construct_templated_mail(template_dir, recipients, context, request)
-    mail.get_connection().send_messages(messages)
+    OutgoingMail.objects.queue(messages)
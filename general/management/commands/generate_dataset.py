@@ -0,0 +1,327 @@
+import random
+import time
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import models, transaction
+from django.utils import timezone
+
+from creditmanagement.models import (
+    Account,
+    BalanceCheckpoint,
+    DailyAccountFlow,
+    Transaction,
+)
+from dining.datesequence import sequenced_date
+from dining.models import DailyDiningStats, DiningComment, DiningEntry, DiningList
+from userdetails.models import Association, User, UserMembership
+
+
+class Command(BaseCommand):
+    help = (
+        "Generates a large synthetic dataset with users, associations, "
+        "memberships, dining lists, entries, comments and transactions. "
+        "The data is deterministic given the seed and the date range. "
+        "Rows are bulk inserted, the balances, daily flows, balance "
+        "checkpoints and dining statistics are computed afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=5000)
+        parser.add_argument("--associations", type=int, default=10)
+        parser.add_argument("--years", type=float, default=3)
+        parser.add_argument(
+            "--end",
+            type=date.fromisoformat,
+            default=None,
+            help="Date of the last dining lists, YYYY-MM-DD (default: today).",
+        )
+        parser.add_argument("--lists-per-day", type=int, default=3)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--prefix",
+            default="gen",
+            help="Prefix of the usernames and association slugs (default: gen).",
+        )
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument(
+            "--password",
+            default="dataset",
+            help="Password of all generated users (default: dataset).",
+        )
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options["seed"])
+        self.prefix = options["prefix"]
+        self.counts = defaultdict(int)
+        self.batch_size = options["batch_size"]
+        if options["lists_per_day"] > options["associations"]:
+            raise CommandError("An association can only have one list per day")
+        if User.objects.filter(username__startswith=f"{self.prefix}_").exists():
+            raise CommandError(f"Users with prefix '{self.prefix}' already exist")
+
+        end = options["end"] or timezone.localdate()
+        start = end - timedelta(days=365 * options["years"])
+        start_time = time.perf_counter()
+        with transaction.atomic():
+            self.kitchen = Account.objects.get(special="kitchen_cost")
+            self.create_associations(options["associations"])
+            self.create_users(options["users"], options["password"])
+            self.create_memberships()
+            self.create_dining_lists(start, end, options["lists_per_day"])
+            self.finish()
+        self.stdout.write(
+            self.style.SUCCESS(
+                "Generated {} rows in {:.1f} s".format(
+                    sum(self.counts.values()), time.perf_counter() - start_time
+                )
+            )
+        )
+        for name, count in self.counts.items():
+            self.stdout.write(f"  {name}: {count}")
+
+    def bulk_create(self, model, objs):
+        """Inserts the objects in batches without sending signals.
+
+        Transactions are inserted with a plain QuerySet, because the manager
+        would update the balances and daily flows for each batch.
+        """
+        queryset = models.QuerySet(model)
+        objs = queryset.bulk_create(objs, batch_size=self.batch_size)
+        self.counts[model._meta.verbose_name_plural] += len(objs)
+        return objs
+
+    def create_associations(self, count: int):
+        """Creates the associations and their accounts."""
+        self.stdout.write(f"Creating {count} associations")
+        # Associations use multi-table inheritance, which bulk_create doesn't
+        # support, so these are created one by one.
+        self.associations = []
+        for i in range(count):
+            association = Association.objects.create(
+                name=f"{self.prefix.capitalize()} Association {i}",
+                slug=f"{self.prefix}{i}",
+                has_min_exception=i == 0,
+                has_site_stats_access=i == 0,
+            )
+            self.associations.append(association)
+        self.counts["associations"] += count
+        self.association_accounts = {
+            a.association_id: a
+            for a in Account.objects.filter(association__in=self.associations)
+        }
+
+    def create_users(self, count: int, password: str):
+        """Creates the users and their accounts."""
+        self.stdout.write(f"Creating {count} users")
+        # Hashing is slow, all users share the same password hash
+        password = make_password(password)
+        self.users = self.bulk_create(
+            User,
+            [
+                User(
+                    username=f"{self.prefix}_{i}",
+                    email=f"{self.prefix}_{i}@example.com",
+                    first_name=f"First{i}",
+                    last_name=f"Last{i}",
+                    password=password,
+                    allergies="Nuts" if self.rng.random() < 0.05 else "",
+                )
+                for i in range(count)
+            ],
+        )
+        accounts = self.bulk_create(Account, [Account(user=u) for u in self.users])
+        self.user_accounts = {a.user_id: a for a in accounts}
+        self.balances = defaultdict(Decimal)
+
+    def create_memberships(self):
+        """Creates memberships and board members.
+
+        Every user is member of one association and some of a second one. Most
+        memberships are verified, the others are pending or rejected.
+        """
+        self.stdout.write("Creating memberships")
+        self.members = defaultdict(list)
+        self.primary_association = {}
+        memberships = []
+        now = timezone.now()
+        for user in self.users:
+            associations = [self.rng.choice(self.associations)]
+            if self.rng.random() < 0.2:
+                associations.append(self.rng.choice(self.associations))
+            self.primary_association[user.pk] = associations[0]
+            for association in set(associations):
+                verified = self.rng.random()
+                memberships.append(
+                    UserMembership(
+                        related_user=user,
+                        association=association,
+                        is_verified=verified < 0.95,
+                        verified_on=now if verified < 0.98 else None,
+                        created_on=now,
+                    )
+                )
+                if verified < 0.95:
+                    self.members[association.pk].append(user)
+        self.bulk_create(UserMembership, memberships)
+
+        board = []
+        for association in self.associations:
+            for user in self.members[association.pk][:3]:
+                board.append(
+                    User.groups.through(user_id=user.pk, group_id=association.pk)
+                )
+        self.bulk_create(User.groups.through, board)
+
+    def create_dining_lists(self, start: date, end: date, lists_per_day: int):
+        """Creates the dining lists with entries, comments and transactions."""
+        self.stdout.write(f"Creating dining lists from {start} to {end}")
+        self.pending = defaultdict(list)
+        day = sequenced_date.upcoming(start)
+        while day <= end:
+            for association in self.rng.sample(self.associations, lists_per_day):
+                self.create_dining_list(day, association)
+            if len(self.pending[Transaction]) >= self.batch_size:
+                self.flush()
+            if day.next().year != day.year:
+                self.stdout.write(f"  {day.year} done")
+            day = day.next()
+        self.flush()
+
+    def create_dining_list(self, day: date, association: Association):
+        rng = self.rng
+        members = self.members[association.pk] or self.users
+        owner = rng.choice(members)
+        deadline = timezone.make_aware(datetime.combine(day, datetime.min.time()))
+        deadline += timedelta(hours=17)
+        diner_count = rng.randint(15, 40)
+        dining_list = DiningList(
+            date=day,
+            association=association,
+            sign_up_deadline=deadline,
+            dish=rng.choice(["Pasta", "Curry", "Stamppot", "Lasagne", "Chili", ""]),
+            dining_cost=Decimal(rng.choice(["2.50", "3.00", "3.50"])),
+            payment_link="https://example.com/pay" if rng.random() < 0.5 else "",
+            max_diners=max(diner_count, rng.choice([20, 30, 40])),
+            diner_count=diner_count,
+        )
+        self.pending[DiningList].append(dining_list)
+        self.pending["owners"].append((dining_list, owner))
+
+        # Diners are mostly members of the association
+        diners = set()
+        while len(diners) < diner_count:
+            pool = members if rng.random() < 0.7 else self.users
+            diners.add(rng.choice(pool))
+        diners = sorted(diners, key=lambda u: u.pk)
+        for i, diner in enumerate(diners):
+            # Some entries are guests of the previous diner
+            guest = i > 0 and rng.random() < 0.15
+            user = diners[i - 1] if guest else diner
+            moment = deadline - timedelta(minutes=rng.randint(1, 3 * 24 * 60))
+            tx = self.create_transaction(
+                user, self.kitchen, dining_list.kitchen_cost, moment, "Kitchen cost"
+            )
+            self.pending[DiningEntry].append(
+                DiningEntry(
+                    dining_list=dining_list,
+                    user=user,
+                    created_by=user,
+                    transaction=tx,
+                    external_name=f"Guest of {user.first_name}" if guest else "",
+                    has_paid=rng.random() < 0.8,
+                    has_cooked=i == 0,
+                )
+            )
+
+        # Some users signed up and out again, which is refunded
+        for _ in range(rng.randint(0, 2)):
+            user = rng.choice(self.users)
+            moment = deadline - timedelta(minutes=rng.randint(60, 3 * 24 * 60))
+            tx = self.create_transaction(
+                user, self.kitchen, dining_list.kitchen_cost, moment, "Kitchen cost"
+            )
+            reversal = tx.reversal(user)
+            reversal.moment = moment + timedelta(minutes=rng.randint(1, 59))
+            self.pending[Transaction].append(reversal)
+            self.add_to_balance(reversal)
+
+        for _ in range(rng.randint(0, 3)):
+            comment = DiningComment(
+                dining_list=dining_list,
+                poster=rng.choice(diners),
+                message="Who brings dessert?",
+                timestamp=deadline - timedelta(minutes=rng.randint(1, 600)),
+            )
+            self.pending[DiningComment].append(comment)
+            dining_list.comment_count += 1
+            dining_list.last_comment_at = max(
+                dining_list.last_comment_at or comment.timestamp, comment.timestamp
+            )
+
+    def create_transaction(self, user, target, amount, moment, description):
+        """Adds a transaction from the user, with a deposit when it's needed."""
+        source = self.user_accounts[user.pk]
+        if self.balances[source.pk] < amount:
+            # The user upgrades the balance at its association
+            association = self.primary_association[user.pk]
+            deposit = Transaction(
+                source=self.association_accounts[association.pk],
+                target=source,
+                amount=Decimal(self.rng.choice(["10.00", "20.00", "50.00"])),
+                moment=moment - timedelta(hours=self.rng.randint(1, 48)),
+                description="Deposit",
+                created_by=user,
+            )
+            self.pending[Transaction].append(deposit)
+            self.add_to_balance(deposit)
+        tx = Transaction(
+            source=source,
+            target=target,
+            amount=amount,
+            moment=moment,
+            description=description,
+            created_by=user,
+        )
+        self.pending[Transaction].append(tx)
+        self.add_to_balance(tx)
+        return tx
+
+    def add_to_balance(self, tx: Transaction):
+        self.balances[tx.source_id] -= tx.amount
+        self.balances[tx.target_id] += tx.amount
+
+    def flush(self):
+        """Inserts the pending objects."""
+        pending = self.pending
+        self.bulk_create(DiningList, pending.pop(DiningList, []))
+        self.bulk_create(
+            DiningList.owners.through,
+            [
+                DiningList.owners.through(dininglist_id=d.pk, user_id=u.pk)
+                for d, u in pending.pop("owners", [])
+            ],
+        )
+        self.bulk_create(Transaction, pending.pop(Transaction, []))
+        self.bulk_create(DiningEntry, pending.pop(DiningEntry, []))
+        self.bulk_create(DiningComment, pending.pop(DiningComment, []))
+
+    def finish(self):
+        """Stores the balances and computes the derived tables."""
+        self.stdout.write("Storing balances")
+        accounts = [a for a in Account.objects.all() if a.pk in self.balances]
+        for account in accounts:
+            account.balance += self.balances[account.pk]
+        Account.objects.bulk_update(accounts, ["balance"], batch_size=self.batch_size)
+        self.stdout.write("Computing daily flows")
+        DailyAccountFlow.objects.rebuild()
+        self.stdout.write("Computing balance checkpoints")
+        # The generated transactions are backdated and can end up before
+        # checkpoints of an earlier run, therefore those are rebuilt as well
+        BalanceCheckpoint.objects.all().delete()
+        BalanceCheckpoint.objects.create_monthly()
+        self.stdout.write("Computing dining statistics")
+        DailyDiningStats.objects.rebuild()
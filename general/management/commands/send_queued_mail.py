@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from general.models import OutgoingMail
+
+
+class Command(BaseCommand):
+    help = (
+        "Sends the mails from the outbox. "
+        "Keeps running and polling for new mails unless --once is given."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Send the mails that are due and exit.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=10,
+            help="Seconds to wait when there are no mails to send (default: 10).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=100,
+            help="Maximum number of mails sent over one connection (default: 100).",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            sent, failed = OutgoingMail.objects.deliver(limit=options["batch_size"])
+            if sent or failed:
+                self.stdout.write(f"Sent {sent} mail(s), {failed} failed")
+            if options["once"]:
+                # Continue until all mails that are due have been sent
+                if sent + failed < options["batch_size"]:
+                    return
+            elif not sent and not failed:
+                time.sleep(options["interval"])
@@ -0,0 +1,32 @@
+# Generated by Django 4.1.4 on 2026-10-17 07:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("general", "0004_outgoingmail"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="outgoingmail",
+            name="bcc",
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name="outgoingmail",
+            name="cc",
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name="outgoingmail",
+            name="headers",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name="outgoingmail",
+            name="reply_to",
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
@@ -1,5 +1,10 @@
+from datetime import timedelta
+from typing import Iterable, Tuple
+
 from django.conf import settings
-from django.db import models
+from django.core import mail
+from django.core.mail import EmailMessage, EmailMultiAlternatives
+from django.db import models, transaction
 from django.utils import timezone
 
 
@@ -66,3 +71,153 @@ class PageVisitTracker(AbstractVisitTracker):
             latest_visit_obj.timestamp = timezone.now()
             latest_visit_obj.save()
         return timestamp
+
+
+class OutgoingMailManager(models.Manager):
+    # A delivery attempt is retried after 1, 2, 4, ... minutes
+    MAX_ATTEMPTS = 8
+    # Time during which a worker has claimed mails for delivery
+    CLAIM_DURATION = timedelta(minutes=10)
+
+    def queue(self, messages: Iterable[EmailMessage]):
+        """Stores the messages for delivery by the send_queued_mail command.
+
+        When called inside a database transaction, the mails are only sent if
+        the transaction is committed.
+
+        Raises:
+            ValueError: When a message has attachments or an alternative that
+                is not HTML, these can't be stored.
+        """
+        mails = []
+        for message in messages:
+            if message.attachments:
+                raise ValueError("Mails with attachments can't be queued")
+            html_body = ""
+            for content, mimetype in getattr(message, "alternatives", []):
+                if mimetype != "text/html":
+                    raise ValueError(f"Alternative {mimetype} can't be queued")
+                html_body = content
+            mails.append(
+                OutgoingMail(
+                    subject=message.subject,
+                    body=message.body,
+                    html_body=html_body,
+                    from_email=message.from_email,
+                    to=message.to,
+                    cc=message.cc,
+                    bcc=message.bcc,
+                    reply_to=message.reply_to,
+                    headers=message.extra_headers,
+                )
+            )
+        self.bulk_create(mails)
+
+    def deliver(self, limit: int = 100) -> Tuple[int, int]:
+        """Sends mails that are due, using a single mail server connection.
+
+        The mails are claimed first, so that multiple workers can run at the
+        same time. A mail that fails is retried later with exponential
+        backoff, until MAX_ATTEMPTS is reached.
+
+        Returns:
+            The number of sent mails and the number of failed attempts.
+        """
+        now = timezone.now()
+        with transaction.atomic():
+            mails = list(
+                self.filter(next_attempt__lte=now)
+                .select_for_update(skip_locked=True)
+                .order_by("next_attempt", "pk")[:limit]
+            )
+            self.filter(pk__in=[m.pk for m in mails]).update(
+                next_attempt=now + self.CLAIM_DURATION
+            )
+        if not mails:
+            return 0, 0
+
+        sent = failed = 0
+        connection = mail.get_connection()
+        try:
+            connection.open()
+        except Exception as e:
+            for m in mails:
+                m.fail(e)
+            return 0, len(mails)
+        try:
+            for m in mails:
+                try:
+                    connection.send_messages([m.to_message()])
+                except Exception as e:
+                    m.fail(e)
+                    failed += 1
+                else:
+                    m.sent = timezone.now()
+                    m.next_attempt = None
+                    m.save(update_fields=["sent", "next_attempt"])
+                    sent += 1
+        finally:
+            connection.close()
+        return sent, failed
+
+
+class OutgoingMail(models.Model):
+    """A mail that is queued for delivery.
+
+    Mails are stored in the same database transaction as the change they
+    are about and are sent by the send_queued_mail management command. That
+    way a request doesn't wait for the mail server.
+    """
+
+    created = models.DateTimeField(default=timezone.now)
+    subject = models.TextField()
+    body = models.TextField()
+    html_body = models.TextField(blank=True)
+    from_email = models.CharField(max_length=254)
+    to = models.JSONField()
+    cc = models.JSONField(default=list, blank=True)
+    bcc = models.JSONField(default=list, blank=True)
+    reply_to = models.JSONField(default=list, blank=True)
+    headers = models.JSONField(default=dict, blank=True)
+
+    # When the next delivery attempt is due, None when sent or given up
+    next_attempt = models.DateTimeField(null=True, default=timezone.now)
+    attempts = models.PositiveIntegerField(default=0)
+    sent = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+
+    objects = OutgoingMailManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["next_attempt"], name="outgoingmail_next_attempt_idx")
+        ]
+
+    def __str__(self):
+        return f"{self.subject} to {', '.join(self.to)}"
+
+    def to_message(self) -> EmailMessage:
+        message = EmailMultiAlternatives(
+            subject=self.subject,
+            body=self.body,
+            from_email=self.from_email,
+            to=self.to,
+            cc=self.cc,
+            bcc=self.bcc,
+            reply_to=self.reply_to,
+            headers=self.headers,
+        )
+        if self.html_body:
+            message.attach_alternative(self.html_body, "text/html")
+        return message
+
+    def fail(self, error: Exception):
+        """Records a failed delivery attempt and schedules a retry."""
+        self.attempts += 1
+        self.last_error = repr(error)
+        if self.attempts < OutgoingMail.objects.MAX_ATTEMPTS:
+            delay = timedelta(minutes=2 ** (self.attempts - 1))
+            self.next_attempt = timezone.now() + delay
+        else:
+            self.next_attempt = None
+        self.save(update_fields=["attempts", "last_error", "next_attempt"])
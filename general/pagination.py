@@ -0,0 +1,161 @@
+"""Keyset (cursor) pagination for querysets that are ordered by a moment.
+
+Django's Paginator counts all rows and uses OFFSET to skip to a page, which
+becomes slow for long lists. The cursor paginator instead filters on the
+position of the last row of the previous page, which can be served directly
+from an index on (moment, id). It doesn't know the total number of rows, so
+it only supports next and previous links.
+"""
+from datetime import datetime
+from typing import Callable, List, Optional, Tuple
+
+from django.db.models import Q, QuerySet
+
+
+class CursorPage:
+    """A page of a CursorPaginator."""
+
+    def __init__(
+        self,
+        object_list: List,
+        paginator: "CursorPaginator",
+        has_next: bool,
+        has_previous: bool,
+    ):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self) -> bool:
+        return self._has_next
+
+    def has_previous(self) -> bool:
+        return self._has_previous
+
+    def has_other_pages(self) -> bool:
+        return self.has_next() or self.has_previous()
+
+    def next_cursor(self) -> Optional[str]:
+        """Cursor for the page after this one, for the 'after' query parameter."""
+        if not self.has_next():
+            return None
+        return self.paginator.get_cursor(self.object_list[-1])
+
+    def previous_cursor(self) -> Optional[str]:
+        """Cursor for the page before this one, for the 'before' query parameter."""
+        if not self.has_previous():
+            return None
+        return self.paginator.get_cursor(self.object_list[0])
+
+
+class CursorPaginator:
+    """Paginates a queryset from new to old, keyed on (moment, id).
+
+    The cursor of a row is its moment and id. The page after a cursor contains
+    the rows that are older than the cursor row, the page before a cursor the
+    rows that are newer.
+    """
+
+    def __init__(
+        self,
+        object_list: QuerySet,
+        per_page: int,
+        field: str = "moment",
+        filter_rows: Callable[[Q], QuerySet] = None,
+    ):
+        """Constructor.
+
+        Args:
+            object_list: The queryset, the ordering will be overridden.
+            per_page: Number of rows on each page.
+            field: The datetime field that is used as the primary sort key.
+                The primary key is used as tiebreaker.
+            filter_rows: Returns the rows of object_list that match a condition.
+                This is needed when object_list is a union, which can't be
+                filtered, see TransactionQuerySet.filter_account(). Defaults to
+                object_list.filter.
+        """
+        self.object_list = object_list
+        self.per_page = per_page
+        self.field = field
+        self.filter_rows = filter_rows or object_list.filter
+
+    def get_cursor(self, obj) -> str:
+        return "{}_{}".format(getattr(obj, self.field).isoformat(), obj.pk)
+
+    @staticmethod
+    def parse_cursor(cursor: str) -> Optional[Tuple[datetime, int]]:
+        """Returns the moment and id of the cursor or None when it is invalid."""
+        try:
+            moment, pk = cursor.rsplit("_", 1)
+            return datetime.fromisoformat(moment), int(pk)
+        except (AttributeError, ValueError):
+            return None
+
+    def get_page(self, after: str = None, before: str = None) -> CursorPage:
+        """Returns the page after or before the given cursor.
+
+        If the cursor is missing or invalid, the first page is returned.
+        """
+        f = self.field
+        after = self.parse_cursor(after)
+        before = self.parse_cursor(before)
+        if before and not after:
+            moment, pk = before
+            qs = self.filter_rows(
+                Q(**{f"{f}__gt": moment}) | Q(**{f: moment, "pk__gt": pk})
+            ).order_by(f, "pk")
+            rows = list(qs[: self.per_page + 1])
+            has_previous = len(rows) > self.per_page
+            rows = rows[: self.per_page]
+            rows.reverse()
+            return CursorPage(rows, self, has_next=True, has_previous=has_previous)
+
+        qs = self.object_list
+        if after:
+            moment, pk = after
+            qs = self.filter_rows(
+                Q(**{f"{f}__lt": moment}) | Q(**{f: moment, "pk__lt": pk})
+            )
+        qs = qs.order_by(f"-{f}", "-pk")
+        rows = list(qs[: self.per_page + 1])
+        return CursorPage(
+            rows[: self.per_page],
+            self,
+            has_next=len(rows) > self.per_page,
+            has_previous=bool(after),
+        )
+
+
+class CursorPaginationMixin:
+    """Replaces the page number pagination of a ListView by cursor pagination.
+
+    The page is selected using the 'after' or 'before' query parameter. Set
+    paginate_by to the page size. Override filter_queryset() when the queryset
+    is a union.
+    """
+
+    paginator_class = CursorPaginator
+
+    def filter_queryset(self, condition: Q) -> QuerySet:
+        """Returns the rows of the queryset that match the condition."""
+        return self.get_queryset().filter(condition)
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator = self.get_paginator(queryset, page_size)
+        page = paginator.get_page(
+            after=self.request.GET.get("after"), before=self.request.GET.get("before")
+        )
+        return paginator, page, page.object_list, page.has_other_pages()
+
+    def get_paginator(self, queryset, per_page, *args, **kwargs):
+        return self.paginator_class(
+            queryset, per_page, filter_rows=self.filter_queryset
+        )
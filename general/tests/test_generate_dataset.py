@@ -0,0 +1,57 @@
+from datetime import date
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from creditmanagement.models import Account, DailyAccountFlow
+from dining.models import DailyDiningStats, DiningEntry, DiningList
+from userdetails.models import User
+
+
+class GenerateDatasetTestCase(TestCase):
+    def generate(self, **kwargs):
+        # A quarter of a year
+        options = {
+            "users": 60,
+            "associations": 4,
+            "years": 0.25,
+            "end": date(2022, 3, 31),
+            "lists_per_day": 2,
+            "stdout": StringIO(),
+        }
+        options.update(kwargs)
+        call_command("generate_dataset", **options)
+
+    def test_consistent(self):
+        self.generate()
+        self.assertEqual(User.objects.count(), 60)
+        self.assertTrue(DiningEntry.objects.exists())
+        self.assertTrue(DailyAccountFlow.objects.exists())
+        self.assertTrue(DailyDiningStats.objects.exists())
+        # Stored balances and diner counts match the rows
+        self.assertEqual(Account.objects.recompute_balances(), 0)
+        self.assertEqual(DiningList.objects.reconcile_diner_counts(), 0)
+        self.assertEqual(DiningList.objects.reconcile_comment_counts(), 0)
+
+    def test_rerun(self):
+        """Tests that a second run keeps the balance checkpoints consistent."""
+        self.generate(prefix="a", end=date(2022, 3, 31))
+        self.generate(prefix="b", end=date(2022, 4, 30))
+        self.assertEqual(Account.objects.recompute_balances(), 0)
+        for account in Account.objects.all():
+            self.assertEqual(account.compute_balance(), account.balance)
+
+    def test_deterministic(self):
+        self.generate(seed=3, prefix="a")
+        self.generate(seed=3, prefix="b")
+        entries = DiningEntry.objects.order_by("pk")
+        first, second = [
+            list(
+                entries.filter(user__username__startswith=prefix).values_list(
+                    "dining_list__date", "external_name", "has_paid"
+                )
+            )
+            for prefix in ("a_", "b_")
+        ]
+        self.assertEqual(first, second)
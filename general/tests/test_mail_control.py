@@ -0,0 +1,45 @@
+from unittest.mock import patch
+
+from django.template.loader import render_to_string
+from django.test import RequestFactory, TestCase
+
+from general.mail_control import construct_templated_mail, get_mail_context
+from userdetails.models import User
+
+
+class ConstructTemplatedMailTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [
+            User.objects.create_user(f"user{i}", email=f"user{i}@localhost")
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        self.request = RequestFactory().get("/")
+        self.request.user = self.users[0]
+
+    def test_same_as_render_to_string(self):
+        """Tests that the mails equal the templates rendered one by one."""
+        messages = construct_templated_mail(
+            "mail/test", self.users, {"extra": 1}, self.request
+        )
+        self.assertEqual(len(messages), 3)
+        for user, message in zip(self.users, messages):
+            context = get_mail_context(user, {"extra": 1}, self.request)
+            html_body = render_to_string(
+                "mail/test/body.html", context, request=self.request
+            )
+            text_body = render_to_string(
+                "mail/test/body.txt", context, request=self.request
+            )
+            self.assertEqual(message.to, [user.email])
+            self.assertEqual(message.subject, "Scala Dining test mail")
+            self.assertEqual(message.body, text_body)
+            self.assertEqual(message.alternatives, [(html_body, "text/html")])
+
+    @patch("general.mail_control.get_current_site")
+    def test_shared_context_once(self, mock_site):
+        """Tests that the site is looked up once for all recipients."""
+        construct_templated_mail("mail/test", self.users, request=self.request)
+        self.assertEqual(mock_site.call_count, 1)
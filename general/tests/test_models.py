@@ -0,0 +1,92 @@
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+from django.core import mail
+from django.core.mail import EmailMultiAlternatives
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase
+from django.utils import timezone
+
+from general.models import OutgoingMail
+
+
+def create_message(to="jan@localhost"):
+    message = EmailMultiAlternatives(subject="Hi", body="Text", to=[to])
+    message.attach_alternative("<p>Html</p>", "text/html")
+    return message
+
+
+class OutgoingMailTestCase(TestCase):
+    def test_queue_and_deliver(self):
+        OutgoingMail.objects.queue([create_message(), create_message("piet@localhost")])
+        self.assertEqual(len(mail.outbox), 0)
+
+        self.assertEqual(OutgoingMail.objects.deliver(), (2, 0))
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(mail.outbox[0].to, ["jan@localhost"])
+        self.assertEqual(mail.outbox[0].body, "Text")
+        self.assertEqual(mail.outbox[0].alternatives, [("<p>Html</p>", "text/html")])
+        # Sent mails are not sent again
+        self.assertEqual(OutgoingMail.objects.deliver(), (0, 0))
+        self.assertFalse(OutgoingMail.objects.filter(sent=None).exists())
+
+    def test_recipients_and_headers(self):
+        message = EmailMultiAlternatives(
+            subject="Hi",
+            body="Text",
+            to=["jan@localhost"],
+            cc=["piet@localhost"],
+            bcc=["klaas@localhost"],
+            reply_to=["board@localhost"],
+            headers={"X-Dining-List": "1"},
+        )
+        OutgoingMail.objects.queue([message])
+        OutgoingMail.objects.deliver()
+        sent = mail.outbox[0]
+        self.assertEqual(sent.cc, ["piet@localhost"])
+        self.assertEqual(sent.bcc, ["klaas@localhost"])
+        self.assertEqual(sent.reply_to, ["board@localhost"])
+        self.assertEqual(sent.extra_headers, {"X-Dining-List": "1"})
+
+    def test_attachment(self):
+        """Tests that a mail with an attachment is refused instead of stripped."""
+        message = create_message()
+        message.attach("list.csv", "a,b", "text/csv")
+        with self.assertRaises(ValueError):
+            OutgoingMail.objects.queue([message])
+        self.assertFalse(OutgoingMail.objects.exists())
+
+    def test_rollback(self):
+        """Tests that a mail is not queued when the transaction is rolled back."""
+        with transaction.atomic():
+            OutgoingMail.objects.queue([create_message()])
+            transaction.set_rollback(True)
+        self.assertFalse(OutgoingMail.objects.exists())
+
+    @patch("django.core.mail.backends.locmem.EmailBackend.send_messages")
+    def test_retry(self, mock_send):
+        mock_send.side_effect = ConnectionError("Server down")
+        OutgoingMail.objects.queue([create_message()])
+
+        self.assertEqual(OutgoingMail.objects.deliver(), (0, 1))
+        outgoing = OutgoingMail.objects.get()
+        self.assertEqual(outgoing.attempts, 1)
+        self.assertIn("Server down", outgoing.last_error)
+        self.assertGreater(outgoing.next_attempt, timezone.now())
+        # Not due yet
+        self.assertEqual(OutgoingMail.objects.deliver(), (0, 0))
+
+        # Give up after the last attempt
+        OutgoingMail.objects.update(
+            attempts=OutgoingMail.objects.MAX_ATTEMPTS - 1,
+            next_attempt=timezone.now() - timedelta(seconds=1),
+        )
+        self.assertEqual(OutgoingMail.objects.deliver(), (0, 1))
+        self.assertIsNone(OutgoingMail.objects.get().next_attempt)
+
+    def test_command(self):
+        OutgoingMail.objects.queue([create_message() for _ in range(3)])
+        call_command("send_queued_mail", "--once", "--batch-size=2", stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 3)
@@ -0,0 +1,13 @@
+from django.test import TestCase
+
+from utils.testing import QueryBudget, QueryBudgetTestMixin
+
+
+class GeneralQueryBudgetTestCase(QueryBudgetTestMixin, TestCase):
+    urlconf = "general.urls"
+    budgets = [
+        QueryBudget("site_updates", 19),
+        QueryBudget("help_page", 15),
+        QueryBudget("rules_and_regulations", 17),
+        QueryBudget("upgrade_instructions", 17),
+    ]
@@ -99,14 +99,14 @@ class AssociationLinkForm(forms.Form):
             .order_by("slug")
         )
 
+        memberships = {
+            m.association_id: m
+            for m in UserMembership.objects.filter(related_user=user)
+        }
+
         for association in associations:
             # Find membership.
-            try:
-                membership = UserMembership.objects.get(
-                    related_user=user, association=association
-                )
-            except UserMembership.DoesNotExist:
-                membership = None
+            membership = memberships.get(association.pk)
 
             # Construct boolean field for the association.
             field = forms.BooleanField(
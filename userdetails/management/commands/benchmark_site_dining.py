@@ -0,0 +1,91 @@
+import statistics
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Max
+from django.test import Client
+from django.test.utils import (
+    CaptureQueriesContext,
+    setup_test_environment,
+    teardown_test_environment,
+)
+from django.urls import reverse
+
+from dining.models import DiningEntry, DiningList
+from userdetails.models import Association
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures the response time and query count of the site dining "
+        "statistics page, e.g. on the dataset of generate_dataset. The page is "
+        "requested by a board member of an association with site statistics "
+        "access."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--association",
+            help="Slug of the association (default: the first with site access).",
+        )
+        parser.add_argument(
+            "--end",
+            type=date.fromisoformat,
+            default=None,
+            help="Last date of the range, YYYY-MM-DD (default: last dining list).",
+        )
+        parser.add_argument(
+            "--days", type=int, default=365, help="Length of the range (default: 365)."
+        )
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        associations = Association.objects.filter(has_site_stats_access=True)
+        if options["association"]:
+            associations = associations.filter(slug=options["association"])
+        association = associations.order_by("pk").first()
+        if not association:
+            raise CommandError("No association with site statistics access found")
+        user = association.user_set.order_by("pk").first()
+        if not user:
+            raise CommandError(f"{association} has no board members")
+
+        end = options["end"] or DiningList.objects.aggregate(end=Max("date"))["end"]
+        if not end:
+            raise CommandError("There are no dining lists")
+        start = end - timedelta(days=options["days"])
+        entries = DiningEntry.objects.filter(
+            dining_list__date__gte=start, dining_list__date__lte=end
+        ).count()
+        self.stdout.write(f"Range {start} to {end} with {entries} dining entries")
+
+        setup_test_environment()
+        try:
+            client = Client()
+            client.force_login(user)
+            url = reverse(
+                "association_site_dining_stats",
+                kwargs={"association_name": association.slug},
+            )
+            query = {"date_start": start.isoformat(), "date_end": end.isoformat()}
+            durations = []
+            for _ in range(options["repeat"]):
+                with CaptureQueriesContext(connection) as context:
+                    begin = time.perf_counter()
+                    response = client.get(url, query)
+                    durations.append(time.perf_counter() - begin)
+                if response.status_code != 200:
+                    raise CommandError(f"Got status code {response.status_code}")
+        finally:
+            teardown_test_environment()
+
+        self.stdout.write(
+            "{} requests: min {:.1f} ms, median {:.1f} ms, {} queries".format(
+                len(durations),
+                min(durations) * 1000,
+                statistics.median(durations) * 1000,
+                len(context),
+            )
+        )
@@ -4,11 +4,18 @@ from django.contrib.auth.models import AbstractUser, Group, GroupManager
 from django.contrib.auth.models import UserManager as DjangoUserManager
 from django.core.exceptions import ValidationError
 from django.db import models
+from django.db.models import F, QuerySet
 from django.utils import timezone
 from django.utils.functional import cached_property
 
 
-class UserManager(DjangoUserManager):
+class UserQuerySet(QuerySet):
+    def with_balance(self):
+        """Annotates the account balance of each user as 'balance'."""
+        return self.annotate(balance=F("account__balance"))
+
+
+class UserManager(DjangoUserManager.from_queryset(UserQuerySet)):
     def get_by_natural_key(self, username):
         # See https://docs.djangoproject.com/en/4.1/topics/serialization/#natural-keys
         # Allow the use of id to lookup as well
@@ -127,7 +134,13 @@ class User(AbstractUser):
         return True in exceptions
 
 
-class AssociationManager(GroupManager):
+class AssociationQuerySet(QuerySet):
+    def with_balance(self):
+        """Annotates the account balance of each association as 'balance'."""
+        return self.annotate(balance=F("account__balance"))
+
+
+class AssociationManager(GroupManager.from_queryset(AssociationQuerySet)):
     def get_by_natural_key(self, slug):
         # See https://docs.djangoproject.com/en/4.1/topics/serialization/#natural-keys
         return self.get(slug=slug)
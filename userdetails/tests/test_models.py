@@ -1,9 +1,11 @@
 from datetime import datetime
+from decimal import Decimal
 
 from django.core.exceptions import ValidationError
 from django.test import TestCase
 from django.utils import timezone
 
+from creditmanagement.models import Transaction
 from userdetails.models import Association, User, UserMembership
 
 
@@ -19,6 +21,22 @@ class AssociationTestCase(TestCase):
         UserMembership.objects.create(related_user=user, association=self.association)
         self.assertTrue(self.association.has_new_member_requests())
 
+    def test_with_balance(self):
+        user = User.objects.create_user("ankie")
+        Transaction.objects.create(
+            source=self.association.account,
+            target=user.account,
+            amount=Decimal("2.50"),
+            created_by=user,
+        )
+        self.assertEqual(
+            Association.objects.with_balance().get(pk=self.association.pk).balance,
+            Decimal("-2.50"),
+        )
+        self.assertEqual(
+            User.objects.with_balance().get(pk=user.pk).balance, Decimal("2.50")
+        )
+
 
 class UserTestCase(TestCase):
     @classmethod
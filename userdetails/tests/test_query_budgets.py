@@ -0,0 +1,46 @@
+from django.test import TestCase
+
+from utils.testing import QueryBudget, QueryBudgetTestMixin
+
+
+def association_kwargs(dataset):
+    return {"association_name": dataset.association.slug}
+
+
+DATE_RANGE = {"date_start": "2060-12-01", "date_end": "2061-01-31"}
+
+
+class UserDetailsQueryBudgetTestCase(QueryBudgetTestMixin, TestCase):
+    urlconf = "userdetails.urls"
+    budgets = [
+        QueryBudget("association_overview", 20, kwargs=association_kwargs),
+        QueryBudget("association_credits", 24, kwargs=association_kwargs),
+        QueryBudget("association_process_negatives", 18, kwargs=association_kwargs),
+        QueryBudget("association_transactions_csv", 6, kwargs=association_kwargs),
+        QueryBudget("association_transaction_add", 19, kwargs=association_kwargs),
+        QueryBudget("association_members", 20, kwargs=association_kwargs),
+        QueryBudget("association_members_edit", 19, kwargs=association_kwargs),
+        QueryBudget("association_settings", 17, kwargs=association_kwargs),
+        QueryBudget(
+            "association_site_dining_stats",
+            21,
+            kwargs=association_kwargs,
+            query=DATE_RANGE,
+        ),
+        QueryBudget("association_site_credit_stats", 19, kwargs=association_kwargs),
+        QueryBudget("association_site_transaction_add", 21, kwargs=association_kwargs),
+        QueryBudget(
+            "association_site_credit_detail",
+            21,
+            kwargs=lambda dataset: dict(
+                association_kwargs(dataset), slug="kitchen_cost"
+            ),
+            query=DATE_RANGE,
+        ),
+        QueryBudget("history_lists", 20),
+        QueryBudget("history_claimed_lists", 20),
+        QueryBudget("settings_account", 16),
+        QueryBudget("account_login", 2, status_code=302),
+        QueryBudget("account_signup", 1),
+        QueryBudget("people_autocomplete", 4, query={"q": "jan"}),
+    ]
@@ -0,0 +1,64 @@
+from datetime import date, datetime
+
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from dining.models import DiningEntry, DiningList
+from userdetails.models import Association, User, UserMembership
+
+
+class SiteDiningViewTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.a1 = Association.objects.create(
+            slug="a1", name="A1", has_site_stats_access=True
+        )
+        cls.a2 = Association.objects.create(slug="a2", name="A2")
+        cls.board = User.objects.create(username="board", email="board@localhost")
+        cls.a1.user_set.add(cls.board)
+        cls.both = User.objects.create(username="both", email="both@localhost")
+        cls.one = User.objects.create(username="one", email="one@localhost")
+        for user, association, verified in [
+            (cls.both, cls.a1, True),
+            (cls.both, cls.a2, True),
+            (cls.one, cls.a1, True),
+            (cls.one, cls.a2, False),
+        ]:
+            UserMembership.objects.create(
+                related_user=user, association=association, is_verified=verified
+            )
+        dining_lists = [
+            DiningList.objects.create(
+                date=date(2022, 1, day),
+                association=cls.a1,
+                sign_up_deadline=datetime(2022, 1, 1, tzinfo=timezone.utc),
+            )
+            for day in (10, 11)
+        ]
+        for dining_list in dining_lists:
+            for user in (cls.both, cls.one):
+                DiningEntry.objects.create(
+                    dining_list=dining_list, user=user, created_by=user
+                )
+        DiningEntry.objects.create(
+            dining_list=dining_lists[0],
+            user=cls.both,
+            created_by=cls.both,
+            external_name="Guest",
+        )
+
+    def test_stats(self):
+        self.client.force_login(self.board)
+        response = self.client.get(
+            reverse("association_site_dining_stats", args=["a1"]),
+            {"date_start": "2022-01-01", "date_end": "2022-01-31"},
+        )
+        stats = response.context["stats"]
+        self.assertEqual(stats[self.a1.pk]["lists_claimed"], 2)
+        self.assertEqual(stats[self.a1.pk]["cooked_for"], 5)
+        self.assertEqual(stats[self.a1.pk]["cooked_for_own"], 5)
+        self.assertEqual(stats[self.a2.pk]["lists_claimed"], 0)
+        # 'both' has 3 entries divided over 2 associations, 'one' has 2
+        self.assertEqual(stats[self.a1.pk]["weighted_eaters"], 3.5)
+        self.assertEqual(stats[self.a2.pk]["weighted_eaters"], 1.5)
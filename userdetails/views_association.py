@@ -1,22 +1,24 @@
-from decimal import Decimal
+from collections import defaultdict
+from datetime import timedelta
+from functools import partial
 
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.core.exceptions import PermissionDenied
-from django.core.paginator import Paginator
-from django.db.models import Count, Q, Sum
-from django.http import HttpResponse, HttpResponseRedirect
+from django.db.models import Count, Prefetch, Q
+from django.http import HttpResponseRedirect
 from django.shortcuts import get_object_or_404, render
 from django.urls import reverse
 from django.utils.http import url_has_allowed_host_and_scheme
 from django.views import View
 from django.views.generic import DetailView, FormView, ListView, TemplateView
 
-from creditmanagement.csv import write_transactions_csv
+from creditmanagement.csv import transactions_csv_response
 from creditmanagement.forms import ClearOpenExpensesForm, SiteWideTransactionForm
-from creditmanagement.models import Account, Transaction
+from creditmanagement.models import Account, DailyAccountFlow, Transaction
 from creditmanagement.views import TransactionFormView
-from dining.models import DiningEntry, DiningList
+from dining.models import DailyDiningStats, DiningEntry, DiningList
+from general.pagination import CursorPaginationMixin, CursorPaginator
 from general.views import DateRangeFilterMixin
 from userdetails.forms import AssociationSettingsForm
 from userdetails.models import Association, User, UserMembership
@@ -52,14 +54,17 @@ class AssociationHasSiteAccessMixin:
 
 
 class AssociationTransactionListView(
-    LoginRequiredMixin, AssociationBoardMixin, ListView
+    LoginRequiredMixin, AssociationBoardMixin, CursorPaginationMixin, ListView
 ):
     template_name = "accounts/association_credits.html"
     paginate_by = 100
 
     def get_queryset(self):
-        return Transaction.objects.filter_account(self.association.account).order_by(
-            "-moment"
+        return self.filter_queryset(Q())
+
+    def filter_queryset(self, condition):
+        return Transaction.objects.select_accounts().filter_account(
+            self.association.account, condition
         )
 
 
@@ -120,15 +125,9 @@ class AssociationTransactionsCSVView(LoginRequiredMixin, AssociationBoardMixin,
     """Returns a CSV file with all transactions."""
 
     def get(self, request, *args, **kwargs):
-        response = HttpResponse(content_type="text/csv")
-        response[
-            "Content-Disposition"
-        ] = 'attachment; filename="association_transactions.csv"'
-        qs = Transaction.objects.filter_account(self.association.account).order_by(
-            "-moment"
+        return transactions_csv_response(
+            self.association.account, "association_transactions.csv"
         )
-        write_transactions_csv(response, qs, self.association.account)
-        return response
 
 
 class MembersOverview(LoginRequiredMixin, AssociationBoardMixin, ListView):
@@ -137,9 +136,15 @@ class MembersOverview(LoginRequiredMixin, AssociationBoardMixin, ListView):
 
     def get_queryset(self):
         # We include inactive users who are still a member of the association.
-        return User.objects.filter(
-            Q(usermembership__association=self.association)
-            & Q(usermembership__is_verified=True)
+        return (
+            User.objects.with_balance()
+            .filter(
+                Q(usermembership__association=self.association)
+                & Q(usermembership__is_verified=True)
+            )
+            .prefetch_related(
+                Prefetch("account", queryset=Account.objects.with_negative_since())
+            )
         )
 
 
@@ -150,7 +155,7 @@ class AssociationOverview(LoginRequiredMixin, AssociationBoardMixin, TemplateVie
         context = super().get_context_data(**kwargs)
         context["pending_memberships"] = UserMembership.objects.filter(
             association=self.association, verified_on__isnull=True
-        )
+        ).select_related("related_user")
         return context
 
 
@@ -159,8 +164,10 @@ class MembersEditView(LoginRequiredMixin, AssociationBoardMixin, ListView):
     paginate_by = 50
 
     def get_queryset(self):
-        return UserMembership.objects.filter(Q(association=self.association)).order_by(
-            "is_verified", "verified_on", "created_on"
+        return (
+            UserMembership.objects.filter(Q(association=self.association))
+            .select_related("related_user")
+            .order_by("is_verified", "verified_on", "created_on")
         )
 
     def _alter_state(self, verified, id):
@@ -237,47 +244,45 @@ class SiteDiningView(
             dining_lists = DiningList.objects.filter(
                 date__gte=self.date_start, date__lte=self.date_end
             )
+            # Get general data for each association, from the cumulative daily
+            # statistics. The end date of the range is inclusive.
+            daily_stats = DailyDiningStats.objects.totals(
+                self.date_start, self.date_end + timedelta(days=1)
+            )
             association_stats = {}
-
-            # Get general data for each association
             for association in Association.objects.all():
-                # Some general statistics
-                cooked_for = DiningEntry.objects.filter(
-                    dining_list__association=association, dining_list__in=dining_lists
-                )
-                memberships = UserMembership.objects.filter(
-                    association=association, is_verified=True
-                )
-                members = User.objects.filter(usermembership__in=memberships)
-
-                cooked_for_own = cooked_for.filter(user__in=members)
-
+                row = daily_stats.get(association.id, {})
                 association_stats[association.id] = {
                     "association": association,
-                    "lists_claimed": dining_lists.filter(
-                        association=association
-                    ).count(),
-                    "cooked_for": cooked_for.count(),
-                    "cooked_for_own": cooked_for_own.count(),
+                    "lists_claimed": row.get("lists_claimed", 0),
+                    "cooked_for": row.get("entries", 0),
+                    "cooked_for_own": row.get("own_member_entries", 0),
                     "weighted_eaters": 0,
                 }
-            # Get general data for all members. Note: this is done here as the length of members is significantly longer
-            # than the number of associations so this should be quicker
-            users = User.objects.filter(
-                diningentry__dining_list__in=dining_lists
-            ).annotate(dining_entry_count=Count("diningentry"))
-
-            for user in users:
-                memberships = UserMembership.objects.filter(
-                    is_verified=True, related_user=user
+            # Weighted eaters: the entries of each user are divided over the
+            # associations the user is a verified member of. The entry counts
+            # and the memberships are both fetched with one query.
+            entry_counts = dict(
+                DiningEntry.objects.filter(dining_list__in=dining_lists)
+                .order_by()
+                .values("user")
+                .annotate(count=Count("pk"))
+                .values_list("user", "count")
+            )
+            memberships = defaultdict(list)
+            for user_id, association_id in (
+                UserMembership.objects.filter(
+                    is_verified=True,
+                    related_user__diningentry__dining_list__in=dining_lists,
                 )
-                if memberships:
-                    user_weight = user.dining_entry_count / memberships.count()
-
-                    for membership in memberships:
-                        association_stats[membership.association_id][
-                            "weighted_eaters"
-                        ] += user_weight
+                .values_list("related_user", "association")
+                .distinct()
+            ):
+                memberships[user_id].append(association_id)
+            for user_id, association_ids in memberships.items():
+                user_weight = entry_counts[user_id] / len(association_ids)
+                for association_id in association_ids:
+                    association_stats[association_id]["weighted_eaters"] += user_weight
             context["stats"] = association_stats
         return context
 
@@ -293,7 +298,7 @@ class SiteCreditView(
         context = super().get_context_data(**kwargs)
 
         # Get the balance for each association
-        context["associations"] = Association.objects.all()
+        context["associations"] = Association.objects.with_balance()
         context["special_accounts"] = Account.objects.filter(special__isnull=False)
         return context
 
@@ -346,24 +351,25 @@ class SiteCreditDetailView(
         account = context["object"]
 
         # Paginate transactions
-        transaction_qs = account.get_transactions().order_by("-moment")
-        paginator = Paginator(transaction_qs, 100)
-        page_number = self.request.GET.get("page")
-        page_obj = paginator.get_page(page_number)
+        transaction_qs = Transaction.objects.select_accounts().select_related(
+            "created_by"
+        )
+        paginator = CursorPaginator(
+            transaction_qs.filter_account(account),
+            100,
+            filter_rows=partial(transaction_qs.filter_account, account),
+        )
+        page_obj = paginator.get_page(
+            after=self.request.GET.get("after"), before=self.request.GET.get("before")
+        )
         context["page_obj"] = page_obj
 
         # Handle income/outcome flow
-        # We only handle and show the form if we're on page 1
-        if page_obj.number == 1 and self.date_range_form.is_valid():
-            qs = Transaction.objects.filter(
-                moment__gte=self.date_start, moment__lte=self.date_end
+        # We only handle and show the form on the first page
+        if not page_obj.has_previous() and self.date_range_form.is_valid():
+            influx, outflux = DailyAccountFlow.objects.get_flow(
+                account, self.date_start, self.date_end
             )
-            influx = qs.filter(target=account).aggregate(sum=Sum("amount"))[
-                "sum"
-            ] or Decimal("0.00")
-            outflux = qs.filter(source=account).aggregate(sum=Sum("amount"))[
-                "sum"
-            ] or Decimal("0.00")
 
             context["dining_balance"] = {
                 "influx": influx,
@@ -0,0 +1,11 @@
+"""Helpers for streaming CSV responses."""
+
+
+class Echo:
+    """File-like object which returns the written value instead of storing it.
+
+    See https://docs.djangoproject.com/en/4.1/howto/outputting-csv/#streaming-large-csv-files
+    """
+
+    def write(self, value):
+        return value
@@ -1,4 +1,16 @@
 from utils.testing.form_test_utils import FormValidityMixin
 from utils.testing.patch_utils import TestPatchMixin, patch
+from utils.testing.query_budget import (
+    QueryBudget,
+    QueryBudgetDataset,
+    QueryBudgetTestMixin,
+)
 
-__all__ = ["FormValidityMixin", "TestPatchMixin", "patch"]
+__all__ = [
+    "FormValidityMixin",
+    "TestPatchMixin",
+    "patch",
+    "QueryBudget",
+    "QueryBudgetDataset",
+    "QueryBudgetTestMixin",
+]
@@ -0,0 +1,232 @@
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from importlib import import_module
+from typing import Callable, Dict, List, Union
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, URLResolver, reverse
+from django.utils import timezone
+
+from creditmanagement.models import Account, Transaction
+from dining.models import DiningComment, DiningEntry, DiningList
+from userdetails.models import Association, User, UserMembership
+
+__all__ = ["QueryBudget", "QueryBudgetDataset", "QueryBudgetTestMixin"]
+
+
+class QueryBudget:
+    """The maximum number of queries of a view."""
+
+    def __init__(
+        self,
+        url_name: str,
+        max_queries: int,
+        kwargs: Union[Dict, Callable] = None,
+        query: Union[Dict, Callable] = None,
+        status_code: int = 200,
+        scales: str = None,
+    ):
+        """Constructor.
+
+        Args:
+            url_name: The name of the URL pattern.
+            max_queries: The maximum number of queries of a GET request.
+            kwargs: The URL kwargs, or a function that returns them given the
+                dataset.
+            query: The GET parameters, or a function that returns them given the
+                dataset.
+            status_code: The expected status code of the response.
+            scales: If the query count of the view is known to grow with the
+                data, give the reason. The view is then skipped. Remove it once
+                the view has been fixed.
+        """
+        self.url_name = url_name
+        self.max_queries = max_queries
+        self.kwargs = kwargs or {}
+        self.query = query or {}
+        self.status_code = status_code
+        self.scales = scales
+
+    def get_url(self, dataset: "QueryBudgetDataset") -> str:
+        kwargs = self.kwargs(dataset) if callable(self.kwargs) else self.kwargs
+        return reverse(self.url_name, kwargs=kwargs)
+
+    def get_query(self, dataset: "QueryBudgetDataset") -> Dict:
+        return self.query(dataset) if callable(self.query) else self.query
+
+
+class QueryBudgetDataset:
+    """A dataset that grows in steps to find views that scale with the data.
+
+    Each step adds an association with members, dining lists with (guest)
+    entries and comments, and transactions. The first step also creates the
+    user that makes the requests. This user is a superuser, a board member and
+    verified member of the first association and owner of its dining list. The
+    first association has a minimum balance exception.
+    """
+
+    date = date(2061, 1, 5)  # A weekday
+    users_per_step = 4
+
+    def __init__(self):
+        self.size = 0
+        self.association = None
+        self.dining_list = None
+        self.user = None
+
+    def grow(self, size: int):
+        """Adds steps until the dataset has the given size."""
+        for step in range(self.size, size):
+            self.add_step(step)
+        self.size = max(self.size, size)
+
+    def add_step(self, step: int):
+        association = Association.objects.create(
+            name=f"Association {step}",
+            slug=f"association{step}",
+            has_site_stats_access=True,
+            has_min_exception=step == 0,
+        )
+        users = [
+            User.objects.create_user(
+                f"user{step}_{i}", f"user{step}_{i}@example.com", first_name="Jan"
+            )
+            for i in range(self.users_per_step)
+        ]
+        if step == 0:
+            self.association = association
+            self.user = users[0]
+            self.user.is_superuser = True
+            self.user.save()
+            association.user_set.add(self.user)
+        for user in users:
+            UserMembership.objects.create(
+                related_user=user,
+                association=association,
+                is_verified=True,
+                verified_on=timezone.now(),
+            )
+        if step > 0:
+            # A pending membership request for the board of the first association
+            UserMembership.objects.create(
+                related_user=users[-1], association=self.association
+            )
+
+        kitchen = Account.objects.get(special="kitchen_cost")
+        for days in (0, 7):
+            list_date = self.date - timedelta(days=days)
+            dining_list = DiningList.objects.create(
+                date=list_date,
+                association=association,
+                sign_up_deadline=datetime.combine(list_date, time(17, 0)),
+                dish="Pasta",
+            )
+            dining_list.owners.add(self.user if step == 0 else users[0])
+            if step == 0 and days == 0:
+                self.dining_list = dining_list
+            for user in users:
+                transaction = Transaction.objects.create(
+                    source=user.account,
+                    target=kitchen,
+                    amount=Decimal("0.50"),
+                    description="Kitchen cost",
+                    created_by=user,
+                )
+                DiningEntry.objects.create(
+                    dining_list=dining_list,
+                    user=user,
+                    created_by=user,
+                    transaction=transaction,
+                )
+            DiningEntry.objects.create(
+                dining_list=dining_list,
+                user=users[0],
+                created_by=users[0],
+                external_name="Guest",
+            )
+            DiningComment.objects.create(
+                dining_list=dining_list, poster=users[0], message="Hello"
+            )
+
+        for user in users:
+            Transaction.objects.create(
+                source=association.account,
+                target=user.account,
+                amount=Decimal("10.00"),
+                description="Deposit",
+                created_by=self.user,
+            )
+
+
+class QueryBudgetTestMixin:
+    """Checks the query budgets of the views of an URL configuration.
+
+    Every named URL pattern of the URL configuration must have a budget or an
+    exemption. Each view is requested on a small and a large dataset. A view
+    fails when it uses more queries than its budget on the large dataset, or
+    when it uses more queries on the large dataset than on the small one.
+    """
+
+    urlconf = None  # Module path of the URL configuration
+    budgets: List[QueryBudget] = []
+    exempt: Dict[str, str] = {}  # URL names without budget, with the reason
+    # Number of dataset steps of the small and large dataset
+    dataset_sizes = (2, 5)
+
+    def get_url_names(self) -> set:
+        """Returns the names of all URL patterns in the URL configuration."""
+
+        def collect(patterns):
+            for pattern in patterns:
+                if isinstance(pattern, URLResolver):
+                    yield from collect(pattern.url_patterns)
+                elif isinstance(pattern, URLPattern) and pattern.name:
+                    yield pattern.name
+
+        return set(collect(import_module(self.urlconf).urlpatterns))
+
+    def count_queries(self, budget: QueryBudget, dataset: QueryBudgetDataset) -> int:
+        url = budget.get_url(dataset)
+        query = budget.get_query(dataset)
+        # The first request fills caches, e.g. of the session
+        self.client.get(url, query)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, query)
+            if getattr(response, "streaming", False):
+                b"".join(response.streaming_content)
+        self.assertEqual(response.status_code, budget.status_code, url)
+        return len(context)
+
+    def test_all_urls_have_budget(self):
+        # Names of namespaced URLs are checked without the namespace
+        budgeted = {budget.url_name.split(":")[-1] for budget in self.budgets}
+        missing = self.get_url_names() - budgeted - set(self.exempt)
+        self.assertFalse(missing, "URL patterns without query budget")
+
+    def test_query_budgets(self):
+        dataset = QueryBudgetDataset()
+        counts = {}
+        for size in self.dataset_sizes:
+            dataset.grow(size)
+            self.client.force_login(dataset.user)
+            for i, budget in enumerate(self.budgets):
+                if not budget.scales:
+                    counts.setdefault(i, []).append(self.count_queries(budget, dataset))
+
+        for i, budget in enumerate(self.budgets):
+            with self.subTest(budget.url_name):
+                if budget.scales:
+                    self.skipTest(budget.scales)
+                small, large = counts[i][0], counts[i][-1]
+                self.assertLessEqual(
+                    large,
+                    budget.max_queries,
+                    f"{budget.url_name} is over its query budget",
+                )
+                self.assertLessEqual(
+                    large,
+                    small,
+                    f"Query count of {budget.url_name} grows with the data "
+                    f"(sizes {self.dataset_sizes}: {counts[i]})",
+                )